@@ -1,130 +1,240 @@
+import gzip
 import math
-import re
-import threading
-from flask import Flask, jsonify, request, render_template, redirect, url_for, flash
-from elasticsearch import exceptions
+import click
+from flask import Flask, Response, jsonify, request, render_template, redirect, url_for, flash
 from config import Config
-from search.es_utils import get_es_client, index_data_in_elasticsearch, search_in_elasticsearch
-from search.wikidata_client import fetch_scientist_data, fetch_movie_data, fetch_country_data
+from search.es_utils import (
+    RANKINGS, SEARCH_VIEWS, get_es_client, search_with_cursor, suggest_names, rollback_index_generation, search_etag,
+    msearch_in_elasticsearch, refresh_local_index
+)
+from search.embeddings import semantic_search_available
+from search.es_state import get_cluster_state
+from search.facets import FACET_NAMES, parse_selections, toggle_selection
+from search.indexing import INDEXING_MODES
+from search.job_runner import run_next_job, run_worker
+from search.local_engine import get_local_index
+from search.jobs import get_job_store, job_status
+from search.metrics import REGISTRY, SEARCH_PHASE_SECONDS, INDEXING_STAGE_SECONDS, span
+from search.result_cache import get_result_cache, make_cache_key
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 app.config.from_object(Config)
 app.secret_key = Config.SECRET_KEY
 
-INDEXING_STATUS = {
-    'is_running': False,
-    'message': 'Aucune indexation depuis le dernier démarrage.',
-    'is_complete': False,
-    'final_count': 0
-}
-
-def clean_date(date_str):
-    """Nettoie une chaîne de date pour ne garder que AAAA-MM-JJ."""
-    if not date_str:
-        return None
-    match = re.search(r"^\d{4}-\d{2}-\d{2}", date_str)
-    return match.group(0) if match else None
-
-
-def run_indexing_task():
-    """Tâche d'indexation lourde qui gère les erreurs de source individuellement."""
-    global INDEXING_STATUS
-    INDEXING_STATUS = {
-        'is_running': True, 'message': 'Initialisation...', 'is_complete': False, 'final_count': 0
-    }
-    
-    all_data_to_index = []
-    final_message = ""
+# Empreinte du gabarit des résultats : un déploiement qui le modifie change les ETag des pages.
+PAGE_TEMPLATE_DIGEST = make_cache_key('template', None, app.jinja_env.loader.get_source(app.jinja_env, 'index.html')[0])
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/plain', 'text/css', 'application/json', 'application/javascript'}
+STATIC_COMPRESSED_ENTRIES = 256  # versions compressées de fichiers statiques gardées en mémoire
+_static_compressed = {}  # (encodage, ETag du fichier) -> octets compressés
 
-    try:
-        try:
-            INDEXING_STATUS['message'] = "Étape 1/4 : Collecte des données sur les chercheurs..."
-            for item in fetch_scientist_data():
-                all_data_to_index.append({
-                    'uri': item.get('item', {}).get('value'),
-                    'name': item.get('itemLabel', {}).get('value'),
-                    'description': item.get('itemDescription', {}).get('value'),
-                    'type': 'chercheur', 'image': item.get('image', {}).get('value'),
-                    'details': { 'birth_date': clean_date(item.get('dateNaissance', {}).get('value')), 'birth_place': item.get('lieuNaissanceLabel', {}).get('value'), 'domain': item.get('domaineLabel', {}).get('value'), 'nationality': item.get('nationalityLabel', {}).get('value') }
-                })
-        except Exception as e:
-            print(f"AVERTISSEMENT: Échec de la collecte des chercheurs: {e}")
-            INDEXING_STATUS['message'] = "Erreur lors de la collecte des chercheurs, passage à la suite..."
-
-        try:
-            INDEXING_STATUS['message'] = "Étape 2/4 : Collecte des données sur les films..."
-            for item in fetch_movie_data():
-                all_data_to_index.append({
-                    'uri': item.get('item', {}).get('value'),
-                    'name': item.get('itemLabel', {}).get('value'),
-                    'description': item.get('itemDescription', {}).get('value'),
-                    'type': 'film', 'image': item.get('image', {}).get('value'),
-                    'details': { 'director': item.get('realisateurLabel', {}).get('value'), 'release_date': clean_date(item.get('dateDeSortie', {}).get('value')), 'genre': item.get('genreLabel', {}).get('value') }
-                })
-        except Exception as e:
-            print(f"AVERTISSEMENT: Échec de la collecte des films: {e}")
-            INDEXING_STATUS['message'] = "Erreur lors de la collecte des films, passage à la suite..."
-
-        try:
-            INDEXING_STATUS['message'] = "Étape 3/4 : Collecte des données sur les pays..."
-            for item in fetch_country_data():
-                all_data_to_index.append({
-                    'uri': item.get('item', {}).get('value'),
-                    'name': item.get('itemLabel', {}).get('value'),
-                    'description': item.get('itemDescription', {}).get('value'),
-                    'type': 'pays', 'image': item.get('image', {}).get('value'),
-                    'details': { 'capital': item.get('capitaleLabel', {}).get('value'), 'continent': item.get('continentLabel', {}).get('value') }
-                })
-        except Exception as e:
-            print(f"AVERTISSEMENT: Échec de la collecte des pays: {e}")
-            INDEXING_STATUS['message'] = "Erreur lors de la collecte des pays, passage à la suite..."
-
-        total_docs = len(all_data_to_index)
-        if total_docs > 0:
-            INDEXING_STATUS['message'] = f"Étape 4/4 : Indexation de {total_docs} documents..."
-            count, es_message = index_data_in_elasticsearch(all_data_to_index)
-            INDEXING_STATUS['final_count'] = count
-            final_message = es_message
-        else:
-            final_message = "Aucun document n'a été collecté pour l'indexation."
+@app.template_filter('as_text')
+def as_text(value):
+    """Affiche un champ éventuellement multivalué sous forme de liste séparée par des virgules."""
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    return value
+
+app.add_template_filter(toggle_selection, 'toggle_facet')
 
-    except Exception as e:
-        final_message = f"Une erreur critique est survenue durant le processus : {e}"
-    finally:
-        INDEXING_STATUS['is_running'] = False
-        INDEXING_STATUS['is_complete'] = True
-        INDEXING_STATUS['message'] = final_message
-        print(f"Thread d'indexation terminé. Message final : {final_message}")
+@app.template_global()
+def search_url(query, ranking, selections, **params):
+    """URL de recherche conservant la requête, le classement et les facettes choisies."""
+    return url_for('search_interface', query=query, ranking=ranking, **selections, **params)
+
+@app.after_request
+def compress_response(response):
+    """Compresse les réponses textuelles (br si le paquet `brotli` est installé, sinon gzip).
+
+    Les fichiers statiques sont compressés une fois par version : le résultat est
+    gardé en mémoire sous l'ETag que Flask dérive du chemin, de la taille et de la
+    date de modification, et le fichier n'est plus relu tant qu'il ne change pas.
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers:
+        return response
+    if brotli is not None and request.accept_encodings['br']:
+        encoding = 'br'
+    elif request.accept_encodings['gzip']:
+        encoding = 'gzip'
+    else:
+        return response
+    etag, weak = response.get_etag()
+    if response.direct_passthrough:
+        if response.content_length is None or response.content_length < Config.COMPRESS_MIN_BYTES:
+            return response
+        key = (encoding, etag) if etag else None
+        data = _static_compressed.get(key)
+        if data is None:
+            response.direct_passthrough = False
+            data = compress_bytes(response.get_data(), encoding)
+            if key is not None:
+                if len(_static_compressed) >= STATIC_COMPRESSED_ENTRIES:
+                    _static_compressed.clear()
+                _static_compressed[key] = data
+        response.close()  # referme le fichier statique, inutile désormais
+    else:
+        data = response.get_data()
+        if len(data) < Config.COMPRESS_MIN_BYTES:
+            return response
+        data = compress_bytes(data, encoding)
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    response.direct_passthrough = False
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def compress_bytes(data, encoding):
+    """Compresse `data` avec l'encodage négocié ('br' ou 'gzip')."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=Config.GZIP_LEVEL)
 
 @app.route('/', methods=['GET', 'POST'])
 def search_interface():
-    """Affiche l'interface de recherche principale."""
+    """Affiche l'interface de recherche principale.
+
+    Une page de résultats demandée en GET porte un ETag dérivé de la génération
+    d'index servie : si le navigateur présente le même, la réponse est un 304
+    rendu sans interroger Elasticsearch.
+    """
     query = request.form.get('query', request.args.get('query', '')).strip()
-    page = int(request.args.get('page', 1))
-    results, total_pages = None, 0
+    cursor = request.args.get('cursor')
+    ranking = (request.values.getlist('ranking') or [Config.SEARCH_RANKING])[-1]
+    if ranking not in RANKINGS:
+        ranking = 'lexical'
+    cacheable = request.method == 'GET' and bool(query)
+    try:
+        selections = parse_selections({name: request.args.getlist(name) for name in FACET_NAMES})
+    except ValueError as e:
+        flash(str(e), 'warning')
+        selections, cacheable = {}, False
+    page = 1
+    results, total_pages, facets = None, 0, []
+    complete = False
 
-    es = get_es_client()
-    if not es:
+    etag = None
+    etag_parts = (query, ranking, selections, cursor, 'page', semantic_search_available(), PAGE_TEMPLATE_DIGEST)
+    if cacheable:
+        etag = search_etag(*etag_parts)
+        if etag and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = f"public, max-age={Config.SEARCH_HTTP_MAX_AGE}"
+            return response
+
+    cluster = get_cluster_state()
+    local = get_local_index()
+    if not cluster.search_client() and local is None:
         flash("Connexion à Elasticsearch impossible. Vérifiez que le service est démarré.", 'error')
-    
-    if query and es:
+    elif query:
+        if not cluster.search_client():
+            flash("Elasticsearch est injoignable : résultats servis par l'index local.", 'warning')
         size = 10
-        from_offset = (page - 1) * size
-        results_data = search_in_elasticsearch(query, from_offset, size)
-        
+        results_data = search_with_cursor(query, cursor, size, ranking, selections, view='page', facets=True)
+
         if results_data is None:
-            try:
-                if not es.indices.exists(index=Config.ES_INDEX):
-                    flash(f"L'index '{Config.ES_INDEX}' n'existe pas. Veuillez d'abord l'indexer.", 'warning')
-            except exceptions.ConnectionError:
+            if cluster.available and cluster.generation is None:
+                flash(f"L'index '{Config.ES_INDEX}' n'existe pas. Veuillez d'abord l'indexer.", 'warning')
+            elif not cluster.available:
                 flash("Connexion à Elasticsearch impossible.", 'error')
             results = {'hits': [], 'total': 0}
         else:
             results = results_data
+            page = results['page']
             if results['total'] > 0:
                 total_pages = math.ceil(results['total'] / size)
+            facets = results.get('facets')
+            complete = results.get('served_by') == 'elasticsearch' and facets is not None
+            facets = facets or []
+
+    with span(SEARCH_PHASE_SECONDS, phase='render'):
+        response = app.make_response(render_template(
+            'index.html', query=query, results=results, page=page, total_pages=total_pages,
+            ranking=ranking, semantic=semantic_search_available(), selections=selections, facets=facets))
+    # Seule une page complète, construite à partir de réponses d'Elasticsearch, reçoit l'ETag de la
+    # génération : une page vide après une erreur ou servie par le moteur local serait sinon figée par les 304.
+    if etag and complete and search_etag(*etag_parts) == etag:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = f"public, max-age={Config.SEARCH_HTTP_MAX_AGE}"
+    return response
+
+@app.route('/suggest')
+def suggest():
+    """Autocomplétion : noms correspondant au préfixe `q`, en JSON minimal."""
+    prefix = request.args.get('q', '').strip()
+    response = jsonify({'query': prefix, 'suggestions': suggest_names(prefix)})
+    response.headers['Cache-Control'] = f"public, max-age={Config.SUGGEST_HTTP_MAX_AGE}"
+    return response
+
+def parse_batch_request(payload):
+    """Valide le corps JSON de /api/search et retourne une liste de (texte, offset, taille).
 
-    return render_template('index.html', query=query, results=results, page=page, total_pages=total_pages)
+    Chaque requête est soit une chaîne, soit un objet {"query", "from", "size"}.
+    Lève ValueError avec un message destiné au client si le lot est invalide.
+    """
+    queries = payload.get('queries') if isinstance(payload, dict) else None
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("Le corps doit contenir une liste non vide 'queries'.")
+    if len(queries) > Config.API_MAX_BATCH:
+        raise ValueError(f"Au plus {Config.API_MAX_BATCH} requêtes par lot.")
+    if payload.get('ranking', 'lexical') not in RANKINGS:
+        raise ValueError(f"'ranking' doit valoir {' ou '.join(RANKINGS)}.")
+    if not isinstance(payload.get('facets', {}), dict):
+        raise ValueError("'facets' doit être un objet {facette: [valeurs]}.")
+    if payload.get('view', 'full') not in SEARCH_VIEWS:
+        raise ValueError(f"'view' doit valoir {' ou '.join(SEARCH_VIEWS)}.")
+
+    batch = []
+    for item in queries:
+        if isinstance(item, str):
+            item = {'query': item}
+        if not isinstance(item, dict) or not isinstance(item.get('query'), str) or not item['query'].strip():
+            raise ValueError("Chaque requête doit être une chaîne ou un objet avec un champ 'query' non vide.")
+        from_offset, size = item.get('from', 0), item.get('size', 10)
+        integers = all(isinstance(value, int) and not isinstance(value, bool) for value in (from_offset, size))
+        if not integers or from_offset < 0 or not 0 < size <= Config.API_MAX_SIZE:
+            raise ValueError(f"'from' doit être positif et 'size' compris entre 1 et {Config.API_MAX_SIZE}.")
+        batch.append((item['query'].strip(), from_offset, size))
+    return batch
+
+@app.route('/api/search', methods=['POST'])
+def api_search():
+    """API JSON : exécute un lot de requêtes en un seul `_msearch`.
+
+    `"ranking": "hybrid"` dans le corps active le classement hybride (BM25 + kNN
+    fusionnés par RRF), `"facets": {...}` restreint tout le lot aux valeurs
+    choisies, `"facet_counts": true` ajoute à chaque réponse les effectifs par
+    facette et `"view": "compact"` (ou `"page"`) ne renvoie que l'identité des
+    documents et un extrait surligné de leur description, au lieu du document entier.
+    """
+    payload = request.get_json(silent=True)
+    try:
+        batch = parse_batch_request(payload)
+        selections = parse_selections(payload.get('facets', {}))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    ranking, view = payload.get('ranking', 'lexical'), payload.get('view', 'full')
+    facet_counts = bool(payload.get('facet_counts'))
+
+    results = msearch_in_elasticsearch(batch, ranking, selections, view, facet_counts)
+
+    if results is None:
+        return jsonify({'status': 'error', 'message': 'Recherche indisponible : Elasticsearch injoignable ou index absent.'}), 503
+    responses = [{'query': query_text, 'from': from_offset, 'size': size, **result}
+                 for (query_text, from_offset, size), result in zip(batch, results)]
+    if facet_counts:
+        for response in responses:
+            if 'error' not in response:
+                response.setdefault('facets', None)
+    return jsonify({'status': 'ok', 'responses': responses})
 
 @app.route('/index')
 def indexing_status_page():
@@ -133,22 +243,80 @@ def indexing_status_page():
 
 @app.route('/start-indexing', methods=['POST'])
 def start_indexing():
-    """Déclenche l'indexation en arrière-plan."""
-    if INDEXING_STATUS['is_running']:
-        return jsonify({'status': 'already_running', 'message': 'Une indexation est déjà en cours.'})
-
+    """Dépose une tâche d'indexation, exécutée par un processus `indexing-worker`."""
     es = get_es_client()
     if not es:
         return jsonify({'status': 'error', 'message': 'Connexion à Elasticsearch impossible.'}), 500
 
-    indexing_thread = threading.Thread(target=run_indexing_task)
-    indexing_thread.start()
-    return jsonify({'status': 'started', 'message': 'L\'indexation a été lancée.'})
+    mode = request.args.get('mode', Config.INDEXING_MODE)
+    if mode not in INDEXING_MODES:
+        return jsonify({'status': 'error', 'message': f"Mode d'indexation inconnu : {mode}."}), 400
+
+    job, created = get_job_store().enqueue(mode)
+    if not created:
+        return jsonify({'status': 'already_running', 'job_id': job['id'], 'message': 'Une indexation est déjà en cours.'})
+    return jsonify({'status': 'started', 'job_id': job['id'], 'message': 'L\'indexation a été mise en file.'})
 
 @app.route('/check-status')
 def check_status():
-    """Retourne le statut actuel de l'indexation en JSON."""
-    return jsonify(INDEXING_STATUS)
+    """Retourne le statut de la dernière tâche d'indexation (partagé par tous les processus), avec le débit de chaque étape."""
+    return jsonify(job_status(get_job_store().latest()))
+
+@app.route('/cache-stats')
+def cache_stats():
+    """Retourne les statistiques du cache de résultats (succès, échecs, évictions)."""
+    return jsonify(get_result_cache().stats())
+
+REGISTRY.gauge('search_cache_events_total', "Événements du cache de résultats local depuis le démarrage.",
+               lambda: {(('event', event),): get_result_cache().stats()['local'][event] for event in ('hits', 'misses', 'evictions', 'expirations')},
+               kind='counter')
+REGISTRY.gauge('elasticsearch_available', "1 si le dernier état relevé du cluster est disponible.",
+               lambda: int(get_cluster_state().available))
+REGISTRY.gauge('indexing_running', "1 si une tâche d'indexation est en attente ou en cours.",
+               lambda: int(job_status(get_job_store().latest())['is_running']))
+REGISTRY.collector('indexing_stage_seconds', lambda: INDEXING_STAGE_SECONDS.render(get_job_store().stage_series()))
+
+@app.route('/metrics')
+def metrics():
+    """Expose les histogrammes de latence et les jauges au format texte Prometheus."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/es-status')
+def es_status():
+    """Retourne l'état du cluster relevé par le thread de surveillance (sans appel à Elasticsearch)."""
+    cluster = get_cluster_state()
+    cluster.start_monitor()
+    return jsonify(cluster.as_dict())
+
+@app.cli.command('reindex')
+@click.option('--mode', type=click.Choice(INDEXING_MODES), default=None, help="Mode d'indexation (défaut : INDEXING_MODE).")
+@click.option('--replay', is_flag=True, help="Reconstruit l'index uniquement à partir du cache SPARQL, sans réseau.")
+def reindex_command(mode, replay):
+    """Dépose une tâche d'indexation et l'exécute dans ce processus."""
+    if replay:
+        Config.SPARQL_CACHE_MODE = 'replay'
+    job, created = get_job_store().enqueue(mode or Config.INDEXING_MODE)
+    if not created:
+        print(f"Tâche {job['id']} ({job['mode']}) déjà en file ou en cours : elle sera exécutée à la place.")
+    if run_next_job() is None:
+        print("Une autre tâche est en cours d'exécution par un autre exécuteur.")
+
+@app.cli.command('indexing-worker')
+@click.option('--once', is_flag=True, help="S'arrête dès qu'il n'y a plus de tâche à exécuter.")
+def indexing_worker_command(once):
+    """Exécute les tâches d'indexation déposées par l'interface web."""
+    run_worker(once)
+
+@app.cli.command('build-local-index')
+def build_local_index_command():
+    """Reconstruit l'index du moteur local à partir de la génération servie."""
+    print(refresh_local_index())
+
+@app.cli.command('rollback-index')
+def rollback_index_command():
+    """Rebascule l'alias de lecture sur la génération d'index précédente."""
+    _, message = rollback_index_generation()
+    print(message)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,248 @@
+"""Banc de mesure de bout en bout : ingestion et routes Flask, contre des doublures locales.
+
+Elasticsearch et le point d'accès SPARQL sont remplacés par les serveurs de
+`benchmarks.fake_elasticsearch` et `benchmarks.fake_sparql`, lancés dans des
+processus séparés pour que leur mémoire et leur CPU ne faussent pas les mesures.
+Le banc indexe d'abord le corpus via `run_indexing_task` (documents/s, pic de RSS),
+puis rejoue le corpus de requêtes sur `/`, une seconde fois en revalidation
+(`If-None-Match`, réponses 304), et interroge `/check-status` (requêtes/s,
+latences p50/p95/p99, octets par réponse avec l'`Accept-Encoding` choisi).
+
+Usage : python -m benchmarks.bench_app [--scale 0.2] [--es-latency-ms 2] [--requests 2000] [--accept-encoding 'gzip, br'] [--json resultats.json]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.bench')
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'queries_fr.txt')
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as handle:
+        return [line.strip() for line in handle if line.strip()]
+
+
+def _serve_elasticsearch(connection, latency_ms, jitter_ms):
+    from benchmarks.fake_elasticsearch import make_server
+    server = make_server(0, latency_ms, jitter_ms)
+    connection.send(server.server_port)
+    server.serve_forever()
+
+
+def fixtures_directory(fixtures_dir, scale, seed):
+    """Répertoire de fixtures à servir : celui demandé, sinon les enregistrées, sinon des synthétiques générées au besoin."""
+    from benchmarks.fake_sparql import RECORDED_FIXTURES, load_fixtures, synthesize
+    if fixtures_dir:
+        return fixtures_dir
+    if load_fixtures(RECORDED_FIXTURES):
+        return RECORDED_FIXTURES
+    generated = os.path.join(BENCH_DIR, f"fixtures-{scale}-{seed}")
+    if not load_fixtures(generated):
+        synthesize(generated, scale, seed)
+    return generated
+
+
+def _serve_sparql(connection, fixtures_dir, scale, seed, latency_ms):
+    from benchmarks.fake_sparql import load_fixtures, make_server
+    fixtures = load_fixtures(fixtures_directory(fixtures_dir, scale, seed))
+    server = make_server(fixtures, 0, latency_ms)
+    connection.send((server.server_port, {source: len(rows) for source, rows in fixtures.items()}))
+    server.serve_forever()
+
+
+def start_stand_in(target, *args):
+    """Lance une doublure dans un processus dédié et retourne (processus, message de démarrage)."""
+    context = multiprocessing.get_context('spawn')
+    parent, child = context.Pipe()
+    process = context.Process(target=target, args=(child, *args), daemon=True)
+    process.start()
+    return process, parent.recv()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(sorted_values, fraction):
+    """Percentile au rang le plus proche sur une liste triée."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def load_test(app, paths, requests, concurrency, warmup, headers=lambda path: {}):
+    """Rejoue `paths` en boucle sur `concurrency` threads et mesure chaque requête (en-têtes `headers(path)`)."""
+    cycle = itertools.cycle(paths)
+    lock = threading.Lock()
+    latencies, sizes, errors = [], [], [0]
+    remaining = [requests]
+
+    def next_path():
+        with lock:
+            if remaining[0] <= 0:
+                return None
+            remaining[0] -= 1
+            return next(cycle)
+
+    def worker():
+        client = app.test_client()
+        while True:
+            path = next_path()
+            if path is None:
+                return
+            start = time.perf_counter()
+            response = client.get(path, headers=headers(path))
+            size = len(response.get_data())
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                sizes.append(size)
+                if response.status_code not in (200, 304):
+                    errors[0] += 1
+
+    client = app.test_client()
+    for path in itertools.islice(itertools.cycle(paths), warmup):
+        client.get(path, headers=headers(path)).get_data()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    milliseconds = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'concurrency': concurrency,
+        'seconds': round(wall, 3),
+        'qps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'bytes_mean': round(sum(sizes) / len(sizes)) if sizes else 0,
+        'latency_ms': {
+            'mean': milliseconds(sum(latencies) / len(latencies)) if latencies else 0.0,
+            'p50': milliseconds(percentile(latencies, 0.50)),
+            'p95': milliseconds(percentile(latencies, 0.95)),
+            'p99': milliseconds(percentile(latencies, 0.99)),
+            'max': milliseconds(latencies[-1]) if latencies else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', help="Répertoire de fixtures SPARQL (défaut : enregistrées, sinon synthétiques).")
+    parser.add_argument('--scale', type=float, default=1.0, help="Taille des fixtures synthétiques, en fraction des limites configurées.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--corpus', default=CORPUS_PATH, help="Fichier de requêtes rejouées sur `/`, une par ligne.")
+    parser.add_argument('--es-latency-ms', type=float, default=1.0)
+    parser.add_argument('--es-jitter-ms', type=float, default=0.0)
+    parser.add_argument('--sparql-latency-ms', type=float, default=0.0)
+    parser.add_argument('--requests', type=int, default=2000, help="Requêtes mesurées par route.")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--no-result-cache', action='store_true', help="Désactive le cache de résultats pendant la mesure.")
+    parser.add_argument('--accept-encoding', default='gzip, br', help="En-tête Accept-Encoding des requêtes ('' : sans compression).")
+    parser.add_argument('--json', help="Écrit les résultats dans ce fichier JSON.")
+    parser.add_argument('--verbose', action='store_true', help="Affiche la sortie de l'application.")
+    args = parser.parse_args()
+
+    es_process, es_port = start_stand_in(_serve_elasticsearch, args.es_latency_ms, args.es_jitter_ms)
+    sparql_process, (sparql_port, fixture_sizes) = start_stand_in(
+        _serve_sparql, args.fixtures, args.scale, args.seed, args.sparql_latency_ms)
+
+    workdir = os.path.join(BENCH_DIR, 'run')
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    os.environ.update({
+        'ES_HOST': f"http://127.0.0.1:{es_port}",
+        'ES_INDEX': 'bench_index',
+        'WIKIDATA_SPARQL_ENDPOINT': f"http://127.0.0.1:{sparql_port}/sparql",
+        'SPARQL_CACHE_MODE': 'off',
+        'FINGERPRINT_DB': os.path.join(workdir, 'fingerprints.sqlite'),
+        'JOB_DB': os.path.join(workdir, 'jobs.sqlite'),
+        'INDEXING_MODE': 'full',
+        'SLOW_QUERY_MS': '0',
+    })
+    if args.no_result_cache:
+        os.environ['SEARCH_CACHE_SIZE'] = '0'
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            import app as web
+            from search.indexing import run_indexing_task
+            rss_before = peak_rss_mb()
+            start = time.perf_counter()
+            status = run_indexing_task('full')
+            ingestion_seconds = time.perf_counter() - start
+            documents = status['final_count']
+            ingestion = {
+                'documents': documents,
+                'seconds': round(ingestion_seconds, 3),
+                'docs_per_second': round(documents / ingestion_seconds, 1) if ingestion_seconds else 0.0,
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+                'rss_before_mb': round(rss_before, 1),
+                'message': status['message'],
+                'stages': status['stages'],
+            }
+
+            corpus = load_corpus(args.corpus)
+            search_paths = [f"/?query={quote(query)}" for query in corpus]
+            encoding = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else {}
+            client = web.app.test_client()
+            etags = {path: client.get(path, headers=encoding).headers.get('ETag', '') for path in search_paths}
+            routes = {
+                '/': load_test(web.app, search_paths, args.requests, args.concurrency, args.warmup,
+                               lambda path: encoding),
+                '/ (304)': load_test(web.app, search_paths, args.requests, args.concurrency, args.warmup,
+                                     lambda path: {**encoding, 'If-None-Match': etags[path]}),
+                '/check-status': load_test(web.app, ['/check-status'], args.requests, args.concurrency, args.warmup,
+                                           lambda path: encoding),
+            }
+    finally:
+        es_process.terminate()
+        sparql_process.terminate()
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'fixture_rows': fixture_sizes,
+            'corpus_queries': len(corpus),
+            'parameters': {key: value for key, value in vars(args).items() if key not in ('json', 'verbose')},
+        },
+        'ingestion': ingestion,
+        'routes': routes,
+    }
+    print(f"Ingestion : {documents} documents en {ingestion['seconds']} s "
+          f"({ingestion['docs_per_second']} docs/s, pic RSS {ingestion['peak_rss_mb']} Mo)")
+    for route, measures in routes.items():
+        latency = measures['latency_ms']
+        print(f"{route:14} {measures['qps']:>8} req/s  p50 {latency['p50']} ms  p95 {latency['p95']} ms  "
+              f"p99 {latency['p99']} ms  {measures['bytes_mean']} o  erreurs {measures['errors']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
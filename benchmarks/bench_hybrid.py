@@ -0,0 +1,208 @@
+"""Banc de pertinence et de latence : classement lexical seul vs hybride (BM25 + kNN fusionnés par RRF).
+
+Le corpus des fixtures SPARQL est indexé avec `SEMANTIC_SEARCH=1` dans un index
+dédié, puis un jeu de requêtes dérivées des documents (nom exact, nom avec une
+faute de frappe, fragment du nom et de la description) est rejoué sur les deux
+chemins, sans cache de résultats. Une réponse est pertinente si elle porte le
+nom du document d'origine : le banc mesure le rappel@k, le MRR et les latences
+p50/p95 de chaque chemin, ainsi que le débit de vectorisation par lot et
+document par document.
+
+Les mesures de pertinence exigent un vrai cluster (`--es-host`, défaut `ES_HOST`).
+Avec `--fake-es`, la doublure locale ne classe pas les résultats lexicaux : le
+banc ne vérifie alors que le chemin de code et les coûts côté application.
+
+Usage : python -m benchmarks.bench_hybrid [--es-host http://localhost:9200] [--scale 0.2] [--queries 300] [--json hybride.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import time
+from benchmarks.bench_app import BENCH_DIR, fixtures_directory, percentile, start_stand_in, _serve_elasticsearch, _serve_sparql
+
+VARIANTS = ('exact', 'faute', 'partiel')
+
+
+def load_documents(directory):
+    """Documents construits à partir des fixtures, comme lors de l'indexation."""
+    from benchmarks.fake_sparql import load_fixtures
+    from search.indexing import INDEXING_SOURCES
+    fixtures = load_fixtures(directory)
+    documents = []
+    for label, _, builder, _ in INDEXING_SOURCES:
+        for row in fixtures.get(label, []):
+            document = builder(row)
+            if document.get('name') and document.get('uri'):
+                documents.append(document)
+    return documents
+
+
+def _with_typo(word, rng):
+    """Inverse deux lettres intérieures d'un mot d'au moins 5 lettres."""
+    if len(word) < 5:
+        return word
+    position = rng.randrange(1, len(word) - 2)
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+
+def make_queries(documents, count, seed):
+    """Requêtes (variante, texte, nom attendu) tirées de façon déterministe du corpus."""
+    rng = random.Random(seed)
+    queries = []
+    for document in rng.sample(documents, min(count, len(documents))):
+        name = document['name']
+        words = name.split()
+        longest = max(words, key=len)
+        description_words = [word for word in (document.get('description') or '').split() if len(word) >= 5]
+        queries.append(('exact', name, name))
+        queries.append(('faute', name.replace(longest, _with_typo(longest, rng), 1), name))
+        queries.append(('partiel', ' '.join([longest] + description_words[:2]), name))
+    return queries
+
+
+def evaluate(search, queries, k, warmup):
+    """Rappel@k, MRR@k et latences d'une fonction de recherche, globalement et par variante."""
+    for _, text, _ in queries[:warmup]:
+        search(text, 0, k)
+    latencies, per_variant = [], {variant: {'found': 0, 'reciprocal_rank': 0.0, 'count': 0} for variant in VARIANTS}
+    errors = 0
+    for variant, text, expected in queries:
+        start = time.perf_counter()
+        results = search(text, 0, k)
+        latencies.append(time.perf_counter() - start)
+        scores = per_variant[variant]
+        scores['count'] += 1
+        if results is None:
+            errors += 1
+            continue
+        names = [hit['_source'].get('name') for hit in results['hits']]
+        if expected in names:
+            scores['found'] += 1
+            scores['reciprocal_rank'] += 1 / (names.index(expected) + 1)
+
+    latencies.sort()
+    summary = lambda scores: {
+        f'recall@{k}': round(scores['found'] / scores['count'], 3) if scores['count'] else 0.0,
+        'mrr': round(scores['reciprocal_rank'] / scores['count'], 3) if scores['count'] else 0.0,
+    }
+    overall = {key: sum(scores[key] for scores in per_variant.values()) for key in ('found', 'reciprocal_rank', 'count')}
+    return {
+        **summary(overall),
+        'variants': {variant: summary(scores) for variant, scores in per_variant.items()},
+        'errors': errors,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(percentile(latencies, 0.95) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+def vectorization_throughput(documents, batch_size):
+    """Documents vectorisés par seconde, par lots de `batch_size` puis un par un."""
+    from search.embeddings import embed_documents, iter_batches
+    sample = documents[:max(batch_size * 8, 2000)]
+    rates = {}
+    for label, size in (('batch', batch_size), ('single', 1)):
+        start = time.perf_counter()
+        for batch in iter_batches(sample, size):
+            embed_documents(batch)
+        elapsed = time.perf_counter() - start
+        rates[label] = round(len(sample) / elapsed, 1) if elapsed else 0.0
+    return {'documents': len(sample), 'batch_size': batch_size, 'docs_per_second': rates}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--es-host', default=os.getenv('ES_HOST', 'http://localhost:9200'))
+    parser.add_argument('--fake-es', action='store_true', help="Utilise la doublure Elasticsearch (chemin de code uniquement).")
+    parser.add_argument('--fixtures', help="Répertoire de fixtures SPARQL (défaut : enregistrées, sinon synthétiques).")
+    parser.add_argument('--scale', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--queries', type=int, default=300, help="Documents tirés pour construire le jeu de requêtes.")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--json', help="Écrit les résultats dans ce fichier JSON.")
+    parser.add_argument('--verbose', action='store_true', help="Affiche la sortie de l'application.")
+    args = parser.parse_args()
+
+    processes = []
+    if args.fake_es:
+        es_process, es_port = start_stand_in(_serve_elasticsearch, 0.0, 0.0)
+        processes.append(es_process)
+        es_host = f"http://127.0.0.1:{es_port}"
+    else:
+        es_host = args.es_host
+    sparql_process, (sparql_port, fixture_sizes) = start_stand_in(_serve_sparql, args.fixtures, args.scale, args.seed, 0.0)
+    processes.append(sparql_process)
+
+    workdir = os.path.join(BENCH_DIR, 'hybrid')
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    os.environ.update({
+        'ES_HOST': es_host,
+        'ES_INDEX': 'bench_hybrid',
+        'WIKIDATA_SPARQL_ENDPOINT': f"http://127.0.0.1:{sparql_port}/sparql",
+        'SPARQL_CACHE_MODE': 'off',
+        'FINGERPRINT_DB': os.path.join(workdir, 'fingerprints.sqlite'),
+        'JOB_DB': os.path.join(workdir, 'jobs.sqlite'),
+        'SEMANTIC_SEARCH': '1',
+        'SEARCH_CACHE_SIZE': '0',
+        'SEARCH_CACHE_URL': '',
+        'SLOW_QUERY_MS': '0',
+    })
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            from config import Config
+            from search.es_utils import search_in_elasticsearch, hybrid_search_in_elasticsearch
+            from search.indexing import run_indexing_task
+            documents = load_documents(fixtures_directory(args.fixtures, args.scale, args.seed))
+            vectorization = vectorization_throughput(documents, Config.EMBEDDING_BATCH_SIZE)
+            start = time.perf_counter()
+            status = run_indexing_task('full')
+            ingestion = {'documents': status['final_count'], 'seconds': round(time.perf_counter() - start, 3),
+                         'message': status['message']}
+            queries = make_queries(documents, args.queries, args.seed)
+            rankings = {
+                'lexical': evaluate(search_in_elasticsearch, queries, args.k, args.warmup),
+                'hybrid': evaluate(hybrid_search_in_elasticsearch, queries, args.k, args.warmup),
+            }
+    finally:
+        for process in processes:
+            process.terminate()
+
+    results = {
+        'meta': {
+            'es_host': 'doublure locale' if args.fake_es else es_host,
+            'fixture_rows': fixture_sizes,
+            'queries': len(queries),
+            'parameters': {key: value for key, value in vars(args).items() if key not in ('json', 'verbose')},
+            'embedding': {'dims': Config.EMBEDDING_DIMS, 'rrf_window': Config.RRF_WINDOW,
+                          'rrf_rank_constant': Config.RRF_RANK_CONSTANT, 'num_candidates': Config.KNN_NUM_CANDIDATES},
+        },
+        'vectorization': vectorization,
+        'ingestion': ingestion,
+        'rankings': rankings,
+    }
+    rates = vectorization['docs_per_second']
+    print(f"Vectorisation : {rates['batch']} docs/s par lots de {vectorization['batch_size']}, {rates['single']} docs/s un par un")
+    print(f"Ingestion : {ingestion['documents']} documents en {ingestion['seconds']} s")
+    if args.fake_es:
+        print("AVERTISSEMENT: doublure Elasticsearch, le classement lexical n'est pas significatif.")
+    for ranking, measures in rankings.items():
+        variants = '  '.join(f"{variant} {scores[f'recall@{args.k}']}" for variant, scores in measures['variants'].items())
+        print(f"{ranking:8} rappel@{args.k} {measures[f'recall@{args.k}']}  MRR {measures['mrr']}  ({variants})  "
+              f"p50 {measures['latency_ms']['p50']} ms  p95 {measures['latency_ms']['p95']} ms  erreurs {measures['errors']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
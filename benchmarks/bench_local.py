@@ -0,0 +1,155 @@
+"""Banc de latence : moteur local mappé en mémoire vs aller-retour Elasticsearch.
+
+Le corpus des fixtures SPARQL est indexé dans un index dédié par
+`run_indexing_task`, puis l'index local en est construit (`refresh_local_index`). Le corpus de requêtes
+`benchmarks/queries_fr.txt` est ensuite rejoué, sans cache de résultats, sur
+`search_in_elasticsearch` et sur `local_search` : le banc mesure les latences
+p50/p95/p99 de chaque chemin, la durée de construction et d'ouverture de
+l'index local, sa taille sur disque et le recouvrement des 10 premiers
+résultats entre les deux moteurs.
+
+Le recouvrement n'a de sens que contre un vrai cluster (`--es-host`, défaut
+`ES_HOST`). Avec `--fake-es` (doublure locale, latence injectable), seules les
+latences sont significatives.
+
+Usage : python -m benchmarks.bench_local [--fake-es] [--es-latency-ms 2] [--scale 0.2] [--rounds 20] [--json local.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import time
+from benchmarks.bench_app import BENCH_DIR, load_corpus, percentile, start_stand_in, _serve_elasticsearch, _serve_sparql
+
+
+def measure(search, queries, rounds, k):
+    """Latences (ms) de `search(texte, 0, k)` sur `rounds` passes du corpus, et résultats de la dernière passe."""
+    latencies, last = [], {}
+    for _ in range(rounds):
+        for query_text in queries:
+            start = time.perf_counter()
+            results = search(query_text, 0, k)
+            latencies.append(time.perf_counter() - start)
+            last[query_text] = results
+    latencies.sort()
+    return {
+        'p50': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99': round(percentile(latencies, 0.99) * 1000, 3),
+        'searches_per_second': round(len(latencies) / sum(latencies), 1) if latencies else 0.0,
+    }, last
+
+
+def overlap(reference, candidate, k):
+    """Part moyenne des `k` premiers résultats de référence retrouvés par l'autre moteur."""
+    shares = []
+    for query_text, expected in reference.items():
+        expected_ids = [hit['_id'] for hit in (expected or {}).get('hits', [])[:k]]
+        if not expected_ids:
+            continue
+        found = {hit['_id'] for hit in (candidate.get(query_text) or {}).get('hits', [])[:k]}
+        shares.append(sum(doc_id in found for doc_id in expected_ids) / len(expected_ids))
+    return round(sum(shares) / len(shares), 3) if shares else None
+
+
+def directory_size_mb(path):
+    total = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return round(total / (1024 * 1024), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--es-host', default=os.getenv('ES_HOST', 'http://localhost:9200'))
+    parser.add_argument('--fake-es', action='store_true', help="Utilise la doublure Elasticsearch (latences uniquement).")
+    parser.add_argument('--es-latency-ms', type=float, default=2.0, help="Latence injectée dans la doublure.")
+    parser.add_argument('--fixtures', help="Répertoire de fixtures SPARQL (défaut : enregistrées, sinon synthétiques).")
+    parser.add_argument('--scale', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rounds', type=int, default=20, help="Passes sur le corpus de requêtes.")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--json', help="Écrit les résultats dans ce fichier JSON.")
+    parser.add_argument('--verbose', action='store_true', help="Affiche la sortie de l'application.")
+    args = parser.parse_args()
+
+    processes = []
+    if args.fake_es:
+        es_process, es_port = start_stand_in(_serve_elasticsearch, args.es_latency_ms, 0.0)
+        processes.append(es_process)
+        es_host = f"http://127.0.0.1:{es_port}"
+    else:
+        es_host = args.es_host
+    sparql_process, (sparql_port, fixture_sizes) = start_stand_in(_serve_sparql, args.fixtures, args.scale, args.seed, 0.0)
+    processes.append(sparql_process)
+
+    workdir = os.path.join(BENCH_DIR, 'local')
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    os.environ.update({
+        'ES_HOST': es_host,
+        'ES_INDEX': 'bench_local',
+        'WIKIDATA_SPARQL_ENDPOINT': f"http://127.0.0.1:{sparql_port}/sparql",
+        'SPARQL_CACHE_MODE': 'off',
+        'FINGERPRINT_DB': os.path.join(workdir, 'fingerprints.sqlite'),
+        'JOB_DB': os.path.join(workdir, 'jobs.sqlite'),
+        'LOCAL_SEARCH': 'fallback',
+        'LOCAL_INDEX_DIR': os.path.join(workdir, 'index'),
+        'SEARCH_CACHE_SIZE': '0',
+        'SEARCH_CACHE_URL': '',
+        'SLOW_QUERY_MS': '0',
+    })
+
+    queries = load_corpus()
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            from search.es_utils import search_in_elasticsearch, local_search, refresh_local_index
+            from search.indexing import run_indexing_task
+            from search.local_engine import LocalIndex, get_local_index
+            status = run_indexing_task('full')
+            start = time.perf_counter()
+            refresh_local_index()
+            build_seconds = time.perf_counter() - start
+            index = get_local_index()
+            if index is None:
+                raise SystemExit(f"Index local absent après l'indexation : {status['message']}")
+            start = time.perf_counter()
+            LocalIndex(index.path)
+            open_ms = (time.perf_counter() - start) * 1000
+            local = {'documents': index.count, 'build_seconds': round(build_seconds, 3),
+                     'open_ms': round(open_ms, 3), 'disk_mb': directory_size_mb(index.path)}
+            elasticsearch_latency, elasticsearch_results = measure(search_in_elasticsearch, queries, args.rounds, args.k)
+            local_latency, local_results = measure(local_search, queries, args.rounds, args.k)
+            engines = {'elasticsearch': elasticsearch_latency, 'local': local_latency}
+            agreement = overlap(elasticsearch_results, local_results, args.k)
+    finally:
+        for process in processes:
+            process.terminate()
+
+    results = {
+        'meta': {
+            'es_host': 'doublure locale' if args.fake_es else es_host,
+            'fixture_rows': fixture_sizes,
+            'queries': len(queries),
+            'parameters': {key: value for key, value in vars(args).items() if key not in ('json', 'verbose')},
+        },
+        'local_index': local,
+        'latency_ms': engines,
+        f'overlap@{args.k}': agreement,
+    }
+    print(f"Index local : {local['documents']} documents, construit en {local['build_seconds']} s, "
+          f"ouvert en {local['open_ms']} ms, {local['disk_mb']} Mo sur disque")
+    if args.fake_es:
+        print("AVERTISSEMENT: doublure Elasticsearch, le recouvrement des résultats n'est pas significatif.")
+    for engine, measures in engines.items():
+        print(f"{engine:14} p50 {measures['p50']} ms  p95 {measures['p95']} ms  p99 {measures['p99']} ms  "
+              f"{measures['searches_per_second']} recherches/s")
+    print(f"Recouvrement des {args.k} premiers résultats : {agreement}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Micro-benchmark du coût d'analyse d'une requête : ancien QueryParser vs analyseur compilé.
+
+Usage : python -m benchmarks.bench_query_parser [--repeat 200] [--json resultats.json]
+"""
+import argparse
+import json
+import os
+import time
+from benchmarks.legacy_query_parser import LegacyQueryParser
+from search.query_parser import QueryParser, _parse_normalized
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'queries_fr.txt')
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as handle:
+        return [line.strip() for line in handle if line.strip()]
+
+
+def measure(parse, queries, repeat, before_each=None):
+    """Coût moyen d'analyse par requête, en microsecondes."""
+    elapsed = 0.0
+    for _ in range(repeat):
+        for query in queries:
+            if before_each is not None:
+                before_each()
+            start = time.perf_counter()
+            parse(query)
+            elapsed += time.perf_counter() - start
+    return elapsed / (repeat * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', help="Écrit les résultats dans ce fichier JSON.")
+    args = parser.parse_args()
+
+    queries = load_corpus()
+    results = {
+        'queries': len(queries),
+        'repeat': args.repeat,
+        'legacy_us_per_query': measure(lambda q: LegacyQueryParser(q).parse(), queries, args.repeat),
+        'compiled_cold_us_per_query': measure(lambda q: QueryParser(q).parse(), queries, args.repeat, _parse_normalized.cache_clear),
+        'compiled_memoized_us_per_query': measure(lambda q: QueryParser(q).parse(), queries, args.repeat),
+    }
+    for name, value in results.items():
+        print(f"{name:32} {value:.2f}" if isinstance(value, float) else f"{name:32} {value}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()
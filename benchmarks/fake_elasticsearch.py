@@ -0,0 +1,415 @@
+"""Doublure HTTP d'Elasticsearch, en mémoire, avec latence injectable.
+
+Elle couvre l'API utilisée par l'application (création/bascule d'index, bulk,
+recherche, point-in-time, _msearch, suggestions, kNN, agrégations de facettes,
+filtrage du `_source` et surlignage)
+sans chercher à reproduire le classement : les filtres `term` et `terms` sont
+appliqués, les autres clauses ignorées, et tous les documents retenus ont le même
+score. La recherche kNN est exacte (produit
+scalaire sur tous les vecteurs). Elle sert à mesurer le coût côté application, pas
+la pertinence.
+
+Usage autonome : python -m benchmarks.fake_elasticsearch [--port 9200] [--latency-ms 2] [--jitter-ms 1]
+"""
+import argparse
+import html
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class NotFound(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+class Engine:
+    """État du cluster simulé : index, alias et points-in-time."""
+    def __init__(self):
+        self.indices = {}
+        self.aliases = {}
+        self.pits = {}
+        self._sorted = {}
+        self._lock = threading.RLock()
+
+    def resolve(self, expression, must_exist=True):
+        names = []
+        for name in expression.split(','):
+            if name in self.aliases:
+                names += sorted(self.aliases[name])
+            elif '*' in name:
+                pattern = re.compile(re.escape(name).replace(r'\*', '.*'))
+                names += sorted(index for index in self.indices if pattern.fullmatch(index))
+            elif name in self.indices:
+                names.append(name)
+            elif must_exist:
+                raise NotFound(name)
+        return names
+
+    def aliases_of(self, index):
+        return {alias: {} for alias, targets in self.aliases.items() if index in targets}
+
+    def sorted_ids(self, index, terms=()):
+        """Identifiants triés de l'index satisfaisant `terms`, recalculés seulement après une écriture."""
+        cached = self._sorted.setdefault(index, {})
+        ids = cached.get(terms)
+        if ids is None:
+            docs = self.indices[index]['docs']
+            ids = cached[terms] = [doc_id for doc_id in sorted(docs) if _matches(docs[doc_id], terms)]
+        return ids
+
+    def create(self, index, body):
+        self.indices[index] = {'docs': {}, 'settings': body.get('settings', {}), 'mappings': body.get('mappings', {})}
+        for alias in body.get('aliases', {}):
+            self.aliases.setdefault(alias, set()).add(index)
+        return {'acknowledged': True, 'index': index}
+
+    def delete(self, expression):
+        for index in self.resolve(expression):
+            self.indices.pop(index, None)
+            self._sorted.pop(index, None)
+            for targets in self.aliases.values():
+                targets.discard(index)
+        return {'acknowledged': True}
+
+    def update_aliases(self, body):
+        for action in body['actions']:
+            (kind, spec), = action.items()
+            if kind == 'add':
+                self.aliases.setdefault(spec['alias'], set()).add(spec['index'])
+            elif kind == 'remove':
+                self.aliases.get(spec['alias'], set()).discard(spec['index'])
+            elif kind == 'remove_index':
+                self.delete(spec['index'])
+        return {'acknowledged': True}
+
+    def bulk(self, lines, default_index=None):
+        items, position = [], 0
+        while position < len(lines):
+            (op_type, meta), = lines[position].items()
+            position += 1
+            index = (self.resolve(meta.get('_index', default_index), must_exist=False) or [meta.get('_index', default_index)])[0]
+            target = self.indices.setdefault(index, {'docs': {}, 'settings': {}, 'mappings': {}})
+            self._sorted.pop(index, None)
+            if op_type == 'delete':
+                found = target['docs'].pop(meta['_id'], None) is not None
+                items.append({op_type: {'_id': meta['_id'], 'status': 200 if found else 404,
+                                        'result': 'deleted' if found else 'not_found'}})
+                continue
+            source = lines[position]
+            position += 1
+            if op_type == 'update':
+                source = {**target['docs'].get(meta['_id'], {}), **source.get('doc', {})}
+            created = meta['_id'] not in target['docs']
+            target['docs'][meta['_id']] = source
+            items.append({op_type: {'_id': meta['_id'], 'status': 201 if created else 200,
+                                    'result': 'created' if created else 'updated'}})
+        return {'took': 1, 'errors': False, 'items': items}
+
+    def search(self, names, body, params):
+        if 'knn' in body:
+            return self._knn(names, body)
+        size = int(body.get('size', params.get('size', 10)))
+        from_offset = int(body.get('from', params.get('from', 0)))
+        terms = _term_filters(body.get('query', {}))
+        matches = documents = [(index, doc_id) for index in names for doc_id in self.sorted_ids(index, terms)]
+        if body.get('search_after'):
+            # Comme Elasticsearch : search_after choisit la page, le total et les agrégations portent sur tout le résultat.
+            last = body['search_after'][-1]
+            documents = [entry for entry in documents if entry[1] > last]
+            from_offset = 0
+        hits = [{'_index': index, '_id': doc_id, '_score': 1.0, **_project(self._source(index, doc_id), body),
+                 'sort': [1.0, doc_id]} for index, doc_id in documents[from_offset:from_offset + size]]
+        response = _response(hits, len(matches))
+        if 'aggs' in body:
+            response['aggregations'] = _aggregate([self.indices[index]['docs'][doc_id] for index, doc_id in matches],
+                                                  body['aggs'])
+        if 'pit' in body:
+            response['pit_id'] = body['pit']['id']
+        if 'suggest' in body:
+            response['suggest'] = {name: [self._complete(names, spec)] for name, spec in body['suggest'].items()}
+        return response
+
+    def _source(self, index, doc_id):
+        source = self.indices[index]['docs'][doc_id]
+        excludes = self.indices[index]['mappings'].get('_source', {}).get('excludes', [])
+        return {field: value for field, value in source.items() if field not in excludes} if excludes else source
+
+    def _knn(self, names, body):
+        """Les `k` plus proches voisins exacts, score `(1 + produit scalaire) / 2` comme `dot_product`."""
+        spec = body['knn']
+        field, vector = spec['field'], spec['query_vector']
+        if not any(field in self.indices[index]['mappings'].get('properties', {}) for index in names):
+            raise BadRequest(f"failed to create query: field [{field}] does not exist in the mapping")
+        terms = _term_filters({'bool': {'filter': spec.get('filter', [])}})
+        scored = []
+        for index in names:
+            docs = self.indices[index]['docs']
+            for doc_id in self.sorted_ids(index, terms):
+                stored = docs[doc_id].get(field)
+                if stored:
+                    scored.append(((1 + sum(a * b for a, b in zip(stored, vector))) / 2, index, doc_id))
+        scored.sort(key=lambda entry: (-entry[0], entry[2]))
+        top = scored[:min(int(spec['k']), int(body.get('size', spec['k'])))]
+        hits = [{'_index': index, '_id': doc_id, '_score': score, **_project(self._source(index, doc_id), body)}
+                for score, index, doc_id in top]
+        return _response(hits, len(top))
+
+    def _complete(self, names, spec):
+        prefix = spec.get('prefix', '').lower()
+        size = spec.get('completion', {}).get('size', 5)
+        options = []
+        for index in names:
+            for doc_id in self.sorted_ids(index):
+                source = self.indices[index]['docs'][doc_id]
+                if str(source.get('name', '')).lower().startswith(prefix):
+                    options.append({'text': source.get('name'), '_index': index, '_id': doc_id, '_score': 1.0, '_source': source})
+                    if len(options) >= size:
+                        return {'text': prefix, 'offset': 0, 'length': len(prefix), 'options': options}
+        return {'text': prefix, 'offset': 0, 'length': len(prefix), 'options': options}
+
+    def open_point_in_time(self, names):
+        pit_id = f"pit-{len(self.pits)}"
+        self.pits[pit_id] = names
+        return {'id': pit_id}
+
+
+def _response(hits, total):
+    return {'took': 1, 'timed_out': False, '_shards': {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0},
+            'hits': {'total': {'value': total, 'relation': 'eq'},
+                     'max_score': max((hit['_score'] for hit in hits), default=None), 'hits': hits}}
+
+
+def _term_filters(query):
+    """Couples (champ, valeurs admises) des clauses `term` et `terms` sous `bool.filter` ; le reste est ignoré."""
+    clauses = query.get('bool', {}).get('filter', [])
+    terms = []
+    for clause in clauses if isinstance(clauses, list) else [clauses]:
+        if 'term' in clause:
+            (field, value), = clause['term'].items()
+            terms.append((field, (value['value'] if isinstance(value, dict) else value,)))
+        elif 'terms' in clause:
+            (field, values), = clause['terms'].items()
+            terms.append((field, tuple(values)))
+    return tuple(terms)
+
+
+def _field_values(source, field):
+    """Valeurs d'un champ pointé (`details.genre`) ; le sous-champ `.keyword` désigne le champ lui-même."""
+    value = source
+    for part in field.removesuffix('.keyword').split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _filter_source(source, spec, prefix=''):
+    """Filtre `_source` (`includes`/`excludes`, champs pointés, sans jokers)."""
+    includes, excludes = spec.get('includes'), spec.get('excludes', ())
+    filtered = {}
+    for key, value in source.items():
+        path = prefix + key
+        if path in excludes:
+            continue
+        if includes is None or path in includes:
+            filtered[key] = value
+        elif isinstance(value, dict) and any(field.startswith(path + '.') for field in includes):
+            filtered[key] = _filter_source(value, spec, path + '.')
+    return filtered
+
+
+def _project(source, body):
+    """`_source` filtré selon le corps et surlignage réduit à `no_match_size` : le début du champ, échappé."""
+    spec = body.get('_source', {})
+    hit = {'_source': _filter_source(source, {'includes': spec} if isinstance(spec, list) else spec)}
+    fields = body.get('highlight', {}).get('fields', {})
+    fragments = {field: [html.escape(source[field][:options.get('no_match_size', 0)])]
+                 for field, options in fields.items() if isinstance(source.get(field), str) and options.get('no_match_size')}
+    if fragments:
+        hit['highlight'] = fragments
+    return hit
+
+
+def _matches(source, terms):
+    return all(any(value in allowed for value in _field_values(source, field)) for field, allowed in terms)
+
+
+def _aggregate(sources, aggregations):
+    """Agrégations `filter` (clauses `term`/`terms`) et `terms` sur les documents retenus."""
+    results = {}
+    for name, spec in aggregations.items():
+        if 'filter' in spec:
+            kept = [source for source in sources if _matches(source, _term_filters(spec['filter']))]
+            results[name] = {'doc_count': len(kept), **_aggregate(kept, spec.get('aggs', {}))}
+        elif 'terms' in spec:
+            counts = {}
+            for source in sources:
+                for value in set(_field_values(source, spec['terms']['field'])):
+                    counts[value] = counts.get(value, 0) + 1
+            if spec['terms'].get('order', {}).get('_key') == 'desc':
+                ordered = sorted(counts.items(), key=lambda item: item[0], reverse=True)
+            else:
+                ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            top = ordered[:spec['terms'].get('size', 10)]
+            results[name] = {'doc_count_error_upper_bound': 0,
+                             'sum_other_doc_count': sum(counts.values()) - sum(count for _, count in top),
+                             'buckets': [{'key': key, 'doc_count': count} for key, count in top]}
+    return results
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    engine = None
+    latency = 0.0
+    jitter = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload):
+        data = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            with self.engine._lock:
+                status, payload = self.route(self.command, parts, raw, params)
+        except NotFound as e:
+            status, payload = 404, {'error': {'type': 'index_not_found_exception', 'reason': f"no such index [{e}]"}, 'status': 404}
+        except BadRequest as e:
+            status, payload = 400, {'error': {'type': 'search_phase_execution_exception', 'reason': str(e)}, 'status': 400}
+        self._reply(status, payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _handle
+
+    def route(self, method, parts, raw, params):
+        engine = self.engine
+        ndjson = [json.loads(line) for line in raw.decode('utf-8').splitlines() if line.strip()] if parts and parts[-1] in ('_bulk', '_msearch') else None
+        body = json.loads(raw) if raw and ndjson is None else {}
+        if not parts:
+            return 200, {'name': 'fake', 'cluster_name': 'benchmark', 'version': {'number': '8.15.0'}, 'tagline': 'You Know, for Search'}
+        head = parts[0]
+        if head == '_bulk':
+            return 200, engine.bulk(ndjson)
+        if head == '_cluster':
+            return 200, {'cluster_name': 'benchmark', 'status': 'green', 'timed_out': False}
+        if head == '_aliases':
+            return 200, engine.update_aliases(body)
+        if head == '_alias':
+            name = parts[1]
+            if name not in engine.aliases or not engine.aliases[name]:
+                return 404, {'error': f"alias [{name}] missing", 'status': 404}
+            return 200, {index: {'aliases': {name: {}}} for index in sorted(engine.aliases[name])}
+        if head == '_pit':
+            engine.pits.pop(body.get('id'), None)
+            return 200, {'succeeded': True, 'num_freed': 1}
+        if head == '_search':
+            if body['pit']['id'] not in engine.pits:
+                return 404, {'error': {'type': 'search_context_missing_exception', 'reason': 'No search context found'}, 'status': 404}
+            return 200, engine.search(engine.pits[body['pit']['id']], body, params)
+        if head == '_msearch':
+            return 200, self._msearch(ndjson, None)
+
+        if len(parts) == 1:
+            if method == 'HEAD':
+                return (200 if engine.resolve(head, must_exist=False) else 404), None
+            if method == 'PUT':
+                return 200, engine.create(head, body)
+            if method == 'DELETE':
+                return 200, engine.delete(head)
+            return 200, {index: {'aliases': engine.aliases_of(index), 'settings': {'index': engine.indices[index]['settings']},
+                                 'mappings': engine.indices[index]['mappings']} for index in engine.resolve(head)}
+
+        operation, names = parts[1], engine.resolve(head, must_exist=parts[1] not in ('_bulk', '_alias'))
+        if operation in ('_refresh', '_forcemerge', '_cache'):
+            return 200, {'_shards': {'total': 1, 'successful': 1, 'failed': 0}}
+        if operation == '_settings':
+            if method == 'PUT':
+                for index in names:
+                    engine.indices[index]['settings'].update(body.get('index', body))
+                return 200, {'acknowledged': True}
+            return 200, {index: {'settings': {'index': engine.indices[index]['settings']}} for index in names}
+        if operation == '_mapping':
+            if method == 'PUT':
+                for index in names:
+                    engine.indices[index]['mappings'].update(body)
+                return 200, {'acknowledged': True}
+            return 200, {index: {'mappings': engine.indices[index]['mappings']} for index in names}
+        if operation == '_alias':
+            if not names:
+                return 404, {'error': 'alias missing', 'status': 404}
+            return 200, {index: {'aliases': engine.aliases_of(index)} for index in names}
+        if operation == '_count':
+            return 200, {'count': sum(len(engine.indices[index]['docs']) for index in names)}
+        if operation == '_bulk':
+            return 200, engine.bulk(ndjson, head)
+        if operation == '_search':
+            return 200, engine.search(names, body, params)
+        if operation == '_msearch':
+            return 200, self._msearch(ndjson, head)
+        if operation == '_pit':
+            return 200, engine.open_point_in_time(names)
+        return 400, {'error': f"unsupported {method} /{'/'.join(parts)}", 'status': 400}
+
+    def _msearch(self, lines, default_index):
+        responses = []
+        for header, body in zip(lines[::2], lines[1::2]):
+            try:
+                if 'pit' in body:
+                    if body['pit']['id'] not in self.engine.pits:
+                        responses.append({'error': {'type': 'search_context_missing_exception', 'reason': 'No search context found'}, 'status': 404})
+                        continue
+                    names = self.engine.pits[body['pit']['id']]
+                else:
+                    names = self.engine.resolve(header.get('index', default_index))
+                responses.append({**self.engine.search(names, body, {}), 'status': 200})
+            except NotFound as e:
+                responses.append({'error': {'type': 'index_not_found_exception', 'reason': f"no such index [{e}]"}, 'status': 404})
+            except BadRequest as e:
+                responses.append({'error': {'type': 'search_phase_execution_exception', 'reason': str(e)}, 'status': 400})
+        return {'took': 1, 'responses': responses}
+
+
+def make_server(port=0, latency_ms=0.0, jitter_ms=0.0):
+    """Serveur HTTP prêt à l'emploi ; chaque requête attend `latency_ms` plus un aléa jusqu'à `jitter_ms`."""
+    handler = type('BoundHandler', (Handler,), {'engine': Engine(), 'latency': latency_ms / 1000, 'jitter': jitter_ms / 1000})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    server = make_server(args.port, args.latency_ms, args.jitter_ms)
+    print(f"Elasticsearch simulé sur http://127.0.0.1:{server.server_port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
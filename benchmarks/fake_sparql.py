@@ -0,0 +1,198 @@
+"""Point d'accès SPARQL local rejouant des réponses enregistrées.
+
+Les fixtures sont un fichier `<source>.json.gz` par source, contenant les
+`bindings` SPARQL d'un résultat complet. Le serveur reconnaît la source à la
+classe Wikidata présente dans la requête et applique lui-même la pagination par
+clé (`FILTER(STR(?item) > ...)`, `ORDER BY ?item`, `LIMIT`), si bien que celle
+de l'application est exercée comme en production.
+
+Usage :
+    python -m benchmarks.fake_sparql record --out benchmarks/fixtures/sparql
+    python -m benchmarks.fake_sparql synthesize --out .bench/fixtures --scale 1.0
+    python -m benchmarks.fake_sparql serve --fixtures benchmarks/fixtures/sparql [--latency-ms 50]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from config import Config
+from search.wikidata_client import MULTI_VALUE_SEPARATOR, _scientist_query, _movie_query, _country_query
+
+RECORDED_FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'sparql')
+
+# nom de la source -> (marqueur de classe dans la requête, constructeur de requête, limite configurée)
+SOURCES = {
+    'chercheurs': ('wd:Q1650915', _scientist_query, Config.SCIENTIST_LIMIT),
+    'films': ('wd:Q11424', _movie_query, Config.MOVIE_LIMIT),
+    'pays': ('wd:Q6256', _country_query, Config.COUNTRY_LIMIT),
+}
+PAGING_RE = re.compile(r"(ORDER BY \?item\s+)?LIMIT\s+(\d+)")
+AFTER_RE = re.compile(r'FILTER\(STR\(\?item\) > ("(?:[^"\\]|\\.)*")\)')
+
+
+def fixture_path(directory, source):
+    return os.path.join(directory, f"{source}.json.gz")
+
+
+def write_fixture(directory, source, bindings):
+    os.makedirs(directory, exist_ok=True)
+    with gzip.open(fixture_path(directory, source), 'wt', encoding='utf-8') as handle:
+        json.dump({'source': source, 'bindings': bindings}, handle, ensure_ascii=False)
+
+
+def load_fixtures(directory):
+    """Charge les fixtures disponibles : {source: bindings}."""
+    fixtures = {}
+    for source in SOURCES:
+        path = fixture_path(directory, source)
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as handle:
+                fixtures[source] = json.load(handle)['bindings']
+    return fixtures
+
+
+def record(directory):
+    """Enregistre les réponses réelles de `WIKIDATA_SPARQL_ENDPOINT`, aux limites configurées."""
+    from search.wikidata_client import run_paginated_sparql_query
+    for source, (_, build_query, limit) in SOURCES.items():
+        bindings = list(run_paginated_sparql_query(build_query, limit))
+        write_fixture(directory, source, bindings)
+        print(f"{source}: {len(bindings)} lignes enregistrées")
+
+
+FIRST_NAMES = ['Marie', 'Pierre', 'Jean', 'Claude', 'Irène', 'Louis', 'Ada', 'Alan', 'Henri', 'Sophie', 'Christopher', 'Agnès']
+LAST_NAMES = ['Curie', 'Pasteur', 'Lovelace', 'Turing', 'Poincaré', 'Germain', 'Nolan', 'Varda', 'Truffaut', 'Godard', 'Lumière', 'Becquerel']
+DOMAINS = ['physique', 'chimie', 'mathématiques', 'informatique', 'biologie', 'médecine', 'astronomie']
+COUNTRIES = ['France', 'États-Unis', 'Royaume-Uni', 'Allemagne', 'Italie', 'Japon', 'Canada', 'Suisse']
+GENRES = ['drame', 'comédie', 'science-fiction', 'thriller', 'documentaire', 'animation', 'western']
+TITLE_WORDS = ['nuit', 'voyage', 'étoile', 'ville', 'mémoire', 'temps', 'mer', 'lumière', 'ombre', 'rêve']
+CONTINENTS = ['Europe', 'Asie', 'Afrique', 'Amérique du Nord', 'Amérique du Sud', 'Océanie']
+
+
+def _literal(value):
+    return {'type': 'literal', 'value': value}
+
+
+def _date(year, rng):
+    return {'type': 'literal', 'datatype': 'http://www.w3.org/2001/XMLSchema#dateTime',
+            'value': f"{year:04d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z"}
+
+
+def _several(rng, values, most=2):
+    return MULTI_VALUE_SEPARATOR.join(rng.sample(values, rng.randint(1, most)))
+
+
+def _synthesize_row(source, number, rng):
+    row = {'item': {'type': 'uri', 'value': f"http://www.wikidata.org/entity/Q{number}"}}
+    if rng.random() < 0.6:
+        row['image'] = {'type': 'uri', 'value': f"http://commons.wikimedia.org/wiki/Special:FilePath/{number}.jpg"}
+    if source == 'chercheurs':
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        row.update(itemLabel=_literal(name), itemDescription=_literal(f"chercheur en {rng.choice(DOMAINS)}"),
+                   dateNaissance=_date(rng.randint(1800, 1995), rng), lieuNaissanceLabel=_literal(rng.choice(COUNTRIES)),
+                   domaineLabel=_literal(_several(rng, DOMAINS)), nationalityLabel=_literal(_several(rng, COUNTRIES)))
+    elif source == 'films':
+        title = f"{rng.choice(TITLE_WORDS).capitalize()} de {rng.choice(TITLE_WORDS)}"
+        row.update(itemLabel=_literal(title), itemDescription=_literal(f"film sorti en {rng.randint(1920, 2023)}"),
+                   realisateurLabel=_literal(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"),
+                   dateDeSortie=_date(rng.randint(1920, 2023), rng), genreLabel=_literal(_several(rng, GENRES)))
+    else:
+        name = f"{rng.choice(COUNTRIES)} {number}"
+        row.update(itemLabel=_literal(name), itemDescription=_literal("pays souverain"),
+                   capitaleLabel=_literal(f"Capitale {number}"), continentLabel=_literal(_several(rng, CONTINENTS, 1)))
+    return row
+
+
+def synthesize(directory, scale=1.0, seed=42):
+    """Génère des fixtures déterministes ayant la forme des réponses réelles (mêmes variables)."""
+    rng = random.Random(seed)
+    for offset, (source, (_, _, limit)) in enumerate(SOURCES.items()):
+        count = max(1, int(limit * scale))
+        first = (offset + 1) * 1_000_000
+        write_fixture(directory, source, [_synthesize_row(source, first + number, rng) for number in range(count)])
+
+
+class Handler(BaseHTTPRequestHandler):
+    disable_nagle_algorithm = True
+    fixtures = {}
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query).get('query', [''])[0]
+        self._answer(query)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self._answer(parse_qs(self.rfile.read(length).decode('utf-8')).get('query', [''])[0])
+
+    def _answer(self, query):
+        if self.latency:
+            time.sleep(self.latency)
+        source = next((name for name, (marker, _, _) in SOURCES.items() if marker in query), None)
+        if source is None or source not in self.fixtures:
+            self.send_response(400)
+            self.end_headers()
+            return
+        bindings = self.fixtures[source]
+        after = AFTER_RE.search(query)
+        if after:
+            after = json.loads(after.group(1))
+            bindings = [row for row in bindings if row['item']['value'] > after]
+        paging = PAGING_RE.findall(query)
+        if paging:
+            ordered, limit = paging[-1]
+            if ordered:
+                bindings = sorted(bindings, key=lambda row: row['item']['value'])
+            bindings = bindings[:int(limit)]
+        body = json.dumps({'head': {'vars': sorted({key for row in bindings[:1] for key in row})},
+                           'results': {'bindings': bindings}}, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(fixtures, port=0, latency_ms=0.0):
+    """Serveur HTTP rejouant `fixtures` ({source: bindings}) ; chaque réponse attend `latency_ms`."""
+    handler = type('BoundHandler', (Handler,), {'fixtures': fixtures, 'latency': latency_ms / 1000})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help="Enregistre des fixtures depuis l'endpoint configuré.")
+    record_parser.add_argument('--out', default=RECORDED_FIXTURES)
+    synthesize_parser = commands.add_parser('synthesize', help="Génère des fixtures synthétiques déterministes.")
+    synthesize_parser.add_argument('--out', required=True)
+    synthesize_parser.add_argument('--scale', type=float, default=1.0)
+    synthesize_parser.add_argument('--seed', type=int, default=42)
+    serve_parser = commands.add_parser('serve', help="Sert des fixtures sur un port local.")
+    serve_parser.add_argument('--fixtures', default=RECORDED_FIXTURES)
+    serve_parser.add_argument('--port', type=int, default=8890)
+    serve_parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.out)
+    elif args.command == 'synthesize':
+        synthesize(args.out, args.scale, args.seed)
+    else:
+        server = make_server(load_fixtures(args.fixtures), args.port, args.latency_ms)
+        print(f"SPARQL simulé sur http://127.0.0.1:{server.server_port}/sparql")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
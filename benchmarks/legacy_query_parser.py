@@ -0,0 +1,93 @@
+"""Version historique de QueryParser (cinq extracteurs successifs), conservée comme référence de benchmark."""
+import re
+
+
+class LegacyQueryParser:
+    """Analyse une chaîne de requête pour en extraire des filtres structurés."""
+    def __init__(self, query_text):
+        self.raw_query = query_text
+        self.query_to_parse = f" {query_text.lower()} "
+        self.must_clauses = []
+        self.filter_clauses = []
+        self.detected_type = None
+        self.extractors = [
+            self._extract_entity_type, self._extract_year, self._extract_director,
+            self._extract_generic_attribute, self._extract_nationality
+        ]
+
+    def parse(self):
+        """Lance tous les extracteurs et retourne les clauses."""
+        for extractor in self.extractors:
+            extractor()
+        return self.must_clauses, self.filter_clauses
+
+    def _remove_match_from_query(self, text_to_remove):
+        self.query_to_parse = self.query_to_parse.replace(text_to_remove.lower(), " ")
+
+    def _extract_entity_type(self):
+        type_keywords = {
+            'film': ['film', 'films'],
+            'chercheur': ['chercheur', 'chercheurs', 'scientifique', 'scientifiques'],
+            'pays': ['pays']
+        }
+        for type_name, keywords in type_keywords.items():
+            for keyword in keywords:
+                if f" {keyword} " in self.query_to_parse:
+                    self.detected_type = type_name
+                    self.filter_clauses.append({"term": {"type": self.detected_type}})
+                    self._remove_match_from_query(keyword)
+                    return
+
+    def _extract_year(self):
+        match = re.search(r'\b(avant|après|en|depuis|dans les années)\s*(\d{4})\b', self.query_to_parse, re.IGNORECASE)
+        if match:
+            qualifier, year_str = match.groups()
+            year = int(year_str)
+            range_query = {}
+            if qualifier == 'avant': range_query['lte'] = f"{year}-12-31"
+            elif qualifier in ['après', 'depuis']: range_query['gte'] = f"{year}-01-01"
+            elif "années" in qualifier:
+                range_query['gte'] = f"{year}-01-01"
+                range_query['lte'] = f"{year+9}-12-31"
+            else:
+                range_query['gte'] = f"{year}-01-01"
+                range_query['lte'] = f"{year}-12-31"
+            
+            date_fields = []
+            if self.detected_type != 'film': date_fields.append("details.birth_date")
+            if self.detected_type != 'chercheur': date_fields.append("details.release_date")
+            
+            if date_fields:
+                self.filter_clauses.append({"bool": {"should": [{"range": {field: range_query}} for field in date_fields], "minimum_should_match": 1}})
+            self._remove_match_from_query(match.group(0))
+
+    def _extract_director(self):
+        match = re.search(r'(?:film de|réalisé par|par)\s+([\w\s-]+)', self.query_to_parse, re.IGNORECASE)
+        if match:
+            director_name = match.group(1).strip()
+            self.must_clauses.append({"match_phrase": {"details.director": director_name}})
+            if not self.detected_type: self.filter_clauses.append({"term": {"type": "film"}})
+            self._remove_match_from_query(match.group(0))
+            self._remove_match_from_query(director_name)
+
+    def _extract_generic_attribute(self):
+        attributes = {
+            'genre': ('genre', 'film'),
+            'domaine': ('domain', 'chercheur')
+        }
+        for keyword, (field, entity_type) in attributes.items():
+            match = re.search(fr'{keyword}\s+([\w\-]+)', self.query_to_parse, re.IGNORECASE)
+            if match:
+                value = match.group(1).strip()
+                self.must_clauses.append({"match": {f"details.{field}": value}})
+                if not self.detected_type: self.filter_clauses.append({"term": {"type": entity_type}})
+                self._remove_match_from_query(match.group(0))
+    
+    def _extract_nationality(self):
+        nationality_map = {"français": "France", "française": "France", "americain": "États-Unis", "americaine": "États-Unis", "britannique": "Royaume-Uni"}
+        for adj, country in nationality_map.items():
+            if f" {adj} " in self.query_to_parse:
+                self.must_clauses.append({"match": {"details.nationality": country}})
+                if not self.detected_type: self.filter_clauses.append({"term": {"type": "chercheur"}})
+                self._remove_match_from_query(adj)
+                return
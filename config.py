@@ -8,10 +8,80 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "une-cle-secrete-tres-difficile-a-deviner")
     
     ES_HOST = os.getenv("ES_HOST", "http://localhost:9200")
-    ES_INDEX = os.getenv("ES_INDEX", "wikidata_advanced_index")
+    ES_INDEX = os.getenv("ES_INDEX", "wikidata_advanced_index")  # alias de lecture
+    ES_INDEX_RETENTION = int(os.getenv("ES_INDEX_RETENTION", 3))  # générations conservées pour rollback
+    ES_REFRESH_INTERVAL = os.getenv("ES_REFRESH_INTERVAL", "1s")
+    ES_NUMBER_OF_REPLICAS = int(os.getenv("ES_NUMBER_OF_REPLICAS", 1))
+    ES_WARMUP_TIMEOUT = os.getenv("ES_WARMUP_TIMEOUT", "60s")
+    ES_WARMUP_QUERIES = [q for q in os.getenv("ES_WARMUP_QUERIES", "film,chercheur français,pays").split(",") if q.strip()]
     
-    WIKIDATA_SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 2048))  # entrées du cache LRU local
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 300))  # secondes
+    SEARCH_CACHE_URL = os.getenv("SEARCH_CACHE_URL", "")  # ex. redis://localhost:6379/0 (cache partagé optionnel)
+    QUERY_PARSE_CACHE_SIZE = int(os.getenv("QUERY_PARSE_CACHE_SIZE", 4096))
+    PIT_KEEP_ALIVE_SECONDS = int(os.getenv("PIT_KEEP_ALIVE_SECONDS", 60))  # point-in-time partagé par génération
+    CURSOR_HISTORY = int(os.getenv("CURSOR_HISTORY", 20))  # pages précédentes mémorisées dans le curseur
+    SUGGEST_SIZE = int(os.getenv("SUGGEST_SIZE", 8))
+    SUGGEST_MIN_CHARS = int(os.getenv("SUGGEST_MIN_CHARS", 2))
+    SUGGEST_TIMEOUT = float(os.getenv("SUGGEST_TIMEOUT", 0.5))  # secondes
+    SUGGEST_HTTP_MAX_AGE = int(os.getenv("SUGGEST_HTTP_MAX_AGE", 60))
+    SUGGEST_TYPE_WEIGHTS = {'pays': 30, 'chercheur': 20, 'film': 10}
+    ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", 30))  # secondes (indexation, administration)
+    ES_SEARCH_TIMEOUT = float(os.getenv("ES_SEARCH_TIMEOUT", 5))  # secondes (chemin des requêtes)
+    ES_HEALTH_INTERVAL = float(os.getenv("ES_HEALTH_INTERVAL", 5))  # secondes entre deux sondes du cluster
+    ES_HEALTH_TIMEOUT = float(os.getenv("ES_HEALTH_TIMEOUT", 2))  # secondes
+    ES_BREAKER_THRESHOLD = int(os.getenv("ES_BREAKER_THRESHOLD", 3))  # erreurs de transport avant ouverture
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 500))  # seuil du journal des requêtes lentes (0 = désactivé)
+    SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", 1.0))  # fraction des requêtes lentes consignées
+    API_MAX_BATCH = int(os.getenv("API_MAX_BATCH", 50))  # requêtes par appel à /api/search
+    API_MAX_SIZE = int(os.getenv("API_MAX_SIZE", 100))  # résultats par requête
+    SEMANTIC_SEARCH = os.getenv("SEMANTIC_SEARCH", "0") == "1"  # vecteurs à l'indexation + classement hybride (numpy requis)
+    SEARCH_RANKING = os.getenv("SEARCH_RANKING", "lexical")  # classement par défaut : "lexical" ou "hybrid"
+    EMBEDDING_DIMS = int(os.getenv("EMBEDDING_DIMS", 256))
+    EMBEDDING_SEED = int(os.getenv("EMBEDDING_SEED", 1))  # graine de la projection : la changer impose de réindexer
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 256))  # documents vectorisés par lot
+    HNSW_M = int(os.getenv("HNSW_M", 16))
+    HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 100))
+    KNN_NUM_CANDIDATES = int(os.getenv("KNN_NUM_CANDIDATES", 100))  # candidats examinés par shard
+    RRF_WINDOW = int(os.getenv("RRF_WINDOW", 50))  # résultats de chaque liste entrant dans la fusion
+    RRF_RANK_CONSTANT = int(os.getenv("RRF_RANK_CONSTANT", 60))
+    FACET_SIZE = int(os.getenv("FACET_SIZE", 10))  # valeurs affichées par facette
+    LOCAL_SEARCH = os.getenv("LOCAL_SEARCH", "fallback")  # moteur local (numpy requis) : "off", "fallback" ou "primary"
+    LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", ".local_index")
+    LOCAL_INDEX_CHECK_INTERVAL = float(os.getenv("LOCAL_INDEX_CHECK_INTERVAL", 2))  # secondes entre deux relectures de CURRENT
+    LOCAL_INDEX_AUTO_REBUILD = os.getenv("LOCAL_INDEX_AUTO_REBUILD", "0") == "1"  # sinon `flask build-local-index`
+    LOCAL_INDEX_CHUNK_SIZE = int(os.getenv("LOCAL_INDEX_CHUNK_SIZE", 10000))  # documents par segment de postings sur disque
+    SNIPPET_SIZE = int(os.getenv("SNIPPET_SIZE", 200))  # caractères de l'extrait surligné de la description
+    SEARCH_HTTP_MAX_AGE = int(os.getenv("SEARCH_HTTP_MAX_AGE", 0))  # secondes ; au-delà, revalidation par ETag
+    COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 500))  # réponses plus petites envoyées telles quelles
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))  # br requiert le paquet optionnel `brotli`
+
+    WIKIDATA_SPARQL_ENDPOINT = os.getenv("WIKIDATA_SPARQL_ENDPOINT", "https://query.wikidata.org/sparql")
     
     SCIENTIST_LIMIT = 3000
     MOVIE_LIMIT = 4000
-    COUNTRY_LIMIT = 300 
\ No newline at end of file
+    COUNTRY_LIMIT = 300
+
+    INDEXING_MODE = os.getenv("INDEXING_MODE", "incremental")  # "full" ou "incremental"
+    FINGERPRINT_DB = os.getenv("FINGERPRINT_DB", "fingerprints.sqlite")
+    JOB_DB = os.getenv("JOB_DB", "jobs.sqlite")  # file des tâches, partagée par le web et les exécuteurs
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 60))  # sans renouvellement, la tâche est reprise
+    JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", 10))  # secondes
+    JOB_CHECKPOINT_INTERVAL = float(os.getenv("JOB_CHECKPOINT_INTERVAL", 5))  # secondes entre deux points de reprise
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 2))  # secondes entre deux sondages de la file
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))  # tentatives avant abandon d'une tâche
+
+    SPARQL_TIMEOUT = int(os.getenv("SPARQL_TIMEOUT", 240))
+    SPARQL_PAGE_SIZE = int(os.getenv("SPARQL_PAGE_SIZE", 1000))  # 0 = une seule requête par source
+    SPARQL_WORKERS = int(os.getenv("SPARQL_WORKERS", 4))
+    SPARQL_MAX_RETRIES = int(os.getenv("SPARQL_MAX_RETRIES", 3))
+    SPARQL_RETRY_BACKOFF = float(os.getenv("SPARQL_RETRY_BACKOFF", 2.0))
+    SPARQL_MAX_RETRY_DELAY = float(os.getenv("SPARQL_MAX_RETRY_DELAY", 60))  # secondes ; Retry-After plus long : page en échec
+    SPARQL_QUEUE_SIZE = int(os.getenv("SPARQL_QUEUE_SIZE", 2000))
+    SPARQL_CACHE_MODE = os.getenv("SPARQL_CACHE_MODE", "on")  # "off", "on" ou "replay" (hors ligne)
+    SPARQL_CACHE_DIR = os.getenv("SPARQL_CACHE_DIR", ".sparql_cache")
+    SPARQL_CACHE_TTL = int(os.getenv("SPARQL_CACHE_TTL", 24 * 3600))  # secondes
+    SPARQL_STREAM_CHUNK_BYTES = int(os.getenv("SPARQL_STREAM_CHUNK_BYTES", 64 * 1024))
+    BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+    BULK_MAX_CHUNK_BYTES = int(os.getenv("BULK_MAX_CHUNK_BYTES", 10 * 1024 * 1024)) 
\ No newline at end of file
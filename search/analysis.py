@@ -0,0 +1,173 @@
+import re
+import html
+import unicodedata
+
+# Réplique en Python de l'analyseur `french_custom` du mapping (tokenizer standard, lowercase,
+# asciifolding, french_elision, french_stop, french_stemmer light_french), dans le même ordre.
+ELISION_ARTICLES = ["l", "m", "t", "qu", "n", "s", "j", "d", "c", "jusqu", "quoiqu", "lorsqu", "puisqu"]
+
+# Liste `_french_` d'Elasticsearch (liste snowball de Lucene). Elle est appliquée après
+# asciifolding, comme dans le mapping : ses entrées accentuées ne retirent donc rien.
+FRENCH_STOPWORDS = frozenset("""
+au aux avec ce ces dans de des du elle en et eux il je la le leur lui ma mais me même mes moi mon ne nos
+notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous c d
+j l à m n s t y été étée étées étés étant suis es est sommes êtes sont serai seras sera serons serez seront
+serais serait serions seriez seraient étais était étions étiez étaient fus fut fûmes fûtes furent sois
+soit soyons soyez soient fusse fusses fût fussions fussiez fussent ayant eu eue eues eus ai as avons avez
+ont aurai auras aura aurons aurez auront aurais aurait aurions auriez auraient avais avait avions aviez
+avaient eut eûmes eûtes eurent aie aies ait ayons ayez aient eusse eusses eût eussions eussiez eussent
+ceci cela celà cet cette ici ils les leurs quel quels quelle quelles sans soi
+""".split())
+
+# Champs interrogés par la recherche plein texte et leur poids, partagés par la requête
+# Elasticsearch et le moteur local.
+SEARCH_FIELDS = {
+    "name": 4, "description": 2,
+    "details.director": 1, "details.genre": 1, "details.domain": 1, "details.nationality": 1,
+}
+
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+_ELISIONS = frozenset(ELISION_ARTICLES)
+_LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss', 'ø': 'o', 'đ': 'd', 'ł': 'l', '’': "'", 'ʼ': "'"})
+_ACCENTS = str.maketrans('àáâôèéêùûîç', 'aaaoeeeuuic')
+
+
+def fold(text):
+    """Minuscules sans diacritiques (équivalent de lowercase + asciifolding pour le français)."""
+    text = text.lower().translate(_LIGATURES)
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+def _norm(word):
+    """Normalisation finale du stemmer léger de Savoy (FrenchLightStemmer de Lucene)."""
+    if len(word) > 4:
+        word = word.translate(_ACCENTS)
+        collapsed = word[0]
+        for char in word[1:]:
+            if not (char == collapsed[-1] and char.isalpha()):
+                collapsed += char
+        word = collapsed
+    if len(word) > 4 and word.endswith('ie'):
+        word = word[:-2]
+    if len(word) > 4:
+        if word[-1] == 'r': word = word[:-1]
+        if word[-1] == 'e': word = word[:-1]
+        if word[-1] == 'e': word = word[:-1]
+        if word[-1] == word[-2] and word[-1].isalpha(): word = word[:-1]
+    return word
+
+
+def light_french_stem(word):
+    """Stemmer `light_french` d'Elasticsearch : suffixes flexionnels et quelques dérivations."""
+    n = len(word)
+    if n > 5 and word[-1] == 'x':
+        if word[-3:-1] == 'au' and word[-4] != 'e':
+            word = word[:-2] + 'l' + word[-1]
+        word = word[:-1]
+    if len(word) > 3 and word[-1] == 'x':
+        word = word[:-1]
+    if len(word) > 3 and word[-1] == 's':
+        word = word[:-1]
+    n = len(word)
+    if n > 9 and word.endswith('issement'):
+        return _norm(word[:-7] + 'r')
+    if n > 8 and word.endswith('issant'):
+        return _norm(word[:-5] + 'r')
+    if n > 6 and word.endswith('ement'):
+        word = word[:-4]
+        if len(word) > 3 and word.endswith('ive'):
+            word = word[:-2] + 'f'
+        return _norm(word)
+    if n > 11 and word.endswith('ficatrice'):
+        return _norm(word[:-7] + 'er')
+    if n > 10 and word.endswith('ficateur'):
+        return _norm(word[:-6] + 'er')
+    if n > 9 and word.endswith('catrice'):
+        return _norm(word[:-7] + 'quer')
+    if n > 8 and word.endswith('cateur'):
+        return _norm(word[:-6] + 'quer')
+    if n > 8 and word.endswith('atrice'):
+        return _norm(word[:-6] + 'er')
+    if n > 7 and word.endswith('ateur'):
+        return _norm(word[:-5] + 'er')
+    if n > 6 and word.endswith('trice'):
+        word = word[:-5] + 'teur'
+    n = len(word)
+    if n > 5 and word.endswith('ième'):
+        return _norm(word[:-4])
+    if n > 7 and word.endswith('teuse'):
+        return _norm(word[:-5] + 'ter')
+    if n > 6 and word.endswith('teur'):
+        return _norm(word[:-4] + 'ter')
+    if n > 5 and word.endswith('euse'):
+        return _norm(word[:-2])
+    if n > 8 and word.endswith('ère'):
+        return _norm(word[:-3] + 'er')
+    if n > 7 and word.endswith('ive'):
+        return _norm(word[:-3] + 'if')
+    if n > 4 and (word.endswith('folle') or word.endswith('molle')):
+        return _norm(word[:-3] + 'u')
+    if n > 9 and word.endswith('nnelle'):
+        return _norm(word[:-5])
+    if n > 9 and word.endswith('nnel'):
+        return _norm(word[:-3])
+    if n > 4 and word.endswith('ète'):
+        word = word[:-3] + 'et'
+    if len(word) > 8 and word.endswith('ique'):
+        word = word[:-4]
+    n = len(word)
+    if n > 8 and word.endswith('esse'):
+        return _norm(word[:-3])
+    if n > 7 and word.endswith('inage'):
+        return _norm(word[:-3])
+    if n > 9 and word.endswith('isation'):
+        word = word[:-7]
+        if len(word) > 5 and word.endswith('ual'):
+            word = word[:-2] + 'el'
+        return _norm(word)
+    if n > 9 and word.endswith('isateur'):
+        return _norm(word[:-7])
+    if n > 8 and (word.endswith('ation') or word.endswith('ition')):
+        return _norm(word[:-5])
+    return _norm(word)
+
+
+def analyze(text):
+    """Termes indexés pour `text` par `french_custom`, dans l'ordre du texte."""
+    terms = []
+    for token in TOKEN_RE.findall(fold(text or '')):
+        apostrophe = token.find("'")
+        if apostrophe > 0 and token[:apostrophe] in _ELISIONS:
+            token = token[apostrophe + 1:]
+        if token and token not in FRENCH_STOPWORDS:
+            terms.append(light_french_stem(token))
+    return terms
+
+
+def highlight_snippet(text, query_text, size):
+    """Extrait d'environ `size` caractères de `text` autour du premier terme de la requête, termes en `<mark>`.
+
+    Équivalent local du surlignage Elasticsearch (`encoder: html`,
+    `no_match_size`) : le texte est échappé et, sans terme trouvé, l'extrait
+    est le début du texte.
+    """
+    text = text or ''
+    wanted = set(analyze(query_text))
+    matches = [match for match in TOKEN_RE.finditer(text) if wanted.intersection(analyze(match.group()))]
+    start = 0
+    if matches and matches[0].start() > size // 4:
+        start = matches[0].start() - size // 4
+        space = text.find(' ', start, matches[0].start())
+        start = space + 1 if space >= 0 else start
+    end = start + size
+    if end < len(text):
+        end = text.rfind(' ', start, end + 1)
+        end = end if end > start else start + size
+    parts, position = [], start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts += [html.escape(text[position:match.start()]), '<mark>', html.escape(match.group()), '</mark>']
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+    return ''.join(parts).strip()
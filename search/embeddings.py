@@ -0,0 +1,131 @@
+import unicodedata
+from config import Config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Chaque n-gramme contribue à `PROJECTIONS` dimensions tirées de son empreinte, avec un
+# signe pseudo-aléatoire : projection aléatoire creuse, sans matrice à matérialiser.
+NGRAM_SIZES = (2, 3, 4)
+PROJECTIONS = 4
+NAME_WEIGHT = 2.0
+NORMALIZATION = 'nfkd-sans-diacritiques'  # version de `normalize_text`, portée par la signature des vecteurs
+_GOLDEN = 0x9E3779B97F4A7C15
+_warned = False
+
+
+def semantic_search_available():
+    """Vrai si la recherche hybride est activée (`SEMANTIC_SEARCH`) et NumPy installé."""
+    global _warned
+    if not Config.SEMANTIC_SEARCH:
+        return False
+    if np is None:
+        if not _warned:
+            print("AVERTISSEMENT: le paquet 'numpy' est absent, recherche sémantique désactivée.")
+            _warned = True
+        return False
+    return True
+
+
+def embedding_signature():
+    """Paramètres dont dépendent les vecteurs : en changer rend les vecteurs indexés incomparables."""
+    return {'dims': Config.EMBEDDING_DIMS, 'seed': Config.EMBEDDING_SEED, 'ngrams': NGRAM_SIZES,
+            'projections': PROJECTIONS, 'name_weight': NAME_WEIGHT, 'normalization': NORMALIZATION}
+
+
+def normalize_text(text):
+    """Minuscules sans accents, espaces normalisés, bornée par des espaces (début et fin de mot).
+
+    Seuls les diacritiques (marques combinantes) sont retirés : les lettres des
+    autres écritures (cyrillique, arabe, CJK...) sont conservées.
+    """
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text or '')
+                   if unicodedata.category(char) != 'Mn').lower()
+    return f" {' '.join(text.split())} "
+
+
+def _mix(values):
+    """Finaliseur splitmix64, vectorisé sur des uint64 (débordements modulo 2**64 voulus)."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def embed_texts(texts, dims=None):
+    """Vecteurs unitaires (float32, `len(texts)` x `dims`) de n-grammes de caractères hachés.
+
+    Tous les textes du lot sont concaténés en un seul tableau de points de code ;
+    les empreintes de tous les n-grammes sont calculées en une passe vectorisée,
+    puis projetées et accumulées ligne par ligne. Déterministe d'un processus à
+    l'autre : aucun modèle ni téléchargement.
+    """
+    dims = dims or Config.EMBEDDING_DIMS
+    if not texts:
+        return np.zeros((0, dims), dtype=np.float32)
+    normalized = [normalize_text(text) for text in texts]
+    codes = np.frombuffer(''.join(normalized).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    rows = np.repeat(np.arange(len(normalized)), [len(text) for text in normalized])
+    seed = np.uint64(Config.EMBEDDING_SEED)
+    totals = np.zeros(len(texts) * dims)
+
+    with np.errstate(over='ignore'):
+        for size in NGRAM_SIZES:
+            count = len(codes) - size + 1
+            if count <= 0:
+                continue
+            starts = np.flatnonzero(rows[:count] == rows[size - 1:size - 1 + count])
+            hashes = np.full(len(starts), np.uint64(size), dtype=np.uint64)
+            for offset in range(size):
+                hashes = hashes * np.uint64(1_000_003) + codes[starts + offset]
+            cells = rows[starts] * dims
+            for projection in range(PROJECTIONS):
+                mixed = _mix(hashes ^ (seed + np.uint64(projection) * np.uint64(_GOLDEN)))
+                columns = (mixed % np.uint64(dims)).astype(np.int64)
+                signs = np.where(mixed >> np.uint64(63), -1.0, 1.0)
+                totals += np.bincount(cells + columns, weights=signs, minlength=totals.size)
+
+    vectors = totals.reshape(len(texts), dims).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def document_text(item):
+    """Texte décrivant un document, hors nom : description et détails textuels."""
+    parts = [item.get('description') or '']
+    for value in (item.get('details') or {}).values():
+        if isinstance(value, (list, tuple)):
+            parts.extend(str(element) for element in value)
+        elif isinstance(value, str):
+            parts.append(value)
+    return ' '.join(part for part in parts if part)
+
+
+def embed_documents(items):
+    """Vecteurs d'un lot de documents : le nom pèse `NAME_WEIGHT` fois le reste du texte."""
+    names = embed_texts([item.get('name') or '' for item in items])
+    bodies = embed_texts([document_text(item) for item in items])
+    vectors = NAME_WEIGHT * names + bodies
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def embed_query(query_text):
+    return embed_texts([query_text])[0]
+
+
+def iter_batches(items, size):
+    """Regroupe un itérable en listes d'au plus `size` éléments."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
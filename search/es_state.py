@@ -0,0 +1,128 @@
+import threading
+import time
+from elasticsearch import Elasticsearch, exceptions
+from config import Config
+
+
+def read_generation(es):
+    """Identifiant de la génération servie par l'alias (`index:révision`), ou None s'il n'existe pas."""
+    try:
+        mappings = es.indices.get_mapping(index=Config.ES_INDEX)
+    except exceptions.NotFoundError:
+        return None
+    if not mappings:
+        return None
+    return ",".join(f"{index}:{body['mappings'].get('_meta', {}).get('revision', 0)}"
+                    for index, body in sorted(mappings.items()))
+
+
+class ClusterState:
+    """Registre de l'état du cluster, tenu à jour hors du chemin des requêtes.
+
+    Un thread de surveillance sonde le cluster toutes les `ES_HEALTH_INTERVAL`
+    secondes ; la sonde relit en un seul appel la génération servie par l'alias,
+    ce qui établit à la fois la disponibilité du cluster et l'existence de l'index.
+    Les requêtes se contentent de lire cet état.
+
+    Le disjoncteur s'ouvre après une sonde en échec ou `ES_BREAKER_THRESHOLD`
+    erreurs de transport consécutives sur le chemin des requêtes : tant qu'il est
+    ouvert, `client()` retourne None immédiatement au lieu d'attendre l'expiration
+    des délais. Seule une sonde réussie le referme.
+    """
+    def __init__(self):
+        self.es = Elasticsearch(
+            hosts=[Config.ES_HOST],
+            request_timeout=Config.ES_REQUEST_TIMEOUT,
+            max_retries=3,
+            retry_on_timeout=True
+        )
+        self.search_es = self.es.options(request_timeout=Config.ES_SEARCH_TIMEOUT, max_retries=1)
+        self.available = False
+        self.generation = None
+        self.failures = 0
+        self.checked_at = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._monitor = None
+
+    def refresh(self):
+        """Sonde le cluster et met à jour disponibilité et génération ; retourne la disponibilité."""
+        probe = self.es.options(request_timeout=Config.ES_HEALTH_TIMEOUT, max_retries=0)
+        try:
+            generation = read_generation(probe)
+        except Exception as e:
+            with self._lock:
+                if self.available or self.checked_at is None:
+                    print(f"ERREUR de connexion à Elasticsearch: {e}")
+                self.available, self.last_error, self.checked_at = False, str(e), time.time()
+            return False
+        with self._lock:
+            if not self.available:
+                print("Connexion à Elasticsearch réussie.")
+            self.available, self.generation, self.failures = True, generation, 0
+            self.last_error, self.checked_at = None, time.time()
+        return True
+
+    def record_failure(self, error):
+        """Compte une erreur de transport survenue pendant une requête ; ouvre le disjoncteur au seuil."""
+        if not isinstance(error, exceptions.TransportError):
+            return
+        with self._lock:
+            self.failures += 1
+            if self.available and self.failures >= Config.ES_BREAKER_THRESHOLD:
+                print(f"Disjoncteur Elasticsearch ouvert après {self.failures} échecs : {error}")
+                self.available, self.last_error = False, str(error)
+
+    def record_success(self):
+        """Remet à zéro le compte d'échecs après une requête réussie."""
+        with self._lock:
+            self.failures = 0
+
+    def start_monitor(self):
+        """Effectue la première sonde puis lance le thread de surveillance (une seule fois)."""
+        if self._monitor is not None:
+            return
+        with self._start_lock:
+            if self._monitor is None:
+                self.refresh()
+                self._monitor = threading.Thread(target=self._run, name='es-health-monitor', daemon=True)
+                self._monitor.start()
+
+    def _run(self):
+        while True:
+            time.sleep(Config.ES_HEALTH_INTERVAL)
+            self.refresh()
+
+    def client(self):
+        """Client à délais longs (indexation, administration), ou None si le disjoncteur est ouvert."""
+        self.start_monitor()
+        return self.es if self.available else None
+
+    def search_client(self):
+        """Client à délais courts pour le chemin des requêtes, ou None si le disjoncteur est ouvert."""
+        self.start_monitor()
+        return self.search_es if self.available else None
+
+    def as_dict(self):
+        return {
+            'available': self.available,
+            'generation': self.generation,
+            'consecutive_failures': self.failures,
+            'checked_at': self.checked_at,
+            'last_error': self.last_error,
+        }
+
+
+_cluster_state = None
+_cluster_state_lock = threading.Lock()
+
+
+def get_cluster_state():
+    """Retourne le registre d'état singleton du cluster."""
+    global _cluster_state
+    if _cluster_state is None:
+        with _cluster_state_lock:
+            if _cluster_state is None:
+                _cluster_state = ClusterState()
+    return _cluster_state
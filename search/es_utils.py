@@ -1,46 +1,70 @@
 import re
 import json
-from elasticsearch import Elasticsearch, exceptions
-from elasticsearch.helpers import bulk
+import time
+import zlib
+import base64
+import threading
+from datetime import datetime, timezone
+from elasticsearch import exceptions
+from elasticsearch.helpers import streaming_bulk
 from config import Config
+from search.analysis import ELISION_ARTICLES, SEARCH_FIELDS, highlight_snippet
+from search.embeddings import semantic_search_available, embedding_signature, embed_documents, embed_query, iter_batches
+from search.es_state import get_cluster_state
+from search.facets import decade_of, facet_filter_clauses, build_facet_aggregations, read_facets, selection_key
+from search.fingerprints import fingerprint
+from search.local_engine import UnsupportedQuery, build_local_index, filter_source, get_local_index, local_index_enabled
+from search.metrics import SEARCH_PHASE_SECONDS, INDEXING_STAGE_SECONDS, span, observe_stage, log_slow_query
+from search.query_parser import QueryParser
+from search.result_cache import get_result_cache, make_cache_key, normalize_query
+
+class IndexingAborted(Exception):
+    """Interrompt une indexation sans supprimer la génération partielle, qui sera reprise."""
+
 
-es_client = None
 def get_es_client():
-    """Crée et retourne un client Elasticsearch singleton."""
-    global es_client
-    if es_client is None:
-        try:
-            es_client = Elasticsearch(
-                hosts=[Config.ES_HOST],
-                request_timeout=30,
-                max_retries=3,
-                retry_on_timeout=True
-            )
-            if not es_client.ping():
-                raise exceptions.ConnectionError("Ping vers Elasticsearch a échoué.")
-            print("Connexion à Elasticsearch réussie.")
-        except exceptions.ConnectionError as e:
-            print(f"ERREUR de connexion à Elasticsearch: {e}")
-            es_client = None
-    return es_client
-
-def index_data_in_elasticsearch(all_data):
-    """Indexe les données en utilisant l'API bulk pour des performances optimales."""
-    es = get_es_client()
-    if es is None:
-        return 0, "Client Elasticsearch non disponible."
+    """Client Elasticsearch partagé (délais longs), ou None si le cluster est signalé indisponible.
+
+    Aucun appel réseau n'est fait ici : la disponibilité est celle relevée par le
+    thread de surveillance de `ClusterState`.
+    """
+    return get_cluster_state().client()
 
-    index_settings = {
+
+def get_search_client():
+    """Client à délais courts pour les recherches, ou None si le disjoncteur est ouvert."""
+    return get_cluster_state().search_client()
+
+MAX_REPORTED_ERRORS = 20
+FACET_KEYWORD = {"type": "keyword", "ignore_above": 256}
+
+def build_index_body():
+    """Paramètres d'analyse et mapping d'un index de génération.
+
+    Les champs textuels servant de facettes portent un sous-champ `keyword`
+    agrégeable, et `decade` est dérivé des dates à l'indexation. Avec la
+    recherche sémantique, le mapping ajoute le champ `embedding` (`dense_vector`
+    indexé en HNSW), exclu du `_source` renvoyé.
+    """
+    body = {
         "settings": {
+            "index": {
+                "number_of_replicas": 0,
+                "refresh_interval": "-1"
+            },
             "analysis": {
                 "analyzer": {
                     "french_custom": {
                         "type": "custom", "tokenizer": "standard",
                         "filter": ["lowercase", "asciifolding", "french_elision", "french_stop", "french_stemmer"]
+                    },
+                    "suggest_folding": {
+                        "type": "custom", "tokenizer": "standard",
+                        "filter": ["lowercase", "asciifolding"]
                     }
                 },
                 "filter": {
-                    "french_elision": {"type": "elision", "articles_case": True, "articles": ["l", "m", "t", "qu", "n", "s", "j", "d", "c", "jusqu", "quoiqu", "lorsqu", "puisqu"]},
+                    "french_elision": {"type": "elision", "articles_case": True, "articles": ELISION_ARTICLES},
                     "french_stop": {"type": "stop", "stopwords": "_french_"},
                     "french_stemmer": {"type": "stemmer", "language": "light_french"}
                 }
@@ -48,156 +72,393 @@ def index_data_in_elasticsearch(all_data):
         },
         "mappings": {
             "properties": {
+                "uri": {"type": "keyword"},
                 "name": {"type": "text", "analyzer": "french_custom", "fields": {"keyword": {"type": "keyword"}}},
                 "description": {"type": "text", "analyzer": "french_custom"},
                 "type": {"type": "keyword"},
+                "suggest": {"type": "completion", "analyzer": "suggest_folding"},
+                "decade": {"type": "short"},
                 "details": {
                     "properties": {
                         "birth_date": {"type": "date"}, "release_date": {"type": "date"},
                         "director": {"type": "text", "analyzer": "french_custom"},
-                        "genre": {"type": "text", "analyzer": "french_custom"},
-                        "nationality": {"type": "text", "analyzer": "french_custom"},
-                        "domain": {"type": "text", "analyzer": "french_custom"},
+                        "genre": {"type": "text", "analyzer": "french_custom", "fields": {"keyword": FACET_KEYWORD}},
+                        "nationality": {"type": "text", "analyzer": "french_custom", "fields": {"keyword": FACET_KEYWORD}},
+                        "domain": {"type": "text", "analyzer": "french_custom", "fields": {"keyword": FACET_KEYWORD}},
                     }
                 }
             }
         }
     }
+    if semantic_search_available():
+        body["mappings"]["_source"] = {"excludes": ["embedding"]}
+        body["mappings"]["properties"]["embedding"] = {
+            "type": "dense_vector", "dims": Config.EMBEDDING_DIMS, "index": True, "similarity": "dot_product",
+            "index_options": {"type": "hnsw", "m": Config.HNSW_M, "ef_construction": Config.HNSW_EF_CONSTRUCTION}
+        }
+    return body
+
+
+SUGGEST_MAX_INPUTS = 4
+
+def build_suggest_field(item):
+    """Entrées d'autocomplétion : le nom complet puis ses suffixes de mots (« Einstein » pour « Albert Einstein »)."""
+    words = item['name'].split()
+    inputs = [" ".join(words[start:]) for start in range(min(len(words), SUGGEST_MAX_INPUTS))]
+    return {"input": inputs, "weight": Config.SUGGEST_TYPE_WEIGHTS.get(item.get('type'), 1)}
+
+
+def _index_source(item):
+    """Document envoyé à Elasticsearch : le document collecté enrichi des champs dérivés."""
+    source = {**item, "suggest": build_suggest_field(item)}
+    decade = decade_of(item)
+    if decade is not None:
+        source["decade"] = decade
+    return source
+
+
+def _index_actions(documents, index):
+    """Actions bulk d'indexation ; les vecteurs sont calculés par lots de `EMBEDDING_BATCH_SIZE` documents."""
+    if not semantic_search_available():
+        for item in documents:
+            yield {"_op_type": "index", "_index": index, "_id": item['uri'], "_source": _index_source(item)}
+        return
+    for batch in iter_batches(documents, Config.EMBEDDING_BATCH_SIZE):
+        start = time.perf_counter()
+        vectors = embed_documents(batch)
+        observe_stage('embed', time.perf_counter() - start)
+        for item, vector in zip(batch, vectors):
+            source = {**_index_source(item), "embedding": vector.tolist()}
+            yield {"_op_type": "index", "_index": index, "_id": item['uri'], "_source": source}
+
+
+def generation_index_name():
+    """Nom horodaté (à la milliseconde) d'une nouvelle génération, ex. `wikidata_advanced_index-20240101120000123`."""
+    return f"{Config.ES_INDEX}-{datetime.now(timezone.utc):%Y%m%d%H%M%S%f}"[:-3]
+
+
+def generation_timestamp(index):
+    """Horodatage d'une génération ramené à la milliseconde, pour comparer aussi les anciens noms à la seconde."""
+    return index.rsplit('-', 1)[-1].ljust(17, '0')
+
+
+def list_index_generations(es):
+    """Liste les générations existantes de l'alias, de la plus ancienne à la plus récente.
+
+    Les noms horodatés à la seconde (`-YYYYMMDDHHMMSS`, avant le passage à la
+    milliseconde) restent reconnus, pour la rétention comme pour le retour arrière.
+    """
+    pattern = re.compile(rf"^{re.escape(Config.ES_INDEX)}-(\d{{14}}|\d{{17}})$")
+    try:
+        indices = es.indices.get_alias(index=f"{Config.ES_INDEX}-*")
+    except exceptions.NotFoundError:
+        return []
+    return sorted((index for index in indices if pattern.match(index)), key=generation_timestamp)
+
+
+def get_alias_targets(es):
+    """Retourne les index actuellement servis par l'alias de lecture."""
+    try:
+        return sorted(es.indices.get_alias(name=Config.ES_INDEX))
+    except exceptions.NotFoundError:
+        return []
+
+
+def swap_index_alias(es, new_index):
+    """Bascule atomiquement l'alias de lecture vers `new_index`.
+
+    Un ancien index concret portant le nom de l'alias (installation antérieure
+    au versionnement) est supprimé dans la même opération.
+    """
+    actions = [{"remove": {"index": index, "alias": Config.ES_INDEX}} for index in get_alias_targets(es)]
+    if not actions and es.indices.exists(index=Config.ES_INDEX):
+        actions.append({"remove_index": {"index": Config.ES_INDEX}})
+    actions.append({"add": {"index": new_index, "alias": Config.ES_INDEX}})
+    es.indices.update_aliases(actions=actions)
+
+
+def prune_index_generations(es, keep=None):
+    """Supprime les générations au-delà de la rétention, sans jamais toucher l'index servi."""
+    keep = Config.ES_INDEX_RETENTION if keep is None else keep
+    live = set(get_alias_targets(es))
+    generations = list_index_generations(es)
+    stale = [index for index in generations[:max(len(generations) - keep, 0)] if index not in live]
+    for index in stale:
+        es.indices.delete(index=index)
+    return stale
+
+
+def rollback_index_generation():
+    """Remet l'alias sur la génération précédant celle actuellement servie."""
+    es = get_es_client()
+    if es is None:
+        return None, "Client Elasticsearch non disponible."
+    live = get_alias_targets(es)
+    if not live:
+        return None, f"L'alias '{Config.ES_INDEX}' ne pointe vers aucun index."
+    previous = [index for index in list_index_generations(es)
+                if generation_timestamp(index) < generation_timestamp(live[-1])]
+    if not previous:
+        return None, "Aucune génération précédente n'est disponible."
+    swap_index_alias(es, previous[-1])
+    invalidate_index_generation()
+    return previous[-1], f"L'alias '{Config.ES_INDEX}' pointe désormais vers {previous[-1]}."
+
+
+def get_index_generation():
+    """Identifiant de la génération servie (`index:révision`), ou None si l'alias n'existe pas.
+
+    La valeur est celle relevée par le thread de surveillance (au plus
+    `ES_HEALTH_INTERVAL` secondes d'âge) : c'est elle qui entre dans les clés du
+    cache de résultats, si bien qu'une réindexation les invalide toutes.
+    """
+    return get_cluster_state().generation
+
+
+def invalidate_index_generation():
+    """Relit immédiatement la génération servie, après une bascule ou une passe incrémentale."""
+    get_cluster_state().refresh()
+
+
+def warm_index(es, index):
+    """Attend que l'index soit disponible puis le préchauffe avec quelques requêtes types."""
+    es.cluster.health(index=index, wait_for_status='yellow', timeout=Config.ES_WARMUP_TIMEOUT)
+    for query_text in Config.ES_WARMUP_QUERIES:
+        es.search(index=index, body=build_search_query(query_text), size=10)
+
+
+def _bulk_actions(es, actions, stats=None, on_success=None):
+    """Envoie des actions via `streaming_bulk` et retourne (réussites, échecs).
+
+    `on_success(op_type, _id)` est appelé pour chaque action acquittée.
+    Une suppression d'un document déjà absent compte comme une réussite.
+    """
+    success, failed, errors = 0, 0, []
+    upstream = {'seconds': 0.0}
+
+    def timed_actions():
+        iterator = iter(actions)
+        while True:
+            start = time.perf_counter()
+            action = next(iterator, None)
+            upstream['seconds'] += time.perf_counter() - start
+            if action is None:
+                return
+            yield action
+
+    start = time.perf_counter()
+    for ok, info in streaming_bulk(
+        es, timed_actions(),
+        chunk_size=Config.BULK_CHUNK_SIZE,
+        max_chunk_bytes=Config.BULK_MAX_CHUNK_BYTES,
+        raise_on_error=False
+    ):
+        (op_type, result), = info.items()
+        if ok or (op_type == 'delete' and result.get('status') == 404):
+            success += 1
+            if stats is not None: stats.add('bulk')
+            if on_success is not None: on_success(op_type, result['_id'])
+        else:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS: errors.append(info)
+    observe_stage('bulk', time.perf_counter() - start - upstream['seconds'])
+    if errors: print(f"ERREURS pendant l'indexation ({failed} au total): {errors}")
+    return success, failed
+
+
+def _chain_callbacks(*callbacks):
+    """Combine des rappels `(op_type, _id)` ; None si aucun n'est fourni."""
+    callbacks = [callback for callback in callbacks if callback is not None]
+    if not callbacks:
+        return None
+
+    def call(op_type, _id):
+        for callback in callbacks:
+            callback(op_type, _id)
+    return call
+
+
+def is_resumable_generation(index):
+    """Vrai si `index` est une génération partiellement construite, pas encore servie par l'alias."""
+    es = get_es_client()
+    return es is not None and bool(es.indices.exists(index=index)) and index not in get_alias_targets(es)
+
+
+def index_mapping_digest():
+    """Empreinte du mapping courant : une passe incrémentale exige une génération construite avec lui.
+
+    Avec la recherche sémantique, elle couvre aussi les paramètres de vectorisation.
+    """
+    body = build_index_body()
+    if semantic_search_available():
+        return fingerprint({'index': body, 'embedding': embedding_signature()})
+    return fingerprint(body)
+
+
+def index_data_in_elasticsearch(documents, stats=None, fingerprints=None, new_index=None, resume=False, on_settled=None,
+                                complete=None):
+    """Construit une nouvelle génération d'index puis y bascule l'alias de lecture.
+
+    Le chargement se fait via `streaming_bulk`, par paquets de taille bornée, sans
+    réplique ni rafraîchissement ; l'alias continue de servir l'ancienne génération
+    jusqu'à la bascule atomique. `documents` peut être un générateur. Si un
+    `FingerprintStore` est fourni, il décrit la nouvelle génération après la bascule.
+
+    Avec `resume`, la génération `new_index` déjà partiellement chargée est
+    complétée au lieu d'être créée. `on_settled(op_type, _id)` est appelé pour
+    chaque document acquitté.
+
+    `complete` est évalué une fois la collecte terminée : s'il est faux (une
+    source a échoué), la nouvelle génération ne contient pas tout le corpus.
+    Elle est alors supprimée sans bascule ni purge : la dernière génération
+    complète reste servie et conservée, et les empreintes restent les siennes.
+    """
+    es = get_es_client()
+    if es is None:
+        return 0, "Client Elasticsearch non disponible."
+
+    new_index = new_index or generation_index_name()
     try:
-        if es.indices.exists(index=Config.ES_INDEX):
-            es.indices.delete(index=Config.ES_INDEX)
-        es.indices.create(index=Config.ES_INDEX, body=index_settings)
-
-        actions = [{"_op_type": "index", "_index": Config.ES_INDEX, "_id": item['uri'], "_source": item}
-                for item in all_data if item.get('name') and item.get('uri')]
-        
-        success, errors = bulk(es, actions, raise_on_error=False)
-        if errors: print(f"ERREURS pendant l'indexation: {errors}")
-
-        es.indices.refresh(index=Config.ES_INDEX)
-        message = f"Indexation terminée. {success} documents ajoutés."
+        if not resume:
+            es.indices.create(index=new_index, body=build_index_body())
+
+        documents = (item for item in documents if item.get('name') and item.get('uri'))
+        if fingerprints is not None:
+            fingerprints.begin_full_build(resume)
+            documents = fingerprints.track_full_build(documents)
+        actions = _index_actions(documents, new_index)
+        on_success = _chain_callbacks(fingerprints.stage_indexed if fingerprints is not None else None, on_settled)
+        success, _ = _bulk_actions(es, actions, stats, on_success)
+
+        if complete is not None and not complete():
+            es.indices.delete(index=new_index)
+            if fingerprints is not None:
+                fingerprints.abort_full_build()
+            return 0, f"Collecte incomplète : {new_index} est abandonnée, la génération actuelle est conservée."
+
+        if success == 0 and not resume:
+            es.indices.delete(index=new_index)
+            return 0, "Aucun document indexé : la génération actuelle est conservée."
+
+        es.indices.put_settings(index=new_index, settings={
+            "index": {"refresh_interval": Config.ES_REFRESH_INTERVAL, "number_of_replicas": Config.ES_NUMBER_OF_REPLICAS}
+        })
+        with span(INDEXING_STAGE_SECONDS, stage='refresh', source=''):
+            es.indices.refresh(index=new_index)
+        warm_index(es, new_index)
+        swap_index_alias(es, new_index)
+        invalidate_index_generation()
+        if fingerprints is not None:
+            fingerprints.commit_full_build(new_index, index_mapping_digest())
+        pruned = prune_index_generations(es)
+        if pruned: print(f"Anciennes générations supprimées : {', '.join(pruned)}")
+
+        message = f"Indexation terminée. {success} documents ajoutés dans {new_index}."
         return success, message
+    except IndexingAborted:
+        raise
     except Exception as e:
+        try:
+            if new_index not in get_alias_targets(es) and es.indices.exists(index=new_index):
+                es.indices.delete(index=new_index)
+        except Exception as cleanup_error:
+            print(f"Impossible de supprimer la génération incomplète {new_index}: {cleanup_error}")
         error_message = f"Erreur lors de l'indexation: {e}"
         return 0, error_message
 
-class QueryParser:
-    """Analyse une chaîne de requête pour en extraire des filtres structurés."""
-    def __init__(self, query_text):
-        self.raw_query = query_text
-        self.query_to_parse = f" {query_text.lower()} "
-        self.must_clauses = []
-        self.filter_clauses = []
-        self.detected_type = None
-        self.extractors = [
-            self._extract_entity_type, self._extract_year, self._extract_director,
-            self._extract_generic_attribute, self._extract_nationality
-        ]
-
-    def parse(self):
-        """Lance tous les extracteurs et retourne les clauses."""
-        for extractor in self.extractors:
-            extractor()
-        return self.must_clauses, self.filter_clauses
-
-    def _remove_match_from_query(self, text_to_remove):
-        self.query_to_parse = self.query_to_parse.replace(text_to_remove.lower(), " ")
-
-    def _extract_entity_type(self):
-        type_keywords = {
-            'film': ['film', 'films'],
-            'chercheur': ['chercheur', 'chercheurs', 'scientifique', 'scientifiques'],
-            'pays': ['pays']
-        }
-        for type_name, keywords in type_keywords.items():
-            for keyword in keywords:
-                if f" {keyword} " in self.query_to_parse:
-                    self.detected_type = type_name
-                    self.filter_clauses.append({"term": {"type": self.detected_type}})
-                    self._remove_match_from_query(keyword)
-                    return
-
-    def _extract_year(self):
-        match = re.search(r'\b(avant|après|en|depuis|dans les années)\s*(\d{4})\b', self.query_to_parse, re.IGNORECASE)
-        if match:
-            qualifier, year_str = match.groups()
-            year = int(year_str)
-            range_query = {}
-            if qualifier == 'avant': range_query['lte'] = f"{year}-12-31"
-            elif qualifier in ['après', 'depuis']: range_query['gte'] = f"{year}-01-01"
-            elif "années" in qualifier:
-                range_query['gte'] = f"{year}-01-01"
-                range_query['lte'] = f"{year+9}-12-31"
-            else:
-                range_query['gte'] = f"{year}-01-01"
-                range_query['lte'] = f"{year}-12-31"
-            
-            date_fields = []
-            if self.detected_type != 'film': date_fields.append("details.birth_date")
-            if self.detected_type != 'chercheur': date_fields.append("details.release_date")
-            
-            if date_fields:
-                self.filter_clauses.append({"bool": {"should": [{"range": {field: range_query}} for field in date_fields], "minimum_should_match": 1}})
-            self._remove_match_from_query(match.group(0))
-
-    def _extract_director(self):
-        match = re.search(r'(?:film de|réalisé par|par)\s+([\w\s-]+)', self.query_to_parse, re.IGNORECASE)
-        if match:
-            director_name = match.group(1).strip()
-            self.must_clauses.append({"match_phrase": {"details.director": director_name}})
-            if not self.detected_type: self.filter_clauses.append({"term": {"type": "film"}})
-            self._remove_match_from_query(match.group(0))
-            self._remove_match_from_query(director_name)
-
-    def _extract_generic_attribute(self):
-        attributes = {
-            'genre': ('genre', 'film'),
-            'domaine': ('domain', 'chercheur')
-        }
-        for keyword, (field, entity_type) in attributes.items():
-            match = re.search(fr'{keyword}\s+([\w\-]+)', self.query_to_parse, re.IGNORECASE)
-            if match:
-                value = match.group(1).strip()
-                self.must_clauses.append({"match": {f"details.{field}": value}})
-                if not self.detected_type: self.filter_clauses.append({"term": {"type": entity_type}})
-                self._remove_match_from_query(match.group(0))
-    
-    def _extract_nationality(self):
-        nationality_map = {"français": "France", "française": "France", "americain": "États-Unis", "americaine": "États-Unis", "britannique": "Royaume-Uni"}
-        for adj, country in nationality_map.items():
-            if f" {adj} " in self.query_to_parse:
-                self.must_clauses.append({"match": {"details.nationality": country}})
-                if not self.detected_type: self.filter_clauses.append({"term": {"type": "chercheur"}})
-                self._remove_match_from_query(adj)
-                return
 
-def search_in_elasticsearch(query_text, from_offset=0, size=10):
-    """
-    Effectue une recherche flexible en combinant des filtres stricts (extraits de la requête)
-    avec une recherche textuelle globale sur la requête originale.
-    """
+def get_delta_target(fingerprints):
+    """Index servi sur lequel appliquer une passe incrémentale, ou None s'il faut tout reconstruire."""
     es = get_es_client()
-    if not es or not query_text:
+    if es is None:
         return None
-
-    if not es.indices.exists(index=Config.ES_INDEX):
+    live = get_alias_targets(es)
+    if len(live) != 1 or not fingerprints.baseline_matches(live[0], index_mapping_digest()):
         return None
+    return live[0]
+
+
+def apply_delta_in_elasticsearch(documents, fingerprints, target_index, stats=None, deletions_allowed=None,
+                                 run=None, on_settled=None):
+    """Applique à la génération servie les seuls documents nouveaux, modifiés ou disparus.
+
+    `deletions_allowed` est évalué une fois la collecte terminée : les suppressions
+    ne sont émises que s'il retourne vrai (typiquement, aucune source en échec).
+    `run` reprend une passe interrompue ; `on_settled(op_type, _id)` est appelé pour
+    chaque document acquitté, ou écarté comme inchangé (`op_type` vaut alors 'noop').
+    """
+    es = get_es_client()
+    if es is None:
+        return 0, "Client Elasticsearch non disponible."
+    try:
+        fingerprints.begin_incremental_run(run)
+        on_unchanged = (lambda uri: on_settled('noop', uri)) if on_settled is not None else None
+        documents = fingerprints.changed_documents(
+            (item for item in documents if item.get('name') and item.get('uri')), on_unchanged)
+        actions = _index_actions(documents, target_index)
+        success, _ = _bulk_actions(es, actions, stats, _chain_callbacks(fingerprints.record_indexed, on_settled))
+
+        if deletions_allowed is None or deletions_allowed():
+            deletions = ({"_op_type": "delete", "_index": target_index, "_id": uri}
+                        for uri in fingerprints.stale_uris())
+            _bulk_actions(es, deletions, on_success=fingerprints.record_indexed)
+        else:
+            print("AVERTISSEMENT: collecte incomplète, aucune suppression appliquée.")
+        fingerprints.commit()
+
+        with span(INDEXING_STAGE_SECONDS, stage='refresh', source=''):
+            es.indices.refresh(index=target_index)
+        counts = fingerprints.counts
+        if counts['added'] or counts['updated'] or counts['deleted']:
+            es.indices.put_mapping(index=target_index, meta={"revision": int(time.time() * 1000)})
+            invalidate_index_generation()
+        message = (f"Indexation incrémentale terminée dans {target_index} : {counts['added']} ajoutés, "
+                   f"{counts['updated']} modifiés, {counts['unchanged']} inchangés, {counts['deleted']} supprimés.")
+        return success, message
+    except IndexingAborted:
+        fingerprints.commit()
+        raise
+    except Exception as e:
+        fingerprints.commit()
+        return 0, f"Erreur lors de l'indexation incrémentale: {e}"
+
+# `uri` (identique à `_id`) départage les scores égaux : le tri sur `_id` exige le fielddata, désactivé par défaut.
+SEARCH_SORT = [{"_score": {"order": "desc"}}, {"uri": {"order": "asc"}}]
+
+RANKINGS = ('lexical', 'hybrid')
 
-    parser = QueryParser(query_text)
-    must_clauses, filter_clauses = parser.parse()
+# Ce que transfère une recherche selon son usage : `page` se limite aux champs affichés par
+# index.html, la description étant remplacée par un extrait surligné calculé par
+# Elasticsearch ; `compact` à l'identité du document ; `full` renvoie tout le document.
+PAGE_SOURCE_FIELDS = ["name", "uri", "image", "type", "details.domain", "details.nationality", "details.birth_date",
+                      "details.director", "details.genre", "details.release_date", "details.capital", "details.continent"]
+SEARCH_VIEWS = {
+    'full': ({"excludes": ["suggest"]}, False),
+    'page': ({"includes": PAGE_SOURCE_FIELDS}, True),
+    'compact': ({"includes": ["name", "uri", "type"]}, True),
+}
+
+# Parties des réponses décodées par l'application : ni `_shards`, ni `_index`, ni `max_score`.
+SEARCH_FILTER_PATH = ["took", "hits.total", "hits.hits._id", "hits.hits._score", "hits.hits._source",
+                      "hits.hits.highlight", "hits.hits.sort"]
+MSEARCH_FILTER_PATH = (["responses.status", "responses.error", "responses.aggregations"]
+                       + [f"responses.{path}" for path in SEARCH_FILTER_PATH])
+
+def parse_search_query(query_text):
+    """Clauses (must, filter) extraites de la requête par le parseur."""
+    with span(SEARCH_PHASE_SECONDS, phase='parse'):
+        return QueryParser(query_text).parse()
+
+def build_search_query(query_text, parsed=None, selections=None):
+    """Construit la requête bool combinant les filtres extraits, les facettes choisies et la recherche plein texte."""
+    must_clauses, filter_clauses = parsed or parse_search_query(query_text)
+    filter_clauses = filter_clauses + facet_filter_clauses(selections)
 
     should_clauses = [
         {
             "multi_match": {
                 "query": query_text,  
-                "fields": [
-                    "name^4",          
-                    "description^2",  
-                    "details.director",
-                    "details.genre",
-                    "details.domain",
-                    "details.nationality"
-                ],
+                "fields": [field if boost == 1 else f"{field}^{boost}" for field, boost in SEARCH_FIELDS.items()],
                 "type": "best_fields",
                 "fuzziness": "AUTO"
             }
@@ -212,7 +473,7 @@ def search_in_elasticsearch(query_text, from_offset=0, size=10):
         }
     ]
 
-    search_query = {
+    return {
         "query": {
             "bool": {
                 "must": must_clauses,      
@@ -220,13 +481,664 @@ def search_in_elasticsearch(query_text, from_offset=0, size=10):
                 "should": should_clauses,    
                 "minimum_should_match": 1 if not must_clauses else 0
             }
+        },
+        "sort": SEARCH_SORT
+    }
+
+def view_body(view):
+    """Clauses `_source` et `highlight` d'une vue de `SEARCH_VIEWS`.
+
+    L'extrait (`no_match_size`) est le début de la description quand aucun terme
+    n'y correspond ; `encoder: html` l'échappe, hors balises `<mark>`.
+    """
+    source, snippet = SEARCH_VIEWS[view]
+    body = {"_source": source}
+    if snippet:
+        body["highlight"] = {
+            "encoder": "html", "pre_tags": ["<mark>"], "post_tags": ["</mark>"],
+            "fields": {"description": {"fragment_size": Config.SNIPPET_SIZE, "number_of_fragments": 1,
+                                       "no_match_size": Config.SNIPPET_SIZE}}
         }
+    return body
+
+def read_hits(response):
+    """Résultats et total d'une réponse de recherche ; `filter_path` omet la liste des hits quand elle est vide.
+
+    `served_by` indique la provenance des résultats (`elasticsearch` ou `local`).
+    """
+    return {'hits': response['hits'].get('hits', []), 'total': response['hits']['total']['value'],
+            'served_by': 'elasticsearch'}
+
+def build_hybrid_searches(query_text, from_offset, size, selections=None, view='full'):
+    """Corps BM25 et kNN d'une recherche hybride, chacun limité à la fenêtre de fusion.
+
+    La recherche kNN (HNSW, approximative) applique les mêmes filtres extraits
+    et les mêmes facettes que la requête lexicale ; les clauses `must` ne
+    servent qu'au classement BM25.
+    """
+    parsed = parse_search_query(query_text)
+    window = max(Config.RRF_WINDOW, from_offset + size)
+    lexical = build_search_query(query_text, parsed, selections)
+    lexical.update({"from": 0, "size": window, **view_body(view)})
+    with span(SEARCH_PHASE_SECONDS, phase='embed'):
+        vector = embed_query(query_text).tolist()
+    knn = {
+        "knn": {"field": "embedding", "query_vector": vector, "k": window,
+                "num_candidates": max(window, Config.KNN_NUM_CANDIDATES),
+                "filter": parsed[1] + facet_filter_clauses(selections)},
+        "size": window,
+        **view_body(view)
     }
-    
+    return [lexical, knn]
+
+def reciprocal_rank_fusion(hit_lists, rank_constant=None):
+    """Fusionne des listes classées par RRF : score(d) = somme des 1 / (constante + rang de d)."""
+    rank_constant = rank_constant or Config.RRF_RANK_CONSTANT
+    fused = {}
+    for hits in hit_lists:
+        for rank, hit in enumerate(hits, 1):
+            entry = fused.setdefault(hit['_id'], [0.0, hit])
+            entry[0] += 1.0 / (rank_constant + rank)
+    ranked = sorted(fused.values(), key=lambda entry: (-entry[0], entry[1]['_id']))
+    return [{**hit, '_score': score} for score, hit in ranked]
+
+def _loggable(body):
+    """Corps de recherche consignable : le vecteur de requête est remplacé par sa dimension."""
+    if 'knn' not in body:
+        return body
+    return {**body, 'knn': {**body['knn'], 'query_vector': f"<{len(body['knn']['query_vector'])} dimensions>"}}
+
+def _observe_search(query_text, dsl, response, elapsed, **context):
+    """Enregistre l'aller-retour et le `took` d'une recherche, et la consigne si elle est lente."""
+    SEARCH_PHASE_SECONDS.observe(elapsed, phase='es_request')
+    took = response.get('took')
+    if took is not None:
+        SEARCH_PHASE_SECONDS.observe(took / 1000, phase='es_took')
+    log_slow_query(query_text, dsl, elapsed, took, **context)
+
+def local_search(query_text, from_offset=0, size=10, selections=None, search_after=None, view='full'):
+    """Même contrat que `search_in_elasticsearch`, servi par le moteur local ; None sans index local.
+
+    La requête est construite par `build_search_query`, puis évaluée en mémoire
+    sur l'index mappé depuis `LOCAL_INDEX_DIR`. `search_after` reprend après la
+    valeur de tri `[score, uri]` d'un résultat précédent. La vue est appliquée
+    comme par Elasticsearch (filtre `_source`, extrait surligné).
+    """
+    index = get_local_index()
+    if index is None or not query_text:
+        return None
+    try:
+        query = build_search_query(query_text, selections=selections)["query"]
+        with span(SEARCH_PHASE_SECONDS, phase='local'):
+            results = index.search(query, from_offset, size, search_after)
+    except UnsupportedQuery as e:
+        print(f"Recherche locale impossible : {e}")
+        return None
+    results['served_by'] = 'local'
+    source, snippet = SEARCH_VIEWS[view]
+    for hit in results['hits']:
+        document = hit['_source']
+        hit['_source'] = filter_source(document, source)
+        if snippet and document.get('description'):
+            hit['highlight'] = {'description': [highlight_snippet(document['description'], query_text, Config.SNIPPET_SIZE)]}
+    return results
+
+def _serves_locally():
+    """Vrai si le moteur local répond en premier (`LOCAL_SEARCH=primary`) et décrit la génération servie."""
+    if Config.LOCAL_SEARCH != 'primary':
+        return False
+    index = get_local_index()
+    return index is not None and index.generation == get_index_generation()
+
+def search_in_elasticsearch(query_text, from_offset=0, size=10, selections=None, view='full'):
+    """
+    Effectue une recherche flexible en combinant des filtres stricts (extraits de la requête
+    et facettes choisies) avec une recherche textuelle globale sur la requête originale.
+    `view` (clé de `SEARCH_VIEWS`) choisit les champs renvoyés et l'extrait surligné.
+
+    Si Elasticsearch est injoignable, la recherche est servie par le moteur local
+    quand il est disponible ; avec `LOCAL_SEARCH=primary`, il répond en premier.
+    """
+    if not query_text:
+        return None
+    if _serves_locally():
+        return local_search(query_text, from_offset, size, selections, view=view)
+    es = get_search_client()
+    if not es:
+        return local_search(query_text, from_offset, size, selections, view=view)
+
     try:
-        print(json.dumps(search_query, indent=2, ensure_ascii=False))
-        response = es.search(index=Config.ES_INDEX, body=search_query, from_=from_offset, size=size)
-        return {'hits': response['hits']['hits'], 'total': response['hits']['total']['value']}
+        generation = get_index_generation()
+        if generation is None:
+            return None
+
+        cache = get_result_cache()
+        cache_key = make_cache_key('search', generation, normalize_query(query_text), from_offset, size,
+                                   selection_key(selections), view)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        search_query = build_search_query(query_text, selections=selections)
+        search_query.update(view_body(view))
+        start = time.perf_counter()
+        response = es.search(index=Config.ES_INDEX, body=search_query, from_=from_offset, size=size,
+                             filter_path=SEARCH_FILTER_PATH)
+        _observe_search(query_text, search_query, response, time.perf_counter() - start, offset=from_offset, size=size)
+        get_cluster_state().record_success()
+        results = read_hits(response)
+        cache.set(cache_key, results)
+        return results
     except Exception as e:
+        get_cluster_state().record_failure(e)
         print(f"Erreur lors de la recherche : {e}")
-        return None
\ No newline at end of file
+        return local_search(query_text, from_offset, size, selections, view=view)
+
+def _plan_batch(queries, ranking='lexical', selections=None, view='full'):
+    """Sert depuis le cache ce qui peut l'être et prépare le corps `_msearch` du reste.
+
+    `queries` est une liste de triplets (texte, offset, taille), tous restreints
+    aux mêmes facettes `selections` et renvoyés dans la même vue. En classement hybride, chaque requête
+    contribue deux recherches (BM25 et kNN) fusionnées ensuite ; sans recherche
+    sémantique disponible, le classement reste lexical.
+    Retourne (résultats partiels, [(position, clé de cache, texte, offset, taille,
+    nombre de recherches)], corps msearch) ou None si l'index n'existe pas.
+    """
+    generation = get_index_generation()
+    if generation is None:
+        return None
+    hybrid = ranking == 'hybrid' and semantic_search_available()
+    cache = get_result_cache()
+    results, pending, searches = [None] * len(queries), [], []
+    for position, (query_text, from_offset, size) in enumerate(queries):
+        cache_key = make_cache_key('hybrid' if hybrid else 'search', generation, normalize_query(query_text),
+                                   from_offset, size, selection_key(selections), view)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            results[position] = cached
+            continue
+        if hybrid:
+            bodies = build_hybrid_searches(query_text, from_offset, size, selections, view)
+        else:
+            bodies = [build_search_query(query_text, selections=selections)]
+            bodies[0].update({"from": from_offset, "size": size, **view_body(view)})
+        for body in bodies:
+            searches += [{"index": Config.ES_INDEX}, body]
+        pending.append((position, cache_key, query_text, from_offset, size, len(bodies)))
+    return results, pending, searches
+
+
+def _response_error(response):
+    error = response['error']
+    return error.get('reason', str(error)) if isinstance(error, dict) else str(error)
+
+
+def _fuse_hybrid(lexical, knn, from_offset, size):
+    """Page `from_offset`/`size` de la fusion RRF ; sans vecteurs dans l'index, le classement lexical seul."""
+    hit_lists = [lexical['hits'].get('hits', [])]
+    if 'error' in knn:
+        print(f"Recherche kNN impossible, classement lexical seul : {_response_error(knn)}")
+    else:
+        hit_lists.append(knn['hits'].get('hits', []))
+    fused = reciprocal_rank_fusion(hit_lists)
+    return {'hits': fused[from_offset:from_offset + size], 'total': len(fused), 'served_by': 'elasticsearch'}
+
+
+def _complete_batch(plan, responses):
+    """Range les réponses `_msearch` à leur position (après fusion en hybride) et alimente le cache."""
+    results, pending, _ = plan
+    cache = get_result_cache()
+    responses = iter(responses)
+    for position, cache_key, _, from_offset, size, parts in pending:
+        group = [next(responses) for _ in range(parts)]
+        if 'error' in group[0]:
+            results[position] = {'error': _response_error(group[0])}
+            continue
+        if parts == 1:
+            result = read_hits(group[0])
+        else:
+            result = _fuse_hybrid(group[0], group[1], from_offset, size)
+        cache.set(cache_key, result)
+        results[position] = result
+    return results
+
+
+def _observe_batch(plan, responses, elapsed):
+    """Enregistre l'aller-retour d'un `_msearch` ; chaque recherche est jugée lente sur son propre `took`."""
+    if not responses:
+        return
+    SEARCH_PHASE_SECONDS.observe(elapsed, phase='es_request')
+    _, pending, searches = plan
+    bodies = searches[1::2]
+    query_texts = [query_text for _, _, query_text, _, _, parts in pending for _ in range(parts)]
+    for query_text, body, response in zip(query_texts, bodies, responses):
+        took = response.get('took')
+        if took is None:
+            continue
+        SEARCH_PHASE_SECONDS.observe(took / 1000, phase='es_took')
+        log_slow_query(query_text, _loggable(body), took / 1000, took,
+                       offset=body.get('from', 0), size=body['size'], batch=len(bodies))
+
+
+def _local_batch(queries, selections=None, view='full'):
+    """Lot servi par le moteur local (classement lexical), ou None sans index local."""
+    if get_local_index() is None:
+        return None
+    results = [local_search(query_text, from_offset, size, selections, view=view)
+               for query_text, from_offset, size in queries]
+    return [result if result is not None else {'error': "Requête non prise en charge par le moteur local."}
+            for result in results]
+
+
+def _plan_facets(query_texts, selections=None):
+    """Sert depuis le cache les facettes qui peuvent l'être et prépare les recherches `size=0` du reste.
+
+    Retourne (facettes partielles, [(position, clé de cache)], corps msearch) ;
+    les corps sont à ajouter au `_msearch` des résultats, sans aller-retour de plus.
+    """
+    generation = get_index_generation()
+    cache = get_result_cache()
+    results, pending, searches = [None] * len(query_texts), [], []
+    if generation is None:
+        return results, pending, searches
+    for position, query_text in enumerate(query_texts):
+        cache_key = make_cache_key('facets', generation, normalize_query(query_text), selection_key(selections))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            results[position] = cached
+            continue
+        searches += [{"index": Config.ES_INDEX, "request_cache": True}, build_facet_search(query_text, selections)]
+        pending.append((position, cache_key))
+    return results, pending, searches
+
+
+def _complete_facets(plan, responses, selections=None):
+    """Lit les effectifs des réponses `size=0` et alimente le cache ; None pour une requête en erreur."""
+    results, pending, _ = plan
+    cache = get_result_cache()
+    for (position, cache_key), response in zip(pending, responses):
+        if 'error' in response:
+            print(f"Calcul des facettes impossible : {_response_error(response)}")
+            continue
+        results[position] = read_facets(response.get('aggregations', {}), selections)
+        cache.set(cache_key, results[position])
+    return results
+
+
+def _run_batch(es, queries, ranking='lexical', selections=None, view='full', facets=False):
+    """Planifie le lot, l'envoie en un `_msearch` réduit par `MSEARCH_FILTER_PATH` et range les réponses.
+
+    Avec `facets`, les recherches `size=0` des facettes non cachées partent dans
+    le même `_msearch` et chaque réponse sans erreur reçoit une entrée `facets`.
+    """
+    plan = _plan_batch(queries, ranking, selections, view)
+    if plan is None:
+        return None
+    facet_plan = _plan_facets([query_text for query_text, _, _ in queries], selections) if facets else None
+    searches = plan[2] + (facet_plan[2] if facet_plan else [])
+    start = time.perf_counter()
+    responses = es.msearch(searches=searches, filter_path=MSEARCH_FILTER_PATH)['responses'] if searches else []
+    split = len(plan[2]) // 2
+    _observe_batch(plan, responses[:split], time.perf_counter() - start)
+    get_cluster_state().record_success()
+    results = _complete_batch(plan, responses[:split])
+    if facet_plan is None:
+        return results
+    counts = _complete_facets(facet_plan, responses[split:], selections)
+    return [result if 'error' in result else {**result, 'facets': facet_counts}
+            for result, facet_counts in zip(results, counts)]
+
+
+def msearch_in_elasticsearch(queries, ranking='lexical', selections=None, view='full', facets=False):
+    """Exécute un lot de recherches en un seul aller-retour `_msearch` (hors entrées déjà en cache).
+
+    Avec `facets`, les effectifs par facette de chaque requête voyagent dans le
+    même `_msearch`. Sans Elasticsearch, ou avec `LOCAL_SEARCH=primary`, le lot
+    est servi par le moteur local si possible, en classement lexical et sans facettes.
+    """
+    es = get_search_client()
+    if es is None or _serves_locally():
+        return _local_batch(queries, selections, view)
+    try:
+        return _run_batch(es, queries, ranking, selections, view, facets)
+    except Exception as e:
+        get_cluster_state().record_failure(e)
+        print(f"Erreur lors de la recherche groupée : {e}")
+        return _local_batch(queries, selections, view)
+
+
+def hybrid_search_in_elasticsearch(query_text, from_offset=0, size=10, selections=None, view='full', facets=False):
+    """Recherche hybride : BM25 et kNN approximatif en un seul `_msearch`, fusionnés par RRF.
+
+    Chaque liste est limitée à `max(RRF_WINDOW, from_offset + size)` résultats ;
+    le total retourné est la taille de la fusion. Sans recherche sémantique
+    disponible, le classement reste lexical. Avec `facets`, les effectifs
+    voyagent dans le même `_msearch`.
+    """
+    if not query_text:
+        return None
+    results = msearch_in_elasticsearch([(query_text, from_offset, size)], 'hybrid', selections, view, facets)
+    if results is None or 'error' in results[0]:
+        return None
+    return results[0]
+
+def encode_cursor(payload):
+    """Sérialise un état de pagination en jeton opaque pour l'URL."""
+    raw = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, query_text, selections=None):
+    """Décode un jeton de pagination ; None s'il est invalide ou émis pour une autre requête ou d'autres facettes."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(zlib.decompress(raw))
+    except (ValueError, zlib.error):
+        return None
+    if not isinstance(payload, dict) or payload.get('q') != _query_digest(query_text, selections):
+        return None
+    page = payload.get('p')
+    if not isinstance(page, int) or isinstance(page, bool) or page < 2:
+        return None
+    if payload.get('r', 'lexical') == 'hybrid':
+        return payload
+    history = payload.get('h')
+    if not _is_sort_position(payload.get('a')) or not isinstance(history, list) or len(history) > Config.CURSOR_HISTORY:
+        return None
+    if not all(position is None or _is_sort_position(position) for position in history):
+        return None
+    if payload.get('g') is not None and not isinstance(payload['g'], str):
+        return None
+    return payload
+
+
+def _is_sort_position(value):
+    """Vrai pour une valeur de tri `[score, uri]` telle que la renvoie `SEARCH_SORT`."""
+    return (isinstance(value, list) and len(value) == 2 and isinstance(value[0], (int, float))
+            and not isinstance(value[0], bool) and isinstance(value[1], str))
+
+
+def _query_digest(query_text, selections=None):
+    return make_cache_key('cursor', None, normalize_query(query_text), selection_key(selections))[-12:]
+
+
+def generation_indices(generation):
+    """Index concrets d'un identifiant de génération (`index:révision,...`)."""
+    return [part.rsplit(':', 1)[0] for part in generation.split(',')]
+
+
+class GenerationPit:
+    """Point-in-time partagé par toutes les pages de la génération servie.
+
+    Une génération ne change pas de contenu (toute écriture incrémentale fait
+    changer sa révision) : un seul point-in-time par processus suffit donc à tous
+    les curseurs qui en sont issus, au lieu d'un par visiteur. Il est renouvelé
+    quand son `PIT_KEEP_ALIVE_SECONDS` approche et l'ancien est fermé dès que la
+    génération change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = self.pit_id = None
+        self.renew_at = 0.0
+
+    def acquire(self, es, generation):
+        """Identifiant du point-in-time de `generation`, ouvert au besoin."""
+        stale = None
+        with self._lock:
+            now = time.monotonic()
+            if self.pit_id is None or self.generation != generation or now >= self.renew_at:
+                stale = self.pit_id
+                self.pit_id = es.open_point_in_time(index=",".join(generation_indices(generation)),
+                                                    keep_alive=f"{Config.PIT_KEEP_ALIVE_SECONDS}s")['id']
+                self.generation = generation
+            # Chaque recherche prolonge le point-in-time ; on le renouvelle à mi-vie pour ne jamais le voir expirer.
+            self.renew_at = now + Config.PIT_KEEP_ALIVE_SECONDS / 2
+            pit_id = self.pit_id
+        if stale is not None:
+            self.close(es, stale)
+        return pit_id
+
+    def discard(self, es, pit_id):
+        """Oublie un point-in-time refusé par le cluster (expiré ou fermé)."""
+        with self._lock:
+            if self.pit_id == pit_id:
+                self.pit_id = None
+        self.close(es, pit_id)
+
+    @staticmethod
+    def close(es, pit_id):
+        try:
+            es.close_point_in_time(id=pit_id)
+        except exceptions.ApiError:
+            pass
+
+
+_generation_pit = GenerationPit()
+
+
+def _search_after(es, query_text, cursor, size, selections=None, view='full', facets=False):
+    """Page suivante via search_after, dans la génération qui a servi la première page.
+
+    Tant que cette génération est servie, la recherche passe par son point-in-time
+    partagé ; après une bascule, elle interroge directement ses index concrets,
+    conservés pour le retour arrière (`ES_INDEX_RETENTION`). La page et, avec
+    `facets`, les effectifs non cachés partent dans un seul `_msearch`. Retourne
+    None si la génération a été supprimée entre-temps.
+    """
+    body = build_search_query(query_text, selections=selections)
+    body.update(size=size, search_after=cursor['a'], track_total_hits=True, **view_body(view))
+    generation = cursor.get('g')
+    concrete = {"index": ",".join(generation_indices(generation)) if generation else Config.ES_INDEX}
+    facet_plan = _plan_facets([query_text], selections) if facets else None
+    facet_searches = facet_plan[2] if facet_plan else []
+    pit_id = None
+    if generation is not None and generation == get_index_generation():
+        pit_id = _generation_pit.acquire(es, generation)
+        page_search = [{}, {**body, "pit": {"id": pit_id, "keep_alive": f"{Config.PIT_KEEP_ALIVE_SECONDS}s"}}]
+    else:
+        page_search = [concrete, body]
+    start = time.perf_counter()
+    responses = es.msearch(searches=page_search + facet_searches, filter_path=MSEARCH_FILTER_PATH)['responses']
+    if pit_id is not None and responses[0].get('status') == 404:
+        _generation_pit.discard(es, pit_id)
+        responses[0] = es.msearch(searches=[concrete, body], filter_path=MSEARCH_FILTER_PATH)['responses'][0]
+    response = responses[0]
+    if 'error' in response:
+        if response.get('status') == 404:
+            return None
+        raise RuntimeError(_response_error(response))
+    _observe_search(query_text, body, response, time.perf_counter() - start, page=cursor['p'], size=size)
+    results = read_hits(response)
+    if facet_plan is not None:
+        results['facets'] = _complete_facets(facet_plan, responses[1:], selections)[0]
+    return results
+
+
+def _hybrid_page(query_text, cursor, size, selections=None, view='full', facets=False):
+    """Page d'une recherche hybride : la fusion étant bornée, le curseur ne porte que le numéro de page."""
+    page = cursor['p'] if cursor else 1
+    results = hybrid_search_in_elasticsearch(query_text, (page - 1) * size, size, selections, view, facets)
+    if results is None:
+        return None
+    digest = _query_digest(query_text, selections)
+    next_cursor = encode_cursor({'q': digest, 'p': page + 1, 'r': 'hybrid'}) if page * size < results['total'] else None
+    prev_cursor = encode_cursor({'q': digest, 'p': page - 1, 'r': 'hybrid'}) if page > 2 else None
+    return {**results, 'page': page, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor, 'has_prev': page > 1}
+
+
+def _first_page(query_text, size, selections=None, view='full', facets=False):
+    """Première page lexicale ; avec `facets`, page et effectifs partent dans un seul `_msearch`."""
+    if not facets:
+        return search_in_elasticsearch(query_text, 0, size, selections, view)
+    results = msearch_in_elasticsearch([(query_text, 0, size)], 'lexical', selections, view, facets=True)
+    if results is None or 'error' in results[0]:
+        if results is not None:
+            print(f"Erreur lors de la recherche : {results[0]['error']}")
+        return None
+    return results[0]
+
+
+def search_with_cursor(query_text, cursor_token=None, size=10, ranking='lexical', selections=None, view='full',
+                       facets=False):
+    """Recherche paginée par curseur : le coût d'une page ne dépend pas de sa profondeur.
+
+    La première page passe par le cache de résultats, sans autre requête ; les
+    suivantes utilisent search_after dans la génération (`g`) qui a servi la
+    première, si bien qu'une réindexation en cours de navigation ne décale pas les
+    résultats. Le jeton de chaque page porte aussi la position (`a`) et
+    l'historique des positions précédentes (`h`, borné à `CURSOR_HISTORY`) pour le
+    lien « Précédent ». Un jeton émis pour un autre classement ou d'autres facettes,
+    ou dont la génération a été supprimée, ramène à la première page. Avec
+    `facets`, les effectifs (`facets`, None s'ils manquent) sont calculés dans le
+    même aller-retour que la page. `served_by` indique si la page provient
+    d'Elasticsearch (ou de son cache) ou du moteur local.
+    """
+    cursor = decode_cursor(cursor_token, query_text, selections) if cursor_token else None
+    if cursor is not None and cursor.get('r', 'lexical') != ranking:
+        cursor = None
+    if ranking == 'hybrid':
+        return _hybrid_page(query_text, cursor, size, selections, view, facets)
+    if cursor is not None:
+        es = get_search_client()
+        if es is None or _serves_locally():
+            results = local_search(query_text, 0, size, selections, cursor['a'], view)
+        else:
+            try:
+                results = _search_after(es, query_text, cursor, size, selections, view, facets)
+                get_cluster_state().record_success()
+                if results is None:
+                    print("Génération du curseur supprimée : retour à la première page.")
+                    cursor = None
+            except Exception as e:
+                get_cluster_state().record_failure(e)
+                print(f"Erreur lors de la recherche paginée : {e}")
+                results = local_search(query_text, 0, size, selections, cursor['a'], view)
+    if cursor is None:
+        results = _first_page(query_text, size, selections, view, facets)
+        page, history, generation = 1, [], get_index_generation()
+    else:
+        page, history, generation = cursor['p'], cursor['h'], cursor.get('g')
+    if results is None:
+        return None
+
+    digest = _query_digest(query_text, selections)
+    next_cursor = prev_cursor = None
+    hits = results['hits']
+    if hits and page * size < results['total']:
+        position = cursor['a'] if cursor else None
+        next_cursor = encode_cursor({'q': digest, 'p': page + 1, 'g': generation, 'a': hits[-1]['sort'],
+                                     'h': (history + [position])[-Config.CURSOR_HISTORY:]})
+    has_prev = page > 1 and (page == 2 or bool(history))
+    if page > 2 and history:
+        prev_cursor = encode_cursor({'q': digest, 'p': page - 1, 'g': generation, 'a': history[-1], 'h': history[:-1]})
+    return {**results, 'page': page, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor, 'has_prev': has_prev}
+
+
+def search_etag(query_text, ranking='lexical', selections=None, cursor_token=None, view='full', *extra):
+    """Validateur HTTP (ETag faible) d'une page de résultats, calculé sans appel à Elasticsearch.
+
+    Il dérive de la génération servie, de la requête telle que saisie, du
+    classement, des facettes, du curseur et de la vue : une réindexation change
+    tous les ETag. None quand la page n'est pas servie par la génération
+    courante (cluster injoignable, index absent).
+    """
+    generation = get_index_generation()
+    if generation is None or get_search_client() is None:
+        return None
+    key = make_cache_key('etag', generation, _serves_locally(), query_text, ranking,
+                         selection_key(selections), cursor_token, view, *extra)
+    return key.split(':', 1)[1][:24]
+
+
+def iter_indexed_documents(es, index=None, batch_size=1000):
+    """Parcourt les documents d'un index par ordre d'URI (`search_after`), sans vecteurs ni champ d'autocomplétion."""
+    body = {"size": batch_size, "sort": [{"uri": "asc"}], "_source": {"excludes": ["embedding", "suggest"]}}
+    while True:
+        hits = es.search(index=index or Config.ES_INDEX, body=body)['hits']['hits']
+        for hit in hits:
+            yield hit['_source']
+        if len(hits) < batch_size:
+            return
+        body["search_after"] = hits[-1]['sort']
+
+
+def refresh_local_index():
+    """Reconstruit l'index local à partir de la génération servie, s'il ne la décrit pas déjà.
+
+    Les documents sont relus depuis Elasticsearch, par ordre d'URI, plutôt que
+    depuis le flux de l'indexation : une passe incrémentale ou une tâche
+    reprise ne voit passer qu'une partie du corpus. Appelée par
+    `flask build-local-index`, ou après chaque indexation réussie avec
+    `LOCAL_INDEX_AUTO_REBUILD=1`. Retourne un message décrivant le résultat.
+    """
+    if not local_index_enabled():
+        return "Moteur local désactivé."
+    es = get_es_client()
+    invalidate_index_generation()
+    generation = get_index_generation()
+    if es is None or generation is None:
+        return "Index local non reconstruit : aucune génération servie."
+    current = get_local_index()
+    if current is not None and current.generation == generation:
+        return f"Index local déjà à jour ({generation})."
+    start = time.perf_counter()
+    indices = ','.join(generation_indices(generation))  # pas l'alias : une bascule en cours de lecture mélangerait deux générations
+    count = build_local_index(iter_indexed_documents(es, indices), generation)
+    elapsed = time.perf_counter() - start
+    observe_stage('local', elapsed)
+    return f"Index local reconstruit : {count} documents en {elapsed:.1f} s ({generation})."
+
+
+def build_facet_search(query_text, selections=None):
+    """Corps `size=0` des effectifs par facette pour une requête et une sélection.
+
+    Sans résultats à renvoyer, la réponse peut être servie par le cache de
+    requêtes des shards, qui la garde jusqu'au prochain rafraîchissement
+    modifiant l'index : parcourir les facettes ne coûte presque rien à chaud.
+    """
+    return {"size": 0, "query": build_search_query(query_text)["query"],
+            "aggs": build_facet_aggregations(selections)}
+
+
+SUGGEST_SOURCE_FIELDS = ["name", "type", "uri"]
+
+def suggest_names(prefix, size=None):
+    """Suggestions de noms pour un préfixe saisi, via le champ `completion` `suggest`.
+
+    Seuls les champs nécessaires à l'affichage sont renvoyés (`_source` filtré,
+    `filter_path`) ; les réponses sont mises en cache par génération d'index.
+    """
+    size = min(size or Config.SUGGEST_SIZE, Config.SUGGEST_SIZE)
+    prefix = " ".join(prefix.split())
+    es = get_search_client()
+    if es is None or len(prefix) < Config.SUGGEST_MIN_CHARS:
+        return []
+    try:
+        generation = get_index_generation()
+        if generation is None:
+            return []
+        cache = get_result_cache()
+        cache_key = make_cache_key('suggest', generation, normalize_query(prefix), size)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        response = es.options(request_timeout=Config.SUGGEST_TIMEOUT).search(
+            index=Config.ES_INDEX,
+            body={
+                "_source": SUGGEST_SOURCE_FIELDS,
+                "suggest": {"names": {"prefix": prefix, "completion": {"field": "suggest", "size": size, "skip_duplicates": True}}}
+            },
+            size=0,
+            filter_path="suggest.names.options._source"
+        )
+        get_cluster_state().record_success()
+        options = response.get('suggest', {}).get('names', [{}])[0].get('options', [])
+        suggestions = [option['_source'] for option in options]
+        cache.set(cache_key, suggestions)
+        return suggestions
+    except Exception as e:
+        get_cluster_state().record_failure(e)
+        print(f"Erreur lors de l'autocomplétion : {e}")
+        return []
@@ -0,0 +1,115 @@
+from config import Config
+
+# (paramètre d'URL, libellé, champ agrégé) ; les champs `.keyword` et `decade` sont ajoutés à l'indexation.
+FACETS = [
+    ('type', 'Type', 'type'),
+    ('genre', 'Genre', 'details.genre.keyword'),
+    ('domain', 'Domaine', 'details.domain.keyword'),
+    ('nationality', 'Nationalité', 'details.nationality.keyword'),
+    ('decade', 'Décennie', 'decade'),
+]
+FACET_NAMES = [name for name, _, _ in FACETS]
+FACET_FIELDS = {name: field for name, _, field in FACETS}
+NUMERIC_FACETS = {'decade'}
+FACET_ORDERS = {'decade': {'_key': 'desc'}}
+MAX_SELECTED_VALUES = 10
+MAX_VALUE_LENGTH = 200
+
+
+def decade_of(item):
+    """Décennie (ex. 1990) de la date de naissance ou de sortie d'un document, ou None."""
+    details = item.get('details') or {}
+    date = details.get('birth_date') or details.get('release_date')
+    if not date or not date[:4].isdigit():
+        return None
+    return int(date[:4]) // 10 * 10
+
+
+def parse_selections(values):
+    """Valide les valeurs choisies par facette (`{nom: [valeurs]}`) et retourne une sélection canonique.
+
+    Les facettes inconnues sont ignorées ; les valeurs sont dédoublonnées et
+    triées, pour que deux URL équivalentes partagent les mêmes clés de cache.
+    Lève ValueError avec un message destiné au client si une valeur est invalide.
+    """
+    selections = {}
+    for name in FACET_NAMES:
+        raw = values.get(name) or []
+        if isinstance(raw, (str, int)):
+            raw = [raw]
+        if not isinstance(raw, list) or len(raw) > MAX_SELECTED_VALUES:
+            raise ValueError(f"La facette '{name}' accepte une liste d'au plus {MAX_SELECTED_VALUES} valeurs.")
+        chosen = set()
+        for value in raw:
+            if name in NUMERIC_FACETS:
+                try:
+                    chosen.add(int(value))
+                except (TypeError, ValueError):
+                    raise ValueError(f"La facette '{name}' attend des valeurs entières.") from None
+            elif isinstance(value, str) and value.strip() and len(value) <= MAX_VALUE_LENGTH:
+                chosen.add(value.strip())
+            else:
+                raise ValueError(f"Valeur invalide pour la facette '{name}'.")
+        if chosen:
+            selections[name] = sorted(chosen)
+    return selections
+
+
+def selection_key(selections):
+    """Forme sérialisable et ordonnée d'une sélection, pour les clés de cache et les curseurs."""
+    return [[name, selections[name]] for name in FACET_NAMES if selections and selections.get(name)]
+
+
+def facet_filter_clauses(selections, exclude=None):
+    """Clauses `filter` d'une sélection : OU entre les valeurs d'une facette, ET entre facettes.
+
+    Ces clauses sont mises en cache par Elasticsearch (cache de requêtes du
+    nœud) et n'influent pas sur le score.
+    """
+    return [{"terms": {FACET_FIELDS[name]: values}}
+            for name, values in (selections or {}).items() if values and name != exclude]
+
+
+def build_facet_aggregations(selections):
+    """Agrégations disjonctives : chaque facette est comptée sous les filtres des *autres* facettes.
+
+    On peut ainsi élargir une sélection (choisir un second genre) sans perdre les
+    valeurs voisines. Le corps ne dépend que de la sélection : il est identique
+    d'une page à l'autre et se prête au cache de requêtes des shards.
+    """
+    aggregations = {}
+    for name, _, field in FACETS:
+        terms = {"field": field, "size": Config.FACET_SIZE}
+        if name in FACET_ORDERS:
+            terms["order"] = FACET_ORDERS[name]
+        aggregations[name] = {
+            "filter": {"bool": {"filter": facet_filter_clauses(selections, exclude=name)}},
+            "aggs": {"values": {"terms": terms}}
+        }
+    return aggregations
+
+
+def read_facets(aggregations, selections):
+    """Facettes à afficher : valeurs et effectifs, les valeurs choisies étant toujours présentes."""
+    facets = []
+    for name, label, _ in FACETS:
+        buckets = aggregations.get(name, {}).get('values', {}).get('buckets', [])
+        chosen = (selections or {}).get(name, [])
+        values = [{'value': bucket['key'], 'count': bucket['doc_count'], 'selected': bucket['key'] in chosen}
+                  for bucket in buckets]
+        listed = {entry['value'] for entry in values}
+        values += [{'value': value, 'count': None, 'selected': True} for value in chosen if value not in listed]
+        if values:
+            facets.append({'name': name, 'label': label, 'values': values})
+    return facets
+
+
+def toggle_selection(selections, name, value):
+    """Sélection obtenue en cochant ou décochant `value` dans la facette `name`."""
+    updated = {key: list(values) for key, values in (selections or {}).items()}
+    values = updated.setdefault(name, [])
+    if value in values:
+        values.remove(value)
+    else:
+        values.append(value)
+    return {key: sorted(values) for key, values in updated.items() if values}
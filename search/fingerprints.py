@@ -0,0 +1,167 @@
+import hashlib
+import json
+import sqlite3
+from config import Config
+
+DELTA_KEYS = ('added', 'updated', 'unchanged', 'deleted')
+
+
+def fingerprint(payload):
+    """Empreinte stable d'un document ou d'un mapping (JSON canonique haché en SHA-1)."""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+class FingerprintStore:
+    """Empreintes des documents présents dans la génération servie, persistées dans SQLite.
+
+    La table `fingerprints` décrit toujours l'index vers lequel pointe l'alias
+    (`meta.index_name`). Une reconstruction complète remplit `staging` puis la
+    publie d'un bloc ; une passe incrémentale met la table à jour document par
+    document, uniquement pour les actions bulk acquittées par Elasticsearch.
+    """
+    LOOKUP_BATCH = 500
+
+    def __init__(self, path=None):
+        self.connection = sqlite3.connect(path or Config.FINGERPRINT_DB, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS fingerprints (uri TEXT PRIMARY KEY, digest TEXT NOT NULL, run INTEGER NOT NULL DEFAULT 0);
+            CREATE TABLE IF NOT EXISTS staging (uri TEXT PRIMARY KEY, digest TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.counts = dict.fromkeys(DELTA_KEYS, 0)
+        self._pending = {}
+        self._run = 0
+
+    def close(self):
+        self.connection.close()
+
+    def _meta(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def baseline_matches(self, index_name, mapping_digest):
+        """Vrai si les empreintes décrivent bien `index_name` construit avec ce mapping."""
+        return self._meta('index_name') == index_name and self._meta('mapping') == mapping_digest
+
+    def _known_digests(self, uris):
+        placeholders = ','.join('?' * len(uris))
+        rows = self.connection.execute(f"SELECT uri, digest FROM fingerprints WHERE uri IN ({placeholders})", uris)
+        return dict(rows.fetchall())
+
+    def _classify(self, documents):
+        """Produit (statut, document, empreinte) par lots, avec une seule requête SQLite par lot."""
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= self.LOOKUP_BATCH:
+                yield from self._classify_batch(batch)
+                batch = []
+        if batch:
+            yield from self._classify_batch(batch)
+
+    def _classify_batch(self, batch):
+        known = self._known_digests([document['uri'] for document in batch])
+        for document in batch:
+            digest = fingerprint(document)
+            previous = known.get(document['uri'])
+            status = 'added' if previous is None else 'updated' if previous != digest else 'unchanged'
+            self.counts[status] += 1
+            yield status, document, digest
+
+    def begin_full_build(self, resume=False):
+        """Prépare une reconstruction ; une reprise conserve les empreintes déjà acquittées dans `staging`."""
+        self.counts = dict.fromkeys(DELTA_KEYS, 0)
+        self._pending = {}
+        if not resume:
+            self.connection.execute("DELETE FROM staging")
+            self.connection.commit()
+
+    def track_full_build(self, documents):
+        """Laisse passer tous les documents en comptant le delta par rapport à la génération servie."""
+        for _, document, digest in self._classify(documents):
+            self._pending[document['uri']] = digest
+            yield document
+
+    def stage_indexed(self, op_type, uri):
+        """Enregistre l'empreinte d'un document acquitté pendant une reconstruction complète."""
+        digest = self._pending.pop(uri, None)
+        if digest is not None:
+            self.connection.execute("INSERT OR REPLACE INTO staging (uri, digest) VALUES (?, ?)", (uri, digest))
+
+    def abort_full_build(self):
+        """Oublie une reconstruction abandonnée : les empreintes servies restent inchangées."""
+        self._pending = {}
+        with self.connection:
+            self.connection.execute("DELETE FROM staging")
+
+    def commit_full_build(self, index_name, mapping_digest):
+        """Publie les empreintes de la nouvelle génération une fois l'alias basculé."""
+        with self.connection:
+            self.counts['deleted'] = self.connection.execute(
+                "SELECT COUNT(*) FROM fingerprints WHERE uri NOT IN (SELECT uri FROM staging)").fetchone()[0]
+            self.connection.execute("DELETE FROM fingerprints")
+            self.connection.execute("INSERT INTO fingerprints (uri, digest, run) SELECT uri, digest, 0 FROM staging")
+            self.connection.execute("DELETE FROM staging")
+            self.connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                        [('index_name', index_name), ('mapping', mapping_digest)])
+
+    def begin_incremental_run(self, run=None):
+        """Ouvre une passe incrémentale ; reprendre une passe interrompue conserve son numéro `run`."""
+        self.counts = dict.fromkeys(DELTA_KEYS, 0)
+        self._pending = {}
+        self._run = run or (self.connection.execute("SELECT MAX(run) FROM fingerprints").fetchone()[0] or 0) + 1
+        return self._run
+
+    @property
+    def current_run(self):
+        return self._run
+
+    def changed_documents(self, documents, on_unchanged=None):
+        """Ne laisse passer que les documents nouveaux ou modifiés.
+
+        Tout document déjà connu est marqué comme vu pendant cette passe, même si
+        sa mise à jour échoue ensuite : il ne sera jamais pris pour une suppression.
+        `on_unchanged(uri)` n'est appelé qu'une fois ce marquage enregistré.
+        """
+        seen, unchanged = [], []
+        for status, document, digest in self._classify(documents):
+            if status != 'added':
+                seen.append((self._run, document['uri']))
+            if status == 'unchanged':
+                unchanged.append(document['uri'])
+            if len(seen) >= self.LOOKUP_BATCH:
+                self._mark_seen(seen, unchanged, on_unchanged)
+                seen, unchanged = [], []
+            if status != 'unchanged':
+                self._pending[document['uri']] = digest
+                yield document
+        self._mark_seen(seen, unchanged, on_unchanged)
+
+    def _mark_seen(self, rows, unchanged=(), on_unchanged=None):
+        if rows:
+            with self.connection:
+                self.connection.executemany("UPDATE fingerprints SET run = ? WHERE uri = ?", rows)
+        if on_unchanged is not None:
+            for uri in unchanged:
+                on_unchanged(uri)
+
+    def record_indexed(self, op_type, uri):
+        """Met à jour l'empreinte d'un document acquitté (index) ou l'oublie (delete)."""
+        if op_type == 'delete':
+            self.connection.execute("DELETE FROM fingerprints WHERE uri = ?", (uri,))
+            self.counts['deleted'] += 1
+            return
+        digest = self._pending.pop(uri, None)
+        if digest is not None:
+            self.connection.execute("INSERT OR REPLACE INTO fingerprints (uri, digest, run) VALUES (?, ?, ?)",
+                                    (uri, digest, self._run))
+
+    def commit(self):
+        self.connection.commit()
+
+    def stale_uris(self):
+        """URIs indexées lors d'une passe précédente mais absentes de la collecte courante."""
+        rows = self.connection.execute("SELECT uri FROM fingerprints WHERE run < ?", (self._run,))
+        for (uri,) in rows.fetchall():
+            yield uri
@@ -0,0 +1,318 @@
+import itertools
+import time
+from collections import deque
+from config import Config
+from search.es_utils import (
+    IndexingAborted, index_data_in_elasticsearch, apply_delta_in_elasticsearch, get_delta_target,
+    generation_index_name, index_mapping_digest, is_resumable_generation, invalidate_index_generation,
+    refresh_local_index
+)
+from search.fingerprints import FingerprintStore, DELTA_KEYS
+from search.local_engine import local_index_enabled
+from search.pipeline import PipelineStats, iter_documents, build_scientist_document, build_movie_document, build_country_document
+from search.wikidata_client import (
+    fetch_scientist_data, fetch_movie_data, fetch_country_data, fetch_sources_in_parallel
+)
+
+INDEXING_MODES = ('full', 'incremental')
+
+# (nom, collecte, transformation, attribut de Config donnant le nombre de lignes attendues)
+INDEXING_SOURCES = [
+    ('chercheurs', fetch_scientist_data, build_scientist_document, 'SCIENTIST_LIMIT'),
+    ('films', fetch_movie_data, build_movie_document, 'MOVIE_LIMIT'),
+    ('pays', fetch_country_data, build_country_document, 'COUNTRY_LIMIT'),
+]
+
+_SOURCE_END = object()
+
+
+class SourceProgress:
+    """Avancement d'une source : lignes lues et lignes dont le document est acquitté.
+
+    Chaque ligne reçoit un rang dans la source. `rows` est le rang de la plus
+    ancienne ligne non acquittée : tout ce qui le précède est dans l'index. Un
+    document rejeté par Elasticsearch bloque ce point, et sera donc retenté.
+    Les pages SPARQL étant paginées par clé, une source ne reprend qu'en début
+    de page : le point de reprise est le début de page (`page`) qui précède
+    `rows` et la plus grande URI lue avant lui (`after`).
+    """
+    def __init__(self, rows=0, done=False, page=0, after=None):
+        self.rows = rows
+        self.done = done
+        self.page = page if after is not None else 0  # point de reprise d'avant la pagination par clé : depuis le début
+        self.after = after
+        self.read = rows
+        self.exhausted = done
+        self._in_flight = deque()
+        self._settled = set()
+        self._page_keys = {self.page: after}
+        self._last_uri = after
+
+    def start(self):
+        """Recommence la lecture au point de reprise ; retourne (rang, URI) à transmettre à la collecte."""
+        self.read = self.page
+        self.exhausted = False
+        self._in_flight.clear()
+        self._settled.clear()
+        self._page_keys = {self.page: self.after}
+        self._last_uri = self.after
+        return self.page, self.after
+
+    def next_row(self, uri=None):
+        ordinal = self.read
+        if Config.SPARQL_PAGE_SIZE > 0 and ordinal % Config.SPARQL_PAGE_SIZE == 0:
+            self._page_keys.setdefault(ordinal, self._last_uri)
+        if uri is not None and (self._last_uri is None or uri > self._last_uri):
+            self._last_uri = uri
+        self.read += 1
+        self._in_flight.append(ordinal)
+        return ordinal
+
+    def settle(self, ordinal=None):
+        if ordinal is not None:
+            self._settled.add(ordinal)
+        while self._in_flight and self._in_flight[0] in self._settled:
+            self._settled.discard(self._in_flight.popleft())
+        self.rows = self._in_flight[0] if self._in_flight else self.read
+        self.done = self.exhausted and not self._in_flight
+        page = max(start for start in self._page_keys if start <= self.rows)
+        if page != self.page:
+            self.page, self.after = page, self._page_keys[page]
+            self._page_keys = {start: key for start, key in self._page_keys.items() if start >= page}
+
+    def finish(self):
+        self.exhausted = True
+        self.settle()
+
+
+class IndexingProgress:
+    """Avancement d'une indexation, rapporté périodiquement et sous forme de point de reprise.
+
+    Le point de reprise (`checkpoint()`) mémorise la génération en cours de
+    construction, la passe incrémentale et, pour chaque source, le nombre de
+    lignes acquittées. Il n'est écrit qu'après validation des empreintes
+    correspondantes, si bien qu'une reprise ne perd ni ne compte deux fois un
+    document. `reporter.update(...)` retourne faux si la tâche a changé de
+    propriétaire : l'indexation s'interrompt alors avec `IndexingAborted`.
+    """
+    def __init__(self, mode, checkpoint=None, reporter=None, fingerprints=None):
+        checkpoint = checkpoint or {}
+        self.mode = checkpoint.get('mode', mode)
+        self.index = checkpoint.get('index')
+        self.run = checkpoint.get('run')
+        self.reporter = reporter
+        self.fingerprints = fingerprints
+        self.sources = {label: SourceProgress(**checkpoint.get('sources', {}).get(label, {}))
+                        for label, _, _, _ in INDEXING_SOURCES}
+        self.pending = {}
+        self.stage, self.message = 'initialisation', 'Initialisation...'
+        self.stats = PipelineStats()
+        self.failed_sources = []
+        self.started_at = time.monotonic()
+        self.settled_at_start = self.processed()
+        self._flushed_at = 0.0
+
+    def restart(self, mode, index, run=None):
+        """Abandonne le point de reprise : nouvelle génération (ou passe) à partir de zéro."""
+        self.mode, self.index, self.run = mode, index, run
+        self.sources = {label: SourceProgress() for label in self.sources}
+        self.settled_at_start = 0
+
+    def resumes(self):
+        return any(source.rows or source.done for source in self.sources.values())
+
+    def row(self, label, uri=None):
+        return self.sources[label].next_row(uri)
+
+    def track(self, uri, label, ordinal):
+        self.pending.setdefault(uri, deque()).append((label, ordinal))
+
+    def exhausted(self, label):
+        self.sources[label].finish()
+
+    def settle(self, op_type, uri):
+        """Rappel des acquittements bulk (et des documents inchangés) : fait avancer la source."""
+        entries = self.pending.get(uri)
+        if not entries:
+            return
+        label, ordinal = entries.popleft()
+        if not entries:
+            del self.pending[uri]
+        self.sources[label].settle(ordinal)
+        self.maybe_flush()
+
+    def collection_complete(self):
+        """Vrai si chaque source a été lue jusqu'au bout : seules ses suppressions sont alors sûres."""
+        return not self.failed_sources and all(source.exhausted for source in self.sources.values())
+
+    def processed(self):
+        return sum(source.rows for source in self.sources.values())
+
+    def expected(self):
+        """Lignes attendues : la limite configurée, ou le nombre réel pour une source terminée."""
+        total = 0
+        for label, _, _, limit_attr in INDEXING_SOURCES:
+            source = self.sources[label]
+            total += source.rows if source.done else max(getattr(Config, limit_attr), source.read)
+        return total
+
+    def eta(self):
+        """Secondes restantes estimées d'après le débit de cette tentative, ou None."""
+        done = self.processed() - self.settled_at_start
+        elapsed = time.monotonic() - self.started_at
+        if done <= 0 or elapsed <= 0:
+            return None
+        return max(0.0, (self.expected() - self.processed()) / (done / elapsed))
+
+    def checkpoint(self):
+        return {
+            'mode': self.mode, 'index': self.index,
+            'run': (self.fingerprints.current_run if self.fingerprints is not None else None) or self.run,
+            'sources': {label: {'rows': source.rows, 'done': source.done, 'page': source.page, 'after': source.after}
+                        for label, source in self.sources.items()},
+        }
+
+    def snapshot(self):
+        eta = self.eta()
+        return {
+            'stage': self.stage, 'message': self.message,
+            'processed': self.processed(), 'expected': self.expected(),
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'stages': self.stats.as_dict(), 'checkpoint': self.checkpoint(),
+        }
+
+    def set_stage(self, stage, message):
+        self.stage, self.message = stage, message
+        self.flush()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed_at >= Config.JOB_CHECKPOINT_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Valide les empreintes acquittées puis publie l'avancement et le point de reprise."""
+        self._flushed_at = time.monotonic()
+        if self.fingerprints is not None:
+            self.fingerprints.commit()
+        if self.reporter is not None and not self.reporter.update(**self.snapshot()):
+            raise IndexingAborted("La tâche a été reprise par un autre exécuteur.")
+
+    def finishing(self, documents):
+        """Laisse passer les documents puis signale l'étape de finalisation (bascule, suppressions)."""
+        yield from documents
+        self.set_stage('finalisation', "Collecte terminée, finalisation de l'index...")
+
+
+def stream_all_documents(progress):
+    """Collecte les sources en parallèle, chacune depuis son point de reprise.
+
+    L'échec d'une source n'interrompt pas les autres ; elle est ajoutée à
+    `progress.failed_sources` pour que l'appelant sache si la collecte est
+    complète. Les sources déjà terminées lors d'une tentative précédente sont
+    ignorées.
+    """
+    builders = {label: builder for label, _, builder, _ in INDEXING_SOURCES}
+    sources = []
+    for label, fetch, _, _ in INDEXING_SOURCES:
+        source = progress.sources[label]
+        if source.done:
+            continue
+        start, after = source.start()
+        sources.append((label, lambda fetch=fetch, start=start, after=after: itertools.chain(fetch(start, after), [_SOURCE_END])))
+    labels = ', '.join(label for label, _ in sources) or 'aucune source restante'
+    progress.set_stage('collecte', f"Collecte parallèle ({labels}) et indexation en flux...")
+
+    def on_source_error(label, error):
+        print(f"AVERTISSEMENT: Échec de la collecte des {label}: {error}")
+        progress.failed_sources.append(label)
+        progress.message = f"Erreur lors de la collecte des {label}, poursuite avec les autres sources..."
+
+    def rows():
+        for label, row in fetch_sources_in_parallel(sources, on_source_error):
+            if row is _SOURCE_END:
+                progress.exhausted(label)
+            else:
+                yield label, row
+
+    def build(tagged_row):
+        label, row = tagged_row
+        ordinal = progress.row(label, row.get('item', {}).get('value'))
+        document = builders[label](row)
+        if document.get('name') and document.get('uri'):
+            progress.track(document['uri'], label, ordinal)
+        else:
+            progress.sources[label].settle(ordinal)
+        return document
+
+    yield from iter_documents(rows(), build, progress.stats)
+
+
+def run_indexing_task(mode=None, reporter=None):
+    """Tâche d'indexation en flux : SPARQL -> documents -> bulk, sans matérialiser le corpus.
+
+    En mode incrémental, seuls les documents nouveaux, modifiés ou disparus sont
+    envoyés à la génération servie ; sans génération de référence exploitable,
+    la tâche se rabat sur une reconstruction complète. Si `reporter` porte un
+    point de reprise compatible, la tâche complète la génération (ou la passe)
+    interrompue au lieu de repartir de zéro. Avec `LOCAL_INDEX_AUTO_REBUILD`,
+    l'index du moteur local est ensuite reconstruit à partir de la génération
+    servie. Retourne le statut final.
+    """
+    mode = mode or Config.INDEXING_MODE
+    fingerprints = FingerprintStore()
+    progress = IndexingProgress(mode, getattr(reporter, 'checkpoint', None), reporter, fingerprints)
+    status = {'mode': mode, 'final_count': 0, 'delta': dict.fromkeys(DELTA_KEYS, 0), 'failed': True, 'aborted': False}
+
+    try:
+        target_index = get_delta_target(fingerprints) if mode == 'incremental' else None
+        if mode == 'incremental' and target_index is None:
+            print("Aucune génération de référence pour l'indexation incrémentale : reconstruction complète.")
+            mode = status['mode'] = 'full'
+
+        resume = progress.resumes() and progress.mode == mode and progress.index is not None and (
+            progress.index == target_index if mode == 'incremental' else is_resumable_generation(progress.index))
+        if resume:
+            print(f"Reprise de l'indexation ({mode}) sur {progress.index} : {progress.checkpoint()['sources']}")
+        else:
+            progress.restart(mode, target_index or generation_index_name())
+
+        documents = stream_all_documents(progress)
+        first_document = next(documents, None)
+        if first_document is None and not resume:
+            final_message = "Aucun document n'a été collecté pour l'indexation."
+        else:
+            documents = progress.finishing(itertools.chain([first_document] if first_document else [], documents))
+            if target_index is not None:
+                count, final_message = apply_delta_in_elasticsearch(
+                    documents, fingerprints, target_index, progress.stats,
+                    deletions_allowed=progress.collection_complete,
+                    run=progress.run if resume else None, on_settled=progress.settle)
+            else:
+                count, final_message = index_data_in_elasticsearch(
+                    documents, progress.stats, fingerprints, new_index=progress.index, resume=resume,
+                    on_settled=progress.settle, complete=progress.collection_complete)
+            status['final_count'] = count
+            status['delta'] = dict(fingerprints.counts)
+            if target_index is not None:
+                status['failed'] = count == 0 and not any(status['delta'].values())
+            else:
+                status['failed'] = not fingerprints.baseline_matches(progress.index, index_mapping_digest())
+            if not status['failed'] and Config.LOCAL_INDEX_AUTO_REBUILD and local_index_enabled():
+                progress.set_stage('local', "Construction de l'index de recherche local...")
+                try:
+                    print(refresh_local_index())
+                except Exception as e:
+                    print(f"AVERTISSEMENT: index de recherche local non reconstruit : {e}")
+
+    except IndexingAborted as e:
+        final_message = f"Indexation interrompue : {e}"
+        status['aborted'] = True
+    except Exception as e:
+        final_message = f"Une erreur critique est survenue durant le processus : {e}"
+    finally:
+        fingerprints.close()
+        invalidate_index_generation()
+    print(f"Indexation terminée. Message final : {final_message}")
+    print(f"Débit par étape : {progress.stats.as_dict()}")
+    return {**status, 'message': final_message, 'failed_sources': progress.failed_sources,
+            'processed': progress.processed(), 'stages': progress.stats.as_dict()}
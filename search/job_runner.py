@@ -0,0 +1,103 @@
+"""Exécuteur des tâches d'indexation, à lancer dans un processus séparé du serveur web.
+
+Usage : python -m search.job_runner [--once]
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+from config import Config
+from search.indexing import run_indexing_task
+from search.jobs import get_job_store
+from search.metrics import INDEXING_STAGE_SECONDS, merge_stage_records, series_records, stage_records
+
+
+def runner_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class JobReporter:
+    """Relaie l'avancement d'une tâche vers le magasin et maintient son bail.
+
+    Un thread renouvelle le bail toutes les `JOB_HEARTBEAT_INTERVAL` secondes,
+    même quand l'indexation attend une source lente. Dès qu'un renouvellement
+    échoue, la tâche est considérée comme perdue et `update` retourne faux.
+    Chaque renouvellement enregistre aussi les durées d'étapes observées depuis
+    la réclamation, ajoutées à celles des tentatives précédentes.
+    """
+    def __init__(self, store, job, owner):
+        self.store = store
+        self.job_id = job['id']
+        self.owner = owner
+        self.checkpoint = job['checkpoint']
+        self.previous_stages = job['stage_seconds'] or []
+        self.baseline = INDEXING_STAGE_SECONDS.snapshot()
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"job-{self.job_id}-heartbeat", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        while not self._stop.wait(Config.JOB_HEARTBEAT_INTERVAL):
+            self._renew()
+
+    def stage_seconds(self):
+        return series_records(merge_stage_records(self.previous_stages, stage_records(self.baseline)))
+
+    def _renew(self, **fields):
+        if not self.lost and not self.store.heartbeat(self.job_id, self.owner, stage_seconds=self.stage_seconds(), **fields):
+            print(f"Tâche d'indexation {self.job_id} : bail perdu, arrêt de cet exécuteur.")
+            self.lost = True
+        return not self.lost
+
+    def update(self, **fields):
+        self.checkpoint = fields.get('checkpoint', self.checkpoint)
+        return self._renew(**fields)
+
+
+def run_next_job(store=None, owner=None):
+    """Réclame et exécute une tâche ; retourne son statut final, ou None s'il n'y avait rien à faire."""
+    store = store or get_job_store()
+    owner = owner or runner_id()
+    job = store.claim(owner)
+    if job is None:
+        return None
+    resumed = " (reprise)" if job['checkpoint'] else ""
+    print(f"Tâche d'indexation {job['id']} ({job['mode']}, tentative {job['attempts']}){resumed} réclamée par {owner}.")
+    with JobReporter(store, job, owner) as reporter:
+        status = run_indexing_task(job['mode'], reporter)
+    if not status['aborted']:
+        store.finish(job['id'], owner, 'failed' if status['failed'] else 'done', stage_seconds=reporter.stage_seconds(), **status)
+    return status
+
+
+def run_worker(once=False):
+    """Boucle de l'exécuteur : traite les tâches au fil de l'eau, `JOB_POLL_INTERVAL` secondes entre deux sondages."""
+    store = get_job_store()
+    owner = runner_id()
+    print(f"Exécuteur d'indexation {owner} démarré (magasin {Config.JOB_DB}).")
+    while True:
+        status = run_next_job(store, owner)
+        if once and status is None:
+            return
+        if status is None:
+            time.sleep(Config.JOB_POLL_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--once', action='store_true', help="S'arrête dès qu'il n'y a plus de tâche à exécuter.")
+    args = parser.parse_args()
+    run_worker(args.once)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+from search.metrics import merge_stage_records
+
+ACTIVE_STATES = ('queued', 'running')
+JSON_FIELDS = ('delta', 'stages', 'checkpoint', 'failed_sources', 'stage_seconds')
+PROGRESS_FIELDS = ('stage', 'message', 'processed', 'expected', 'eta_seconds', 'final_count') + JSON_FIELDS
+
+
+def _encode(fields, exclude=()):
+    """Colonnes d'avancement à écrire, les champs structurés étant sérialisés en JSON."""
+    return {name: json.dumps(value) if name in JSON_FIELDS else value
+            for name, value in fields.items() if name in PROGRESS_FIELDS and name not in exclude}
+
+
+class JobStore:
+    """File des tâches d'indexation, partagée par tous les processus via SQLite.
+
+    Les processus web y déposent des tâches (`enqueue`) et lisent leur avancement ;
+    les exécuteurs les réclament (`claim`) sous un verrou d'écriture SQLite, ce qui
+    garantit qu'une seule indexation tourne à la fois sur l'ensemble des machines
+    partageant le fichier. L'exécuteur détient un bail qu'il renouvelle ; si son
+    processus meurt, le bail expire et la tâche est reprise par un autre exécuteur,
+    avec le dernier point de reprise enregistré.
+    """
+    def __init__(self, path=None):
+        self.connection = sqlite3.connect(path or Config.JOB_DB, timeout=30, isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    mode TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'queued',
+                    stage TEXT, message TEXT,
+                    processed INTEGER NOT NULL DEFAULT 0, expected INTEGER NOT NULL DEFAULT 0,
+                    eta_seconds REAL, final_count INTEGER NOT NULL DEFAULT 0,
+                    delta TEXT, stages TEXT, checkpoint TEXT, failed_sources TEXT, stage_seconds TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT, lease_expires REAL,
+                    created_at REAL NOT NULL, started_at REAL, updated_at REAL, finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+            """)
+            columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(jobs)")}
+            if 'stage_seconds' not in columns:
+                self.connection.execute("ALTER TABLE jobs ADD COLUMN stage_seconds TEXT")
+
+    def close(self):
+        self.connection.close()
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        for field in JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+    @contextmanager
+    def _write(self):
+        """Transaction d'écriture exclusive entre processus (BEGIN IMMEDIATE)."""
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._row(self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def latest(self):
+        """Tâche active s'il y en a une, sinon la plus récente."""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT * FROM jobs ORDER BY state IN ('queued', 'running') DESC, id DESC LIMIT 1").fetchone()
+            return self._row(row)
+
+    def stage_series(self):
+        """Durées d'étapes enregistrées par toutes les tâches, agrégées pour l'histogramme `indexing_stage_seconds`."""
+        with self._lock:
+            rows = self.connection.execute("SELECT stage_seconds FROM jobs WHERE stage_seconds IS NOT NULL").fetchall()
+        return merge_stage_records(*(json.loads(row['stage_seconds']) for row in rows))
+
+    def enqueue(self, mode):
+        """Dépose une tâche, sauf si une autre est déjà en attente ou en cours ; retourne (tâche, créée)."""
+        with self._write() as connection:
+            row = connection.execute(
+                "SELECT id FROM jobs WHERE state IN ('queued', 'running') ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                job_id, created = row['id'], False
+            else:
+                job_id = connection.execute(
+                    "INSERT INTO jobs (mode, stage, message, created_at) VALUES (?, 'attente', ?, ?)",
+                    (mode, "En attente d'un exécuteur d'indexation...", time.time())).lastrowid
+                created = True
+        return self.get(job_id), created
+
+    def claim(self, owner):
+        """Réclame la prochaine tâche pour `owner`, ou None si rien n'est à faire.
+
+        Une tâche en cours dont le bail a expiré est reprise en priorité ; tant qu'un
+        bail est valide, aucune autre tâche ne démarre. Une tâche ayant épuisé
+        `JOB_MAX_ATTEMPTS` tentatives est marquée en échec.
+        """
+        now = time.time()
+        with self._write() as connection:
+            running = connection.execute("SELECT * FROM jobs WHERE state = 'running' ORDER BY id LIMIT 1").fetchone()
+            if running is not None and running['lease_expires'] > now:
+                return None
+            row = running or connection.execute(
+                "SELECT * FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            if row['attempts'] >= Config.JOB_MAX_ATTEMPTS:
+                connection.execute(
+                    "UPDATE jobs SET state = 'failed', message = ?, owner = NULL, finished_at = ?, updated_at = ? WHERE id = ?",
+                    (f"Abandon après {row['attempts']} tentatives interrompues.", now, now, row['id']))
+                return None
+            connection.execute(
+                """UPDATE jobs SET state = 'running', owner = ?, lease_expires = ?, attempts = attempts + 1,
+                   started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?""",
+                (owner, now + Config.JOB_LEASE_SECONDS, now, now, row['id']))
+        return self.get(row['id'])
+
+    def heartbeat(self, job_id, owner, **fields):
+        """Renouvelle le bail et enregistre l'avancement ; faux si `owner` ne détient plus la tâche."""
+        now = time.time()
+        fields = _encode(fields)
+        assignments = ''.join(f", {name} = ?" for name in fields)
+        with self._write() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET lease_expires = ?, updated_at = ?{assignments} "
+                "WHERE id = ? AND owner = ? AND state = 'running'",
+                (now + Config.JOB_LEASE_SECONDS, now, *fields.values(), job_id, owner))
+            return cursor.rowcount == 1
+
+    def finish(self, job_id, owner, state, **fields):
+        """Clôt la tâche (`state` : 'done' ou 'failed') si `owner` la détient toujours."""
+        now = time.time()
+        fields = _encode(fields, exclude=('stage', 'eta_seconds'))
+        assignments = ''.join(f", {name} = ?" for name in fields)
+        with self._write() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET state = ?, stage = 'terminé', eta_seconds = NULL, owner = NULL, lease_expires = NULL, "
+                f"finished_at = ?, updated_at = ?{assignments} WHERE id = ? AND owner = ? AND state = 'running'",
+                (state, now, now, *fields.values(), job_id, owner))
+            return cursor.rowcount == 1
+
+
+def job_status(job):
+    """Statut JSON exposé par /check-status pour `job` (ou en l'absence de tâche)."""
+    if job is None:
+        return {'is_running': False, 'is_complete': False, 'state': None,
+                'message': 'Aucune indexation enregistrée.', 'final_count': 0, 'delta': {}, 'stages': {}}
+    lease_lost = job['state'] == 'running' and (job['lease_expires'] or 0) < time.time()
+    return {
+        'job_id': job['id'],
+        'state': job['state'],
+        'mode': job['mode'],
+        'stage': job['stage'],
+        'message': job['message'] + (" (exécuteur injoignable, reprise en attente)" if lease_lost else ""),
+        'is_running': job['state'] in ACTIVE_STATES,
+        'is_complete': job['state'] not in ACTIVE_STATES,
+        'processed': job['processed'],
+        'expected': job['expected'],
+        'eta_seconds': job['eta_seconds'],
+        'final_count': job['final_count'],
+        'delta': job['delta'] or {},
+        'stages': job['stages'] or {},
+        'failed_sources': job['failed_sources'] or [],
+        'attempts': job['attempts'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'updated_at': job['updated_at'],
+        'finished_at': job['finished_at'],
+    }
+
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Retourne le magasin de tâches singleton du processus."""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = JobStore()
+    return _job_store
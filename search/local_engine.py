@@ -0,0 +1,639 @@
+"""Moteur de recherche embarqué : index inversé sur tableaux NumPy, mappé en mémoire depuis le disque.
+
+Il sert de repli quand Elasticsearch est injoignable (`LOCAL_SEARCH=fallback`) ou
+de premier niveau à faible latence (`LOCAL_SEARCH=primary`). Il évalue le
+sous-ensemble du DSL produit par `build_search_query` : clauses `bool`, filtres
+`term`/`terms`/`range` du `QueryParser` et des facettes, `match`,
+`match_phrase` et `multi_match` (best_fields avec fuzziness, phrase). Le texte
+passe par la réplique Python de `french_custom` et le score est un BM25
+(k1=1.2, b=0.75) calculé par champ comme dans Lucene. Les positions n'étant pas
+conservées, une phrase est évaluée comme la présence de tous ses termes.
+"""
+import heapq
+import itertools
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from config import Config
+from search.analysis import SEARCH_FIELDS, analyze
+from search.facets import decade_of
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+KEYWORD_FIELDS = ('type', 'details.genre.keyword', 'details.domain.keyword', 'details.nationality.keyword', 'decade')
+DATE_FIELDS = ('details.birth_date', 'details.release_date')
+DROPPED_FIELDS = ('suggest', 'embedding')
+BM25_K1 = 1.2
+BM25_B = 0.75
+CURRENT_FILE = 'CURRENT'
+KEPT_BUILDS = 2
+_warned = False
+
+
+class UnsupportedQuery(Exception):
+    """Clause du DSL que le moteur local ne sait pas évaluer."""
+
+
+def local_index_enabled():
+    """Vrai si le moteur local est activé (`LOCAL_SEARCH`) et NumPy installé."""
+    global _warned
+    if Config.LOCAL_SEARCH == 'off':
+        return False
+    if np is None:
+        if not _warned:
+            print("AVERTISSEMENT: le paquet 'numpy' est absent, moteur de recherche local désactivé.")
+            _warned = True
+        return False
+    return True
+
+
+def _field_values(document, field):
+    """Valeurs d'un champ pointé ; `.keyword` désigne la valeur brute, `decade` est dérivé des dates."""
+    if field == 'decade':
+        decade = document.get('decade', decade_of(document))
+        return [] if decade is None else [decade]
+    value = document
+    for part in field.removesuffix('.keyword').split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def filter_source(document, spec, prefix=''):
+    """Filtre `_source` d'Elasticsearch ({'includes', 'excludes'}, champs pointés, sans jokers)."""
+    includes, excludes = spec.get('includes'), spec.get('excludes', ())
+    filtered = {}
+    for key, value in document.items():
+        path = prefix + key
+        if path in excludes:
+            continue
+        if includes is None or path in includes:
+            nested = isinstance(value, dict) and any(field.startswith(path + '.') for field in excludes)
+            filtered[key] = filter_source(value, {'excludes': excludes}, path + '.') if nested else value
+        elif isinstance(value, dict) and any(field.startswith(path + '.') for field in includes):
+            nested = filter_source(value, spec, path + '.')
+            if nested:
+                filtered[key] = nested
+    return filtered
+
+
+def _date_number(value):
+    """`AAAA-MM-JJ` -> AAAAMMJJ (entier comparable), 0 si absente ou illisible."""
+    digits = str(value or '')[:10].replace('-', '')
+    return int(digits) if len(digits) == 8 and digits.isdigit() else 0
+
+
+class _ArrayFile:
+    """Tableau NumPy écrit par morceaux dans un fichier brut, converti en `.npy` à la fermeture."""
+    def __init__(self, directory, name, dtype):
+        self.path = os.path.join(directory, f"{name}.npy")
+        self.dtype = np.dtype(dtype)
+        self.size = 0
+        self._raw = open(f"{self.path}.raw", 'wb')
+
+    def extend(self, values):
+        array = np.asarray(values, dtype=self.dtype)
+        array.tofile(self._raw)
+        self.size += len(array)
+
+    def close(self):
+        self._raw.close()
+        if not self.size:
+            np.save(self.path, np.zeros(0, dtype=self.dtype))
+        else:
+            target = np.lib.format.open_memmap(self.path, mode='w+', dtype=self.dtype, shape=(self.size,))
+            with open(f"{self.path}.raw", 'rb') as raw:
+                for start in range(0, self.size, Config.LOCAL_INDEX_CHUNK_SIZE):
+                    chunk = np.fromfile(raw, dtype=self.dtype, count=min(Config.LOCAL_INDEX_CHUNK_SIZE, self.size - start))
+                    target[start:start + len(chunk)] = chunk
+            target.flush()
+            del target
+        os.remove(f"{self.path}.raw")
+
+
+class _StringFile:
+    """Tableau de chaînes à largeur fixe (vocabulaire, URI) : une ligne JSON par valeur, largeur connue à la fin."""
+    def __init__(self, directory, name):
+        self.path = os.path.join(directory, f"{name}.npy")
+        self.size = 0
+        self.width = 1
+        self._raw = open(f"{self.path}.raw", 'w', encoding='utf-8')
+
+    def append(self, value):
+        self._raw.write(json.dumps(value, ensure_ascii=False) + '\n')
+        self.size += 1
+        self.width = max(self.width, len(value))
+
+    def close(self):
+        self._raw.close()
+        target = np.lib.format.open_memmap(self.path, mode='w+', dtype=f"<U{self.width}", shape=(self.size,))
+        with open(f"{self.path}.raw", encoding='utf-8') as raw:
+            for position, line in enumerate(raw):
+                target[position] = json.loads(line)
+        target.flush()
+        del target
+        os.remove(f"{self.path}.raw")
+
+
+def _read_run(path):
+    """Relit un segment de postings : (clé, identifiants, fréquences) par ordre de clé."""
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            *key, docs, frequencies = json.loads(line)
+            yield tuple(key), docs, frequencies
+
+
+def _merge_runs(paths):
+    """Fusionne des segments triés : (clé, identifiants, fréquences) par clé, postings dans l'ordre des documents.
+
+    Les segments sont écrits dans l'ordre des documents et `heapq.merge` rend
+    les clés égales dans l'ordre des segments : la concaténation reste triée.
+    """
+    merged = heapq.merge(*(_read_run(path) for path in paths), key=lambda entry: entry[0])
+    for key, entries in itertools.groupby(merged, key=lambda entry: entry[0]):
+        docs, frequencies = [], []
+        for _, run_docs, run_frequencies in entries:
+            docs.extend(run_docs)
+            frequencies.extend(run_frequencies)
+        yield key, docs, frequencies
+
+
+class _LocalIndexWriter:
+    """Écrit un index local en flux, en mémoire bornée.
+
+    Les colonnes par document (longueurs, dates, positions des sources) sont
+    ajoutées à des fichiers bruts ; les postings d'une tranche de
+    `LOCAL_INDEX_CHUNK_SIZE` documents sont écrits triés sur disque (un
+    segment), et les segments sont fusionnés à la fin dans les tableaux CSR.
+    """
+    def __init__(self, staging):
+        self.staging = staging
+        self.runs_directory = os.path.join(staging, 'runs')
+        os.makedirs(self.runs_directory)
+        self.count = 0
+        self.last_uri = None
+        self.uris = _StringFile(staging, 'uris')
+        self.source_offsets = _ArrayFile(staging, 'documents.offsets', np.int64)
+        self.source_offsets.extend([0])
+        self.source_position = 0
+        self.sources = open(os.path.join(staging, 'documents.jsonl'), 'wb')
+        self.lengths = {field: _ArrayFile(staging, f"{field}.length", np.float32) for field in SEARCH_FIELDS}
+        self.dates = {field: _ArrayFile(staging, f"date.{field}", np.int32) for field in DATE_FIELDS}
+        self.field_totals = {field: [0, 0] for field in SEARCH_FIELDS}  # documents avec le champ, termes
+        self.text_runs, self.keyword_runs = [], []
+        self._text_postings, self._keyword_postings = {}, {}
+        self._columns = self._empty_columns()
+
+    def _empty_columns(self):
+        return {'offsets': [], **{('length', field): [] for field in SEARCH_FIELDS},
+                **{('date', field): [] for field in DATE_FIELDS}}
+
+    def add(self, document):
+        uri = document['uri']
+        if self.last_uri is not None and uri <= self.last_uri:
+            raise ValueError(f"documents non triés par URI : {uri!r} après {self.last_uri!r}")
+        self.last_uri = uri
+        doc_id = self.count
+        self.count += 1
+        self.uris.append(uri)
+        for field in SEARCH_FIELDS:
+            terms = [term for value in _field_values(document, field) for term in analyze(str(value))]
+            self._columns[('length', field)].append(len(terms))
+            if terms:
+                self.field_totals[field][0] += 1
+                self.field_totals[field][1] += len(terms)
+            for term, count in Counter(terms).items():
+                self._text_postings.setdefault((term, field), []).append((doc_id, count))
+        for field in KEYWORD_FIELDS:
+            for value in set(_field_values(document, field)):
+                self._keyword_postings.setdefault((field, value), []).append((doc_id, 1))
+        for field in DATE_FIELDS:
+            self._columns[('date', field)].append(_date_number(next(iter(_field_values(document, field)), None)))
+        line = json.dumps(document, ensure_ascii=False).encode('utf-8') + b'\n'
+        self.sources.write(line)
+        self.source_position += len(line)
+        self._columns['offsets'].append(self.source_position)
+        if self.count % Config.LOCAL_INDEX_CHUNK_SIZE == 0:
+            self._spill()
+
+    def _spill(self):
+        """Écrit les postings et colonnes de la tranche en cours, puis les oublie."""
+        for runs, postings in ((self.text_runs, self._text_postings), (self.keyword_runs, self._keyword_postings)):
+            if not postings:
+                continue
+            path = os.path.join(self.runs_directory, f"{len(self.text_runs) + len(self.keyword_runs)}.jsonl")
+            with open(path, 'w', encoding='utf-8') as handle:
+                for key in sorted(postings):
+                    entries = postings[key]
+                    handle.write(json.dumps([*key, [doc_id for doc_id, _ in entries], [count for _, count in entries]],
+                                            ensure_ascii=False) + '\n')
+            runs.append(path)
+            postings.clear()
+        self.source_offsets.extend(self._columns['offsets'])
+        for field in SEARCH_FIELDS:
+            self.lengths[field].extend(self._columns[('length', field)])
+        for field in DATE_FIELDS:
+            self.dates[field].extend(self._columns[('date', field)])
+        self._columns = self._empty_columns()
+
+    def finish(self, generation):
+        """Fusionne les segments, écrit les tableaux CSR et `meta.json`."""
+        self._spill()
+        self.sources.close()
+        for array in (self.uris, self.source_offsets, *self.lengths.values(), *self.dates.values()):
+            array.close()
+
+        vocabulary = _StringFile(self.staging, 'vocabulary')
+        text = {field: (_ArrayFile(self.staging, f"{field}.offsets", np.int64),
+                        _ArrayFile(self.staging, f"{field}.docs", np.int32),
+                        _ArrayFile(self.staging, f"{field}.tf", np.float32)) for field in SEARCH_FIELDS}
+        sizes = dict.fromkeys(SEARCH_FIELDS, 0)
+        for offsets, _, _ in text.values():
+            offsets.extend([0])
+        terms = itertools.groupby(_merge_runs(self.text_runs), key=lambda entry: entry[0][0])
+        for term, entries in itertools.chain(terms, [] if self.text_runs else [('', [])]):
+            vocabulary.append(term)
+            by_field = {key[1]: (docs, frequencies) for key, docs, frequencies in entries}
+            for field, (offsets, docs, frequencies) in text.items():
+                field_docs, field_frequencies = by_field.get(field, ((), ()))
+                docs.extend(field_docs)
+                frequencies.extend(field_frequencies)
+                sizes[field] += len(field_docs)
+                offsets.extend([sizes[field]])
+        vocabulary.close()
+        for arrays in text.values():
+            for array in arrays:
+                array.close()
+
+        keywords = {field: [] for field in KEYWORD_FIELDS}
+        postings = {field: (_ArrayFile(self.staging, f"keyword.{field}.offsets", np.int64),
+                            _ArrayFile(self.staging, f"keyword.{field}.docs", np.int32)) for field in KEYWORD_FIELDS}
+        for offsets, _ in postings.values():
+            offsets.extend([0])
+        for (field, value), docs, _ in _merge_runs(self.keyword_runs):
+            keywords[field].append(value)
+            offsets, field_docs = postings[field]
+            field_docs.extend(docs)
+            offsets.extend([field_docs.size])
+        for arrays in postings.values():
+            for array in arrays:
+                array.close()
+        shutil.rmtree(self.runs_directory)
+
+        fields = {field: {'documents': documents, 'avgdl': total / documents if documents else 1.0}
+                  for field, (documents, total) in self.field_totals.items()}
+        with open(os.path.join(self.staging, 'meta.json'), 'w', encoding='utf-8') as handle:
+            json.dump({'generation': generation, 'documents': self.count, 'built_at': time.time(),
+                       'fields': fields, 'keywords': keywords}, handle, ensure_ascii=False)
+
+    def close(self):
+        self.sources.close()
+        for array in (self.uris, self.source_offsets, *self.lengths.values(), *self.dates.values()):
+            array._raw.close()
+
+
+def _build_directory(generation):
+    return re.sub(r"[^\w.-]", "_", generation)
+
+
+def build_local_index(documents, generation, directory=None):
+    """Construit l'index local de `documents` pour la génération `generation` puis le publie.
+
+    Les documents arrivent par ordre d'URI croissant (`iter_indexed_documents`) :
+    le rang d'un document est son identifiant, si bien que l'ordre des
+    identifiants départage les scores égaux comme le tri `uri` d'Elasticsearch.
+    Le corpus n'est jamais chargé en mémoire : voir `_LocalIndexWriter`.
+    L'index est écrit dans un répertoire temporaire, renommé, puis désigné par le
+    fichier `CURRENT` remplacé atomiquement : les processus qui servent
+    l'ancien index le remplacent dans les `LOCAL_INDEX_CHECK_INTERVAL` secondes.
+    Retourne le nombre de documents indexés.
+    """
+    global _local_checked
+    directory = directory or Config.LOCAL_INDEX_DIR
+    os.makedirs(directory, exist_ok=True)
+    staging = os.path.join(directory, f".build-{os.getpid()}-{threading.get_ident()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    writer = _LocalIndexWriter(staging)
+    try:
+        for document in documents:
+            if document.get('uri') and document.get('name'):
+                writer.add({key: value for key, value in document.items() if key not in DROPPED_FIELDS})
+        if not writer.count:
+            raise ValueError("aucun document à indexer localement")
+        writer.finish(generation)
+    except BaseException:
+        writer.close()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    target = os.path.join(directory, _build_directory(generation))
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(staging, target)
+    pointer = os.path.join(directory, f".{CURRENT_FILE}-{os.getpid()}")
+    with open(pointer, 'w', encoding='utf-8') as handle:
+        handle.write(os.path.basename(target))
+    os.replace(pointer, os.path.join(directory, CURRENT_FILE))
+    _prune_builds(directory, os.path.basename(target))
+    _local_checked = (None, float('-inf'))  # le processus qui publie voit le nouvel index sans attendre
+    return writer.count
+
+
+def _prune_builds(directory, current):
+    """Supprime les index locaux au-delà des `KEPT_BUILDS` plus récents (les processus qui les mappent encore gardent leurs fichiers)."""
+    builds = [entry for entry in os.listdir(directory)
+              if not entry.startswith('.') and os.path.isdir(os.path.join(directory, entry))]
+    builds.sort(key=lambda entry: os.path.getmtime(os.path.join(directory, entry)))
+    for entry in builds[:max(len(builds) - KEPT_BUILDS, 0)]:
+        if entry != current:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+def _edit_distance(left, right, limit):
+    """Distance de Damerau-Levenshtein restreinte (transpositions comprises, comme la fuzziness de Lucene), bornée par `limit`."""
+    previous2, previous = None, list(range(len(right) + 1))
+    for i, left_char in enumerate(left, 1):
+        current = [i] + [0] * len(right)
+        for j, right_char in enumerate(right, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (left_char != right_char))
+            if i > 1 and j > 1 and left_char == right[j - 2] and left[i - 2] == right_char:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _fuzzy_edits(term):
+    """Nombre de modifications admises par `fuzziness: AUTO` pour un terme de cette longueur."""
+    return 0 if len(term) < 3 else 1 if len(term) <= 5 else 2
+
+
+class LocalIndex:
+    """Index local en lecture seule, ouvert par mappage mémoire : l'ouverture ne lit que `meta.json`."""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as handle:
+            meta = json.load(handle)
+        self.generation = meta['generation']
+        self.count = meta['documents']
+        self.vocabulary = self._load('vocabulary')
+        self.uris = self._load('uris')
+        self.fields = {
+            field: (self._load(f"{field}.offsets"), self._load(f"{field}.docs"), self._load(f"{field}.tf"),
+                    self._load(f"{field}.length"), stats['documents'], stats['avgdl'])
+            for field, stats in meta['fields'].items()
+        }
+        self.keywords = {
+            field: ({value: position for position, value in enumerate(values)},
+                    self._load(f"keyword.{field}.offsets"), self._load(f"keyword.{field}.docs"))
+            for field, values in meta['keywords'].items()
+        }
+        self.dates = {field: self._load(f"date.{field}") for field in DATE_FIELDS}
+        self._source_offsets = self._load('documents.offsets')
+        with open(os.path.join(path, 'documents.jsonl'), 'rb') as handle:
+            self._sources = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._expansions = {}
+
+    def _load(self, name):
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+
+    def source(self, doc_id):
+        start, end = self._source_offsets[doc_id], self._source_offsets[doc_id + 1]
+        return json.loads(self._sources[start:end])
+
+    # --- Termes -------------------------------------------------------------
+
+    def _term_id(self, term):
+        position = int(np.searchsorted(self.vocabulary, term))
+        if position < len(self.vocabulary) and self.vocabulary[position] == term:
+            return position
+        return None
+
+    def _expand(self, term, fuzzy):
+        """Variantes (identifiant, poids) d'un terme analysé : lui-même et, en flou, ses voisins du vocabulaire.
+
+        Un voisin à `d` modifications pèse `1 - d / len(terme)`, comme dans les
+        requêtes floues de Lucene. Les candidats partagent la première lettre du
+        terme, ce qui borne la recherche à une tranche triée du vocabulaire.
+        """
+        key = (term, fuzzy)
+        variants = self._expansions.get(key)
+        if variants is not None:
+            return variants
+        exact = self._term_id(term)
+        variants = [(exact, 1.0)] if exact is not None else []
+        edits = _fuzzy_edits(term) if fuzzy else 0
+        if edits:
+            start = int(np.searchsorted(self.vocabulary, term[0]))
+            end = int(np.searchsorted(self.vocabulary, term[0] + '\uffff'))
+            candidates = self.vocabulary[start:end]
+            sizes = np.char.str_len(candidates)
+            for offset in np.flatnonzero(np.abs(sizes - len(term)) <= edits):
+                candidate = str(candidates[offset])
+                if candidate == term:
+                    continue
+                distance = _edit_distance(term, candidate, edits)
+                if distance <= edits:
+                    variants.append((start + int(offset), 1.0 - distance / len(term)))
+        if len(self._expansions) > 10000:
+            self._expansions.clear()
+        self._expansions[key] = variants
+        return variants
+
+    def _field_scores(self, field, terms, fuzzy=False, require_all=False):
+        """Scores BM25 d'un champ pour une liste de termes analysés, et masque des documents retenus."""
+        if field not in self.fields:
+            raise UnsupportedQuery(f"champ textuel inconnu : {field}")
+        offsets, docs, frequencies, lengths, with_field, avgdl = self.fields[field]
+        scores = np.zeros(self.count, dtype=np.float32)
+        matched = np.zeros(self.count, dtype=np.int32)
+        for term in terms:
+            best = np.zeros(self.count, dtype=np.float32)
+            for term_id, weight in self._expand(term, fuzzy):
+                start, end = offsets[term_id], offsets[term_id + 1]
+                if start == end:
+                    continue
+                ids, tf = docs[start:end], frequencies[start:end]
+                idf = np.log1p((with_field - (end - start) + 0.5) / ((end - start) + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / avgdl)
+                best[ids] = np.maximum(best[ids], weight * idf * tf / (tf + norm))
+            scores += best
+            matched += best > 0
+        mask = matched == len(terms) if require_all else matched > 0
+        if not terms:
+            mask = np.zeros(self.count, dtype=bool)
+        return scores, mask
+
+    # --- Évaluation du DSL --------------------------------------------------
+
+    def _keyword_mask(self, field, values):
+        if field not in self.keywords:
+            raise UnsupportedQuery(f"champ de filtre inconnu : {field}")
+        positions, offsets, docs = self.keywords[field]
+        mask = np.zeros(self.count, dtype=bool)
+        for value in values:
+            position = positions.get(value)
+            if position is not None:
+                mask[docs[offsets[position]:offsets[position + 1]]] = True
+        return mask
+
+    def _range_mask(self, field, bounds):
+        if field not in self.dates:
+            raise UnsupportedQuery(f"champ de plage inconnu : {field}")
+        dates = self.dates[field]
+        mask = dates != 0
+        for operator, value in bounds.items():
+            number = _date_number(value)
+            if operator == 'gte': mask &= dates >= number
+            elif operator == 'gt': mask &= dates > number
+            elif operator == 'lte': mask &= dates <= number
+            elif operator == 'lt': mask &= dates < number
+            else: raise UnsupportedQuery(f"opérateur de plage inconnu : {operator}")
+        return mask
+
+    def _text_query(self, spec):
+        """Paramètres d'une clause `match` / `match_phrase` : (champ, texte, boost)."""
+        (field, value), = spec.items()
+        if isinstance(value, dict):
+            return field, value.get('query', ''), value.get('boost', 1.0)
+        return field, value, 1.0
+
+    def evaluate(self, clause):
+        """Évalue une clause du DSL : (scores float32, masque booléen) sur tous les documents."""
+        (kind, spec), = clause.items()
+        zero = np.zeros(self.count, dtype=np.float32)
+        if kind == 'match_all':
+            return zero, np.ones(self.count, dtype=bool)
+        if kind == 'term':
+            (field, value), = spec.items()
+            return zero, self._keyword_mask(field, [value['value'] if isinstance(value, dict) else value])
+        if kind == 'terms':
+            (field, values), = spec.items()
+            return zero, self._keyword_mask(field, values)
+        if kind == 'range':
+            (field, bounds), = spec.items()
+            return zero, self._range_mask(field, bounds)
+        if kind in ('match', 'match_phrase'):
+            field, text, boost = self._text_query(spec)
+            scores, mask = self._field_scores(field, analyze(text), require_all=kind == 'match_phrase')
+            return scores * boost, mask
+        if kind == 'multi_match':
+            return self._multi_match(spec)
+        if kind == 'bool':
+            return self._bool(spec)
+        raise UnsupportedQuery(f"clause non prise en charge : {kind}")
+
+    def _multi_match(self, spec):
+        """`best_fields` (score du meilleur champ, flou possible) ou `phrase` (tous les termes présents)."""
+        terms = analyze(spec['query'])
+        match_type = spec.get('type', 'best_fields')
+        if match_type not in ('best_fields', 'phrase'):
+            raise UnsupportedQuery(f"multi_match de type {match_type}")
+        fuzzy = match_type == 'best_fields' and spec.get('fuzziness') == 'AUTO'
+        best = np.zeros(self.count, dtype=np.float32)
+        mask = np.zeros(self.count, dtype=bool)
+        for entry in spec['fields']:
+            field, _, boost = entry.partition('^')
+            scores, matched = self._field_scores(field, terms, fuzzy, require_all=match_type == 'phrase')
+            np.maximum(best, np.where(matched, scores * float(boost or 1), 0), out=best)
+            mask |= matched
+        return best * spec.get('boost', 1.0), mask
+
+    def _bool(self, spec):
+        def clauses(occur):
+            value = spec.get(occur, [])
+            return value if isinstance(value, list) else [value]
+
+        scores = np.zeros(self.count, dtype=np.float32)
+        mask = np.ones(self.count, dtype=bool)
+        for clause in clauses('must'):
+            clause_scores, clause_mask = self.evaluate(clause)
+            scores += clause_scores
+            mask &= clause_mask
+        for clause in clauses('filter'):
+            mask &= self.evaluate(clause)[1]
+        for clause in clauses('must_not'):
+            mask &= ~self.evaluate(clause)[1]
+        should = clauses('should')
+        if should:
+            default = 0 if clauses('must') or clauses('filter') else 1
+            required = int(spec.get('minimum_should_match', default))
+            satisfied = np.zeros(self.count, dtype=np.int32)
+            for clause in should:
+                clause_scores, clause_mask = self.evaluate(clause)
+                scores += np.where(clause_mask, clause_scores, 0)
+                satisfied += clause_mask
+            mask &= satisfied >= required
+        return scores * spec.get('boost', 1.0), mask
+
+    def search(self, query, from_offset=0, size=10, search_after=None):
+        """Exécute le corps `query` ; mêmes résultats que `search_in_elasticsearch` ({'hits', 'total'}).
+
+        Le tri est celui d'Elasticsearch (score décroissant puis URI) ; chaque hit
+        porte sa valeur de tri, que `search_after` accepte pour la page suivante.
+        """
+        scores, mask = self.evaluate(query)
+        total = int(np.count_nonzero(mask))
+        if search_after:
+            after_score, after_uri = np.float32(search_after[0]), search_after[-1]
+            after_id = int(np.searchsorted(self.uris, after_uri, side='right')) - 1
+            mask &= (scores < after_score) | ((scores == after_score) & (np.arange(self.count) > after_id))
+            from_offset = 0
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.lexsort((candidates, -scores[candidates]))][from_offset:from_offset + size]
+        hits = []
+        for doc_id in order:
+            score, uri = float(scores[doc_id]), str(self.uris[doc_id])
+            hits.append({'_index': f"local:{self.generation}", '_id': uri, '_score': score,
+                         '_source': self.source(doc_id), 'sort': [score, uri]})
+        return {'hits': hits, 'total': total}
+
+
+_local_index = None
+_local_pointer = None
+_local_checked = (None, float('-inf'))  # (répertoire, instant monotone) de la dernière lecture de `CURRENT`
+_local_lock = threading.Lock()
+
+
+def get_local_index():
+    """Index local publié, rouvert quand `CURRENT` change ; None s'il n'existe pas ou si le moteur est désactivé.
+
+    `CURRENT` est relu au plus toutes les `LOCAL_INDEX_CHECK_INTERVAL` secondes
+    (immédiatement si `LOCAL_INDEX_DIR` change) : entre deux relectures, la
+    recherche ne touche pas au système de fichiers.
+    """
+    global _local_index, _local_pointer, _local_checked
+    if not local_index_enabled():
+        return None
+    now = time.monotonic()
+    directory, checked_at = _local_checked
+    if directory == Config.LOCAL_INDEX_DIR and now - checked_at < Config.LOCAL_INDEX_CHECK_INTERVAL:
+        return _local_index
+    current = os.path.join(Config.LOCAL_INDEX_DIR, CURRENT_FILE)
+    try:
+        stat = os.stat(current)
+        pointer = (Config.LOCAL_INDEX_DIR, stat.st_mtime_ns, stat.st_ino)
+    except FileNotFoundError:
+        pointer = None
+    with _local_lock:
+        if pointer != _local_pointer:
+            _local_index = None
+            if pointer is not None:
+                try:
+                    with open(current, encoding='utf-8') as handle:
+                        _local_index = LocalIndex(os.path.join(Config.LOCAL_INDEX_DIR, handle.read().strip()))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"AVERTISSEMENT: index local illisible ({e}).")
+            _local_pointer = pointer
+        _local_checked = (Config.LOCAL_INDEX_DIR, now)
+    return _local_index
@@ -0,0 +1,182 @@
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    """Histogramme cumulatif au format Prometheus, une série par combinaison d'étiquettes."""
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def snapshot(self):
+        """Copie des séries : {étiquettes: {'buckets', 'sum', 'count'}}."""
+        with self._lock:
+            return {key: dict(values, buckets=list(values['buckets'])) for key, values in self._series.items()}
+
+    def render(self, series=None):
+        """Lignes Prometheus des séries du processus, ou de `series` (même forme que `snapshot()`)."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, values in sorted((self.snapshot() if series is None else series).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values['buckets']):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {values['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {values['sum']:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {values['count']}")
+        return lines
+
+
+class Registry:
+    """Histogrammes du processus, plus des valeurs lues au moment de l'export (jauges, compteurs)."""
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        self.collectors = {}
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, documentation, labelnames, buckets)
+        return self.histograms[name]
+
+    def gauge(self, name, documentation, read, kind='gauge'):
+        """Déclare une valeur lue à l'export ; `read()` retourne un nombre ou un dict {étiquettes: nombre}."""
+        self.gauges[name] = (documentation, read, kind)
+
+    def collector(self, name, collect):
+        """Déclare une métrique dont `collect()` produit les lignes à l'export (valeurs tenues hors du processus)."""
+        self.collectors[name] = collect
+
+    def render(self):
+        """Exporte toutes les métriques au format texte Prometheus (version 0.0.4)."""
+        lines = []
+        for histogram in self.histograms.values():
+            lines += histogram.render()
+        for name, collect in self.collectors.items():
+            try:
+                lines += collect()
+            except Exception as e:
+                print(f"Erreur lors de la collecte de {name} : {e}")
+        for name, (documentation, read, kind) in self.gauges.items():
+            try:
+                values = read()
+            except Exception as e:
+                print(f"Erreur lors de la lecture de la jauge {name} : {e}")
+                continue
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+            if not isinstance(values, dict):
+                values = {(): values}
+            lines += [f"{name}{_format_labels(key)} {float(value)}" for key, value in values.items()]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SEARCH_PHASE_SECONDS = REGISTRY.histogram(
+    'search_phase_seconds',
+    "Durée des phases d'une recherche (parse, embed, es_request, es_took, local, render).",
+    ('phase',)
+)
+# Les indexations tournent dans l'exécuteur, pas dans le processus web : cet histogramme
+# n'est pas exporté tel quel, ses observations sont enregistrées avec chaque tâche
+# (`stage_records`) et `/metrics` les agrège depuis le magasin de tâches.
+INDEXING_STAGE_SECONDS = Histogram(
+    'indexing_stage_seconds',
+    "Durée de chaque étape d'une indexation (fetch par source, transform, embed, bulk, refresh, local).",
+    ('stage', 'source'),
+    STAGE_BUCKETS
+)
+
+
+@contextmanager
+def span(histogram, **labels):
+    """Mesure la durée du bloc et l'enregistre dans `histogram`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+def observe_stage(stage, seconds, source=''):
+    INDEXING_STAGE_SECONDS.observe(seconds, stage=stage, source=source)
+
+
+def stage_records(baseline=None):
+    """Observations d'étapes faites depuis l'instantané `baseline`, sous forme JSON (une entrée par étape et source)."""
+    baseline = baseline or {}
+    records = []
+    for key, values in sorted(INDEXING_STAGE_SECONDS.snapshot().items()):
+        previous = baseline.get(key, {'buckets': [0] * len(values['buckets']), 'sum': 0.0, 'count': 0})
+        if values['count'] > previous['count']:
+            labels = dict(key)
+            records.append({'stage': labels['stage'], 'source': labels['source'],
+                            'buckets': [now - before for now, before in zip(values['buckets'], previous['buckets'])],
+                            'sum': values['sum'] - previous['sum'], 'count': values['count'] - previous['count']})
+    return records
+
+
+def merge_stage_records(*record_lists):
+    """Additionne des listes produites par `stage_records`, en séries de la forme de `Histogram.snapshot()`."""
+    series = {}
+    for records in record_lists:
+        for record in records or ():
+            key = (('stage', record['stage']), ('source', record['source']))
+            values = series.setdefault(key, {'buckets': [0] * len(record['buckets']), 'sum': 0.0, 'count': 0})
+            values['buckets'] = [total + count for total, count in zip(values['buckets'], record['buckets'])]
+            values['sum'] += record['sum']
+            values['count'] += record['count']
+    return series
+
+
+def series_records(series):
+    """Inverse de `merge_stage_records` : séries agrégées vers la forme JSON enregistrée."""
+    return [{'stage': dict(key)['stage'], 'source': dict(key)['source'], **values} for key, values in sorted(series.items())]
+
+
+def log_slow_query(query_text, dsl, elapsed, took_ms=None, **context):
+    """Consigne une recherche lente (au-delà de `SLOW_QUERY_MS`), échantillonnée à `SLOW_QUERY_SAMPLE_RATE`.
+
+    L'entrée est une ligne JSON contenant la requête, les durées et le DSL généré.
+    """
+    elapsed_ms = elapsed * 1000
+    if Config.SLOW_QUERY_MS <= 0 or elapsed_ms < Config.SLOW_QUERY_MS:
+        return
+    if random.random() >= Config.SLOW_QUERY_SAMPLE_RATE:
+        return
+    record = {'query': query_text, 'elapsed_ms': round(elapsed_ms, 1), 'took_ms': took_ms, **context, 'dsl': dsl}
+    print(f"REQUÊTE LENTE {json.dumps(record, ensure_ascii=False, separators=(',', ':'))}")
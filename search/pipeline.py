@@ -0,0 +1,124 @@
+import re
+import threading
+import time
+from search.metrics import observe_stage
+from search.wikidata_client import MULTI_VALUE_SEPARATOR
+
+
+def clean_date(date_str):
+    """Nettoie une chaîne de date pour ne garder que AAAA-MM-JJ."""
+    if not date_str:
+        return None
+    match = re.search(r"^\d{4}-\d{2}-\d{2}", date_str)
+    return match.group(0) if match else None
+
+
+def _value(item, key):
+    return item.get(key, {}).get('value')
+
+
+def _values(item, key):
+    """Valeurs d'un champ multivalué agrégé par GROUP_CONCAT, ou None s'il est vide."""
+    raw = _value(item, key)
+    if not raw:
+        return None
+    values = [value for value in raw.split(MULTI_VALUE_SEPARATOR) if value]
+    return values or None
+
+
+def build_scientist_document(item):
+    """Transforme une ligne SPARQL de chercheur en document à indexer."""
+    return {
+        'uri': _value(item, 'item'),
+        'name': _value(item, 'itemLabel'),
+        'description': _value(item, 'itemDescription'),
+        'type': 'chercheur', 'image': _value(item, 'image'),
+        'details': { 'birth_date': clean_date(_value(item, 'dateNaissance')), 'birth_place': _value(item, 'lieuNaissanceLabel'), 'domain': _values(item, 'domaineLabel'), 'nationality': _values(item, 'nationalityLabel') }
+    }
+
+
+def build_movie_document(item):
+    """Transforme une ligne SPARQL de film en document à indexer."""
+    return {
+        'uri': _value(item, 'item'),
+        'name': _value(item, 'itemLabel'),
+        'description': _value(item, 'itemDescription'),
+        'type': 'film', 'image': _value(item, 'image'),
+        'details': { 'director': _values(item, 'realisateurLabel'), 'release_date': clean_date(_value(item, 'dateDeSortie')), 'genre': _values(item, 'genreLabel') }
+    }
+
+
+def build_country_document(item):
+    """Transforme une ligne SPARQL de pays en document à indexer."""
+    return {
+        'uri': _value(item, 'item'),
+        'name': _value(item, 'itemLabel'),
+        'description': _value(item, 'itemDescription'),
+        'type': 'pays', 'image': _value(item, 'image'),
+        'details': { 'capital': _values(item, 'capitaleLabel'), 'continent': _values(item, 'continentLabel') }
+    }
+
+
+class StageCounter:
+    """Compte les éléments traversant une étape du pipeline et mesure son débit."""
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.first_seen = None
+        self.last_seen = None
+
+    def add(self, amount=1):
+        now = time.monotonic()
+        if self.first_seen is None:
+            self.first_seen = now
+        self.last_seen = now
+        self.count += amount
+
+    def as_dict(self):
+        elapsed = (self.last_seen - self.first_seen) if self.first_seen is not None else 0.0
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        return {'count': self.count, 'seconds': round(elapsed, 3), 'per_second': round(rate, 1)}
+
+
+class PipelineStats:
+    """Regroupe les compteurs de chaque étape (collecte, transformation, bulk)."""
+    STAGES = ('fetch', 'transform', 'bulk')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {name: StageCounter(name) for name in self.STAGES}
+
+    def add(self, stage, amount=1):
+        with self._lock:
+            self.stages[stage].add(amount)
+
+    def counted(self, stage, iterable):
+        """Enveloppe un itérable pour compter chaque élément qui le traverse."""
+        for element in iterable:
+            self.add(stage)
+            yield element
+
+    def as_dict(self):
+        with self._lock:
+            return {name: counter.as_dict() for name, counter in self.stages.items()}
+
+
+def iter_documents(rows, builder, stats=None):
+    """Transforme paresseusement des lignes SPARQL en documents indexables.
+
+    Le temps passé dans `builder` est cumulé et enregistré comme étape `transform`
+    une fois le flux épuisé.
+    """
+    if stats is not None:
+        rows = stats.counted('fetch', rows)
+    transform_seconds = 0.0
+    for row in rows:
+        start = time.perf_counter()
+        document = builder(row)
+        transform_seconds += time.perf_counter() - start
+        if not document.get('name') or not document.get('uri'):
+            continue
+        if stats is not None:
+            stats.add('transform')
+        yield document
+    observe_stage('transform', transform_seconds)
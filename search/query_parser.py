@@ -0,0 +1,188 @@
+import re
+import unicodedata
+from functools import lru_cache
+from config import Config
+from search.result_cache import normalize_query
+
+TOKEN_RE = re.compile(r"[\w-]+|[^\w\s]")
+YEAR_RE = re.compile(r"^\d{4}$")
+WORD_RE = re.compile(r"^[\w-]+$")
+
+ENTITY_TYPE_KEYWORDS = {
+    'film': ['film', 'films'],
+    'chercheur': ['chercheur', 'chercheurs', 'scientifique', 'scientifiques'],
+    'pays': ['pays'],
+}
+YEAR_QUALIFIERS = {
+    'avant': 'before', 'après': 'after', 'depuis': 'after', 'en': 'during', 'dans les années': 'decade',
+}
+DIRECTOR_TRIGGERS = ['réalisé par', 'par']
+ATTRIBUTES = {
+    'genre': ('genre', 'film'),
+    'domaine': ('domain', 'chercheur'),
+}
+NATIONALITIES = {
+    'français': 'France', 'française': 'France',
+    'americain': 'États-Unis', 'americaine': 'États-Unis',
+    'britannique': 'Royaume-Uni',
+}
+
+
+def _fold(text):
+    """Retire les accents, pour accepter aussi bien « après » que « apres »."""
+    return ''.join(char for char in unicodedata.normalize('NFD', text) if not unicodedata.combining(char))
+
+
+def _build_grammar():
+    """Compile toutes les tables de mots-clés en un seul trie de séquences de tokens.
+
+    Chaque nœud terminal porte la liste des étiquettes du mot-clé.
+    """
+    entries = []
+    for type_name, keywords in ENTITY_TYPE_KEYWORDS.items():
+        entries += [(keyword, ('type', type_name)) for keyword in keywords]
+    entries += [(keyword, ('year', qualifier)) for keyword, qualifier in YEAR_QUALIFIERS.items()]
+    entries += [(keyword, ('director', None)) for keyword in DIRECTOR_TRIGGERS]
+    entries += [(keyword, ('attribute', target)) for keyword, target in ATTRIBUTES.items()]
+    entries += [(keyword, ('nationality', country)) for keyword, country in NATIONALITIES.items()]
+
+    trie = {}
+    for keyword, tag in entries:
+        for variant in {keyword, _fold(keyword)}:
+            node = trie
+            for token in variant.split():
+                node = node.setdefault(token, {})
+            node.setdefault(None, []).append(tag)
+    return trie
+
+
+GRAMMAR = _build_grammar()
+
+
+class _Tagger:
+    """Étiquette une liste de tokens en une seule passe, par plus long préfixe dans le trie."""
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def keyword_at(self, position):
+        """Plus long mot-clé commençant à `position` dont les arguments sont présents : (étiquettes, fin)."""
+        node, best = GRAMMAR, None
+        for index in range(position, len(self.tokens)):
+            node = node.get(self.tokens[index])
+            if node is None:
+                break
+            tags = node.get(None)
+            if tags and self._arguments_satisfied(tags, index + 1):
+                best = (tags, index + 1)
+        return best
+
+    def _arguments_satisfied(self, tags, end):
+        kind = tags[0][0]
+        following = self.tokens[end] if end < len(self.tokens) else None
+        if kind == 'year':
+            return following is not None and YEAR_RE.match(following) is not None
+        if kind in ('director', 'attribute'):
+            return following is not None and WORD_RE.match(following) is not None
+        return True
+
+    def tag(self):
+        """Produit (genre, valeur, argument) pour chaque mot-clé reconnu, de gauche à droite."""
+        position = 0
+        while position < len(self.tokens):
+            match = self.keyword_at(position)
+            if match is None:
+                position += 1
+                continue
+            tags, end = match
+            argument_end = end
+            for kind, value in tags:
+                if kind == 'year':
+                    argument_end = end + 1
+                    yield kind, value, int(self.tokens[end])
+                elif kind == 'attribute':
+                    argument_end = end + 1
+                    yield kind, value, self.tokens[end]
+                elif kind == 'director':
+                    argument_end = self._name_end(end)
+                    yield kind, value, " ".join(self.tokens[end:argument_end])
+                else:
+                    yield kind, value, None
+            position = argument_end
+
+    def _name_end(self, start):
+        """Un nom de réalisateur s'arrête à la ponctuation ou au prochain mot-clé."""
+        end = start
+        while end < len(self.tokens) and WORD_RE.match(self.tokens[end]) and (end == start or self.keyword_at(end) is None):
+            end += 1
+        return end
+
+
+def _year_range(qualifier, year):
+    if qualifier == 'before':
+        return {'lte': f"{year}-12-31"}
+    if qualifier == 'after':
+        return {'gte': f"{year}-01-01"}
+    if qualifier == 'decade':
+        return {'gte': f"{year}-01-01", 'lte': f"{year+9}-12-31"}
+    return {'gte': f"{year}-01-01", 'lte': f"{year}-12-31"}
+
+
+@lru_cache(maxsize=Config.QUERY_PARSE_CACHE_SIZE)
+def _parse_normalized(normalized_query):
+    """Analyse mémoïsée d'une requête normalisée : (must, filter, type détecté)."""
+    found = {}
+    attributes = []
+    for kind, value, argument in _Tagger(TOKEN_RE.findall(normalized_query)).tag():
+        if kind == 'attribute':
+            if value not in (target for target, _ in attributes):
+                attributes.append((value, argument))
+        else:
+            found.setdefault(kind, (value, argument))
+
+    must_clauses, filter_clauses = [], []
+    detected_type = found['type'][0] if 'type' in found else None
+    if detected_type:
+        filter_clauses.append({"term": {"type": detected_type}})
+
+    if 'year' in found:
+        qualifier, year = found['year']
+        range_query = _year_range(qualifier, year)
+        date_fields = []
+        if detected_type != 'film': date_fields.append("details.birth_date")
+        if detected_type != 'chercheur': date_fields.append("details.release_date")
+        if date_fields:
+            filter_clauses.append({"bool": {"should": [{"range": {field: range_query}} for field in date_fields], "minimum_should_match": 1}})
+
+    if 'director' in found:
+        must_clauses.append({"match_phrase": {"details.director": found['director'][1]}})
+        if not detected_type: filter_clauses.append({"term": {"type": "film"}})
+
+    for (field, entity_type), value in attributes:
+        must_clauses.append({"match": {f"details.{field}": value}})
+        if not detected_type: filter_clauses.append({"term": {"type": entity_type}})
+
+    if 'nationality' in found:
+        must_clauses.append({"match": {"details.nationality": found['nationality'][0]}})
+        if not detected_type: filter_clauses.append({"term": {"type": "chercheur"}})
+
+    return tuple(must_clauses), tuple(filter_clauses), detected_type
+
+
+class QueryParser:
+    """Analyse une chaîne de requête pour en extraire des filtres structurés.
+
+    Les tables de mots-clés sont compilées une fois en trie (`GRAMMAR`) et la
+    requête est étiquetée en une seule passe ; le résultat est mémoïsé par
+    requête normalisée.
+    """
+    def __init__(self, query_text):
+        self.raw_query = query_text
+        self.must_clauses = []
+        self.filter_clauses = []
+        self.detected_type = None
+
+    def parse(self):
+        """Étiquette la requête et retourne les clauses."""
+        must_clauses, filter_clauses, self.detected_type = _parse_normalized(normalize_query(self.raw_query))
+        self.must_clauses, self.filter_clauses = list(must_clauses), list(filter_clauses)
+        return self.must_clauses, self.filter_clauses
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+def normalize_query(query_text):
+    """Normalise une requête utilisateur (casse et espaces) pour la clé de cache."""
+    return " ".join(query_text.lower().split())
+
+
+def make_cache_key(namespace, generation, *parts):
+    """Clé compacte incluant la génération d'index : une réindexation invalide toutes les entrées."""
+    raw = json.dumps([namespace, generation, *parts], ensure_ascii=False, separators=(',', ':'))
+    return f"{namespace}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+class LRUCache:
+    """Cache LRU en mémoire avec expiration (TTL), sûr entre threads."""
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries), 'max_entries': self.max_entries, 'ttl': self.ttl,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'expirations': self.expirations,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+class RedisCache:
+    """Cache partagé entre workers, adossé à Redis (dépendance optionnelle `redis`)."""
+    def __init__(self, url, ttl):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.ttl = ttl
+        self.hits = self.misses = self.errors = 0
+
+    def get(self, key):
+        try:
+            raw = self.client.get(key)
+        except Exception:
+            self.errors += 1
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        try:
+            self.client.setex(key, self.ttl, json.dumps(value, ensure_ascii=False))
+        except Exception:
+            self.errors += 1
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors, 'ttl': self.ttl}
+
+
+class TieredCache:
+    """LRU local devant un éventuel cache partagé ; un succès partagé réalimente le niveau local."""
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def clear(self):
+        self.local.clear()
+
+    def stats(self):
+        stats = {'local': self.local.stats()}
+        if self.shared is not None:
+            stats['shared'] = self.shared.stats()
+        return stats
+
+
+_result_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Retourne le cache de résultats singleton, configuré selon `SEARCH_CACHE_*`."""
+    global _result_cache
+    with _cache_lock:
+        if _result_cache is None:
+            shared = None
+            if Config.SEARCH_CACHE_URL:
+                try:
+                    shared = RedisCache(Config.SEARCH_CACHE_URL, Config.SEARCH_CACHE_TTL)
+                except ImportError:
+                    print("AVERTISSEMENT: le paquet 'redis' est absent, cache partagé désactivé.")
+            _result_cache = TieredCache(LRUCache(Config.SEARCH_CACHE_SIZE, Config.SEARCH_CACHE_TTL), shared)
+    return _result_cache
@@ -0,0 +1,70 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+from config import Config
+
+
+class SparqlCacheMiss(Exception):
+    """Réponse absente du cache alors que le mode rejeu interdit tout accès réseau."""
+
+
+def normalize_query(query):
+    """Normalise une requête SPARQL (espaces et retours à la ligne) avant hachage."""
+    return " ".join(query.split())
+
+
+def cache_path(query):
+    """Chemin de l'entrée adressée par le SHA-256 de la requête normalisée."""
+    key = hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+    return os.path.join(Config.SPARQL_CACHE_DIR, key[:2], f"{key}.json.gz")
+
+
+def open_cached_response(query):
+    """Ouvre la réponse en cache si elle existe et n'a pas expiré (le mode rejeu ignore le TTL)."""
+    if Config.SPARQL_CACHE_MODE == 'off':
+        return None
+    path = cache_path(query)
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
+    if Config.SPARQL_CACHE_MODE != 'replay' and age > Config.SPARQL_CACHE_TTL:
+        return None
+    return gzip.open(path, 'rb')
+
+
+def iter_file_chunks(handle):
+    for chunk in iter(lambda: handle.read(Config.SPARQL_STREAM_CHUNK_BYTES), b''):
+        yield chunk
+
+
+class CacheWriter:
+    """Recopie compressée d'une réponse en cours de lecture, publiée seulement si elle est complète."""
+    def __init__(self, query):
+        self.path = cache_path(query)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        descriptor, self.temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        self.handle = gzip.GzipFile(fileobj=os.fdopen(descriptor, 'wb'), mode='wb')
+
+    def tee(self, chunks):
+        for chunk in chunks:
+            self.handle.write(chunk)
+            yield chunk
+
+    def commit(self):
+        self._close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        self._close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def _close(self):
+        if self.handle.closed:
+            return
+        fileobj = self.handle.fileobj
+        self.handle.close()
+        fileobj.close()
@@ -1,79 +1,387 @@
+import codecs
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import requests
+from requests.adapters import HTTPAdapter
 from config import Config
+from search.metrics import observe_stage
+from search.sparql_cache import CacheWriter, SparqlCacheMiss, iter_file_chunks, open_cached_response
+
+SPARQL_HEADERS = {
+    'Accept': 'application/sparql-results+json',
+    'User-Agent': 'AdvancedSemanticSearch/1.0 (Python/Requests)'
+}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_JSON_DECODER = json.JSONDecoder()
+_session = None
+_page_executor = None
+_pool_lock = threading.Lock()
+
+
+def get_sparql_session():
+    """Retourne une session HTTP unique dont le pool de connexions couvre tous les workers."""
+    global _session
+    with _pool_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.SPARQL_WORKERS * 2)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(SPARQL_HEADERS)
+            _session = session
+    return _session
+
+
+def _get_page_executor():
+    """Pool de threads borné, partagé par toutes les sources, pour les pages SPARQL."""
+    global _page_executor
+    with _pool_lock:
+        if _page_executor is None:
+            _page_executor = ThreadPoolExecutor(max_workers=Config.SPARQL_WORKERS, thread_name_prefix='sparql-page')
+    return _page_executor
+
+
+def iter_sparql_bindings(chunks):
+    """Décode au fil de l'eau le tableau `results.bindings` d'une réponse SPARQL JSON.
+
+    Seul le fragment en cours de lecture est conservé en mémoire : chaque ligne
+    est produite dès que son objet JSON est complet.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ""
+    in_bindings = False
+    for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        if not in_bindings:
+            start = buffer.find('"bindings"')
+            bracket = buffer.find('[', start) if start != -1 else -1
+            if bracket == -1:
+                continue
+            buffer = buffer[bracket + 1:]
+            in_bindings = True
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                binding, position = _JSON_DECODER.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield binding
+        buffer = buffer[position:]
+    raise ValueError("Réponse SPARQL tronquée ou invalide.")
+
+
+@contextmanager
+def open_sparql_stream(query):
+    """Fournit les octets bruts de la réponse SPARQL, depuis le cache disque ou le réseau.
+
+    En mode `on`, une réponse réseau lue en entier est recopiée dans le cache ;
+    en mode `replay`, aucune requête réseau n'est émise.
+    """
+    cached = open_cached_response(query)
+    if cached is not None:
+        with cached:
+            yield iter_file_chunks(cached)
+        return
+    if Config.SPARQL_CACHE_MODE == 'replay':
+        raise SparqlCacheMiss(f"Requête absente du cache SPARQL ({Config.SPARQL_CACHE_DIR}).")
+
+    with get_sparql_session().get(
+        Config.WIKIDATA_SPARQL_ENDPOINT,
+        params={'query': query},
+        timeout=Config.SPARQL_TIMEOUT,
+        stream=True
+    ) as response:
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=Config.SPARQL_STREAM_CHUNK_BYTES)
+        if Config.SPARQL_CACHE_MODE != 'on':
+            yield chunks
+            return
+        writer = CacheWriter(query)
+        try:
+            tee = writer.tee(chunks)
+            yield tee
+            for _ in tee:
+                pass
+            writer.commit()
+        finally:
+            writer.abort()
+
 
 def run_sparql_query(query):
-    """Exécute une requête SPARQL et retourne les résultats."""
-    headers = {
-        'Accept': 'application/sparql-results+json',
-        'User-Agent': 'AdvancedSemanticSearch/1.0 (Python/Requests)'
-    }
+    """Exécute une requête SPARQL et produit les résultats ligne par ligne.
+
+    Les erreurs (réseau, réponse tronquée, absence du cache en rejeu) sont
+    propagées : la source est alors comptée en échec par l'appelant, ce qui
+    interdit les suppressions d'une indexation incrémentale.
+    """
+    with open_sparql_stream(query) as chunks:
+        yield from iter_sparql_bindings(chunks)
+
+
+def _retry_delay(error, attempt):
+    """Attente avant un nouvel essai : `Retry-After` du serveur, sinon backoff exponentiel.
+
+    Les deux sont bornés par `SPARQL_MAX_RETRY_DELAY` ; un `Retry-After` qui le
+    dépasse retourne None : la page échoue au lieu de bloquer un worker.
+    """
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = float(retry_after)
+        return delay if delay <= Config.SPARQL_MAX_RETRY_DELAY else None
+    return min(Config.SPARQL_RETRY_BACKOFF * (2 ** attempt), Config.SPARQL_MAX_RETRY_DELAY)
+
+
+def fetch_sparql_page(query):
+    """Télécharge une page complète de résultats, avec nouvelles tentatives et backoff exponentiel."""
+    for attempt in range(Config.SPARQL_MAX_RETRIES + 1):
+        try:
+            with open_sparql_stream(query) as chunks:
+                return list(iter_sparql_bindings(chunks))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            response = getattr(e, 'response', None)
+            retryable = response is None or response.status_code in RETRYABLE_STATUS
+            if not retryable or attempt == Config.SPARQL_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            if delay is None:
+                print(f"Page SPARQL en échec ({e}) : Retry-After au-delà de {Config.SPARQL_MAX_RETRY_DELAY:.0f}s, abandon.")
+                raise
+            print(f"Page SPARQL en échec ({e}), nouvel essai dans {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def run_paginated_sparql_query(build_query, limit, start=0, after=None):
+    """Récupère les entités `start` à `limit` par pages successives, paginées par clé.
+
+    Chaque page reprend après la plus grande URI de la précédente (`after`) : le
+    serveur n'a pas à trier ni sauter les entités déjà lues, comme avec OFFSET.
+    La page suivante est demandée dès que la courante est téléchargée, pendant
+    que ses lignes sont consommées ; les pages de toutes les sources passent par
+    le même pool de `SPARQL_WORKERS` threads. Une page incomplète marque la fin
+    des résultats : plus aucune page n'est demandée.
+    """
+    page_size = Config.SPARQL_PAGE_SIZE
+    executor = _get_page_executor()
+
+    def submit(fetched, after):
+        page_limit = min(page_size, limit - fetched)
+        if page_limit <= 0:
+            return None
+        return page_limit, executor.submit(fetch_sparql_page, build_query(page_limit, after))
+
+    fetched, pending = start, submit(start, after)
     try:
-        response = requests.get(
-            Config.WIKIDATA_SPARQL_ENDPOINT,
-            params={'query': query},
-            headers=headers,
-            timeout=240  
-        )
-        response.raise_for_status()
-        return response.json()['results']['bindings']
-    except requests.exceptions.RequestException as e:
-        print(f"Erreur lors de la requête SPARQL : {e}")
-        return []
+        while pending is not None:
+            page_limit, future = pending
+            rows = future.result()
+            fetched += len(rows)
+            pending = submit(fetched, max(row['item']['value'] for row in rows)) if len(rows) == page_limit else None
+            yield from rows
+    finally:
+        if pending is not None:
+            pending[1].cancel()
 
-def fetch_scientist_data():
-    """Récupère les données sur les chercheurs depuis Wikidata."""
-    print(f"Récupération de {Config.SCIENTIST_LIMIT} chercheurs...")
-    query = f"""
-    SELECT ?item ?itemLabel ?itemDescription ?dateNaissance ?lieuNaissanceLabel ?domaineLabel ?image ?nationalityLabel
+
+def _run_source_query(build_query, limit, start=0, after=None):
+    if Config.SPARQL_PAGE_SIZE > 0:
+        return run_paginated_sparql_query(build_query, limit, start, after)
+    return run_sparql_query(build_query(limit, paged=False))
+
+
+def _keyset_filter(after):
+    """Restreint la sous-requête des entités à celles dont l'URI suit `after` (page suivante)."""
+    return f"FILTER(STR(?item) > {json.dumps(after)})" if after else ""
+
+
+def _paging_clause(limit, paged):
+    """Pagination de la sous-requête des entités : LIMIT compte des entités, pas des lignes."""
+    return f"ORDER BY ?item LIMIT {limit}" if paged else f"LIMIT {limit}"
+
+
+class _SourceFailure:
+    def __init__(self, error):
+        self.error = error
+
+
+_SOURCE_DONE = object()
+
+
+def fetch_sources_in_parallel(sources, on_error=None):
+    """Exécute plusieurs sources simultanément et produit des couples (nom, ligne).
+
+    Chaque source tourne dans son propre thread et alimente une file bornée : la
+    mémoire reste limitée même si le consommateur (bulk) est plus lent que la collecte.
+    L'échec d'une source est signalé via `on_error(nom, exception)` sans interrompre les autres.
+    """
+    rows = queue.Queue(maxsize=Config.SPARQL_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                rows.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(name, fetch):
+        start, blocked = time.perf_counter(), 0.0
+        try:
+            for row in fetch():
+                put_start = time.perf_counter()
+                if not put((name, row)):
+                    return
+                blocked += time.perf_counter() - put_start
+            observe_stage('fetch', time.perf_counter() - start - blocked, source=name)
+        except Exception as e:
+            put((name, _SourceFailure(e)))
+        finally:
+            put((name, _SOURCE_DONE))
+
+    for name, fetch in sources:
+        threading.Thread(target=produce, args=(name, fetch), name=f"sparql-{name}", daemon=True).start()
+
+    remaining = len(sources)
+    try:
+        while remaining:
+            name, row = rows.get()
+            if row is _SOURCE_DONE:
+                remaining -= 1
+            elif isinstance(row, _SourceFailure):
+                if on_error is not None:
+                    on_error(name, row.error)
+                else:
+                    print(f"Erreur lors de la collecte de la source {name} : {row.error}")
+            else:
+                yield name, row
+    finally:
+        stop.set()
+
+
+MULTI_VALUE_SEPARATOR = "|"
+
+
+def _scientist_query(limit, after=None, paged=True):
+    return f"""
+    SELECT ?item (SAMPLE(?label) AS ?itemLabel) (SAMPLE(?description) AS ?itemDescription)
+           (MIN(?naissance) AS ?dateNaissance) (SAMPLE(?lieuNaissanceNom) AS ?lieuNaissanceLabel)
+           (GROUP_CONCAT(DISTINCT ?domaineNom; separator="{MULTI_VALUE_SEPARATOR}") AS ?domaineLabel)
+           (SAMPLE(?img) AS ?image)
+           (GROUP_CONCAT(DISTINCT ?nationaliteNom; separator="{MULTI_VALUE_SEPARATOR}") AS ?nationalityLabel)
     WHERE {{
-        VALUES ?occupation {{ wd:Q1650915 wd:Q901 }}  # Scientifique ou chercheur
-        ?item wdt:P106 ?occupation.
+        {{
+            SELECT DISTINCT ?item WHERE {{
+                VALUES ?occupation {{ wd:Q1650915 wd:Q901 }}  # Scientifique ou chercheur
+                ?item wdt:P106 ?occupation.
+                {_keyset_filter(after)}
+            }}
+            {_paging_clause(limit, paged)}
+        }}
         
         OPTIONAL {{ ?item wdt:P27 ?nationality. }}
-        OPTIONAL {{ ?item wdt:P569 ?dateNaissance. }}
+        OPTIONAL {{ ?item wdt:P569 ?naissance. }}
         OPTIONAL {{ ?item wdt:P19 ?lieuNaissance. }}
         OPTIONAL {{ ?item wdt:P101 ?domaine. }}
-        OPTIONAL {{ ?item wdt:P18 ?image. }}
+        OPTIONAL {{ ?item wdt:P18 ?img. }}
         
-        SERVICE wikibase:label {{ bd:serviceParam wikibase:language "fr,en,de,es". }}
+        SERVICE wikibase:label {{
+            bd:serviceParam wikibase:language "fr,en,de,es".
+            ?item rdfs:label ?label; schema:description ?description.
+            ?nationality rdfs:label ?nationaliteNom.
+            ?lieuNaissance rdfs:label ?lieuNaissanceNom.
+            ?domaine rdfs:label ?domaineNom.
+        }}
     }}
-    LIMIT {Config.SCIENTIST_LIMIT}
+    GROUP BY ?item
     """
-    return run_sparql_query(query)
 
-def fetch_movie_data():
-    """Récupère les données sur les films depuis Wikidata."""
-    print(f"Récupération de {Config.MOVIE_LIMIT} films...")
-    query = f"""
-    SELECT ?item ?itemLabel ?itemDescription ?realisateurLabel ?dateDeSortie ?genreLabel ?image
+
+def _movie_query(limit, after=None, paged=True):
+    return f"""
+    SELECT ?item (SAMPLE(?label) AS ?itemLabel) (SAMPLE(?description) AS ?itemDescription)
+           (GROUP_CONCAT(DISTINCT ?realisateurNom; separator="{MULTI_VALUE_SEPARATOR}") AS ?realisateurLabel)
+           (MIN(?sortie) AS ?dateDeSortie)
+           (GROUP_CONCAT(DISTINCT ?genreNom; separator="{MULTI_VALUE_SEPARATOR}") AS ?genreLabel)
+           (SAMPLE(?img) AS ?image)
     WHERE {{
-        ?item wdt:P31 wd:Q11424.  # Instance de film
+        {{
+            SELECT ?item WHERE {{
+                ?item wdt:P31 wd:Q11424.  # Instance de film
+                {_keyset_filter(after)}
+            }}
+            {_paging_clause(limit, paged)}
+        }}
         
         OPTIONAL {{ ?item wdt:P57 ?realisateur. }}
-        OPTIONAL {{ ?item wdt:P577 ?dateDeSortie. }}
+        OPTIONAL {{ ?item wdt:P577 ?sortie. }}
         OPTIONAL {{ ?item wdt:P136 ?genre. }}
-        OPTIONAL {{ ?item wdt:P18 ?image. }}
+        OPTIONAL {{ ?item wdt:P18 ?img. }}
         
-        SERVICE wikibase:label {{ bd:serviceParam wikibase:language "fr,en,de,es". }}
+        SERVICE wikibase:label {{
+            bd:serviceParam wikibase:language "fr,en,de,es".
+            ?item rdfs:label ?label; schema:description ?description.
+            ?realisateur rdfs:label ?realisateurNom.
+            ?genre rdfs:label ?genreNom.
+        }}
     }}
-    LIMIT {Config.MOVIE_LIMIT}
+    GROUP BY ?item
     """
-    return run_sparql_query(query)
 
-def fetch_country_data():
-    """Récupère les données sur les pays depuis Wikidata."""
-    print(f"Récupération de {Config.COUNTRY_LIMIT} pays...")
-    query = f"""
-    SELECT ?item ?itemLabel ?itemDescription ?capitaleLabel ?continentLabel ?image
+
+def _country_query(limit, after=None, paged=True):
+    return f"""
+    SELECT ?item (SAMPLE(?label) AS ?itemLabel) (SAMPLE(?description) AS ?itemDescription)
+           (GROUP_CONCAT(DISTINCT ?capitaleNom; separator="{MULTI_VALUE_SEPARATOR}") AS ?capitaleLabel)
+           (GROUP_CONCAT(DISTINCT ?continentNom; separator="{MULTI_VALUE_SEPARATOR}") AS ?continentLabel)
+           (SAMPLE(?img) AS ?image)
     WHERE {{
-        ?item wdt:P31 wd:Q6256.  # Instance de pays
+        {{
+            SELECT ?item WHERE {{
+                ?item wdt:P31 wd:Q6256.  # Instance de pays
+                {_keyset_filter(after)}
+            }}
+            {_paging_clause(limit, paged)}
+        }}
         
         OPTIONAL {{ ?item wdt:P36 ?capitale. }}
         OPTIONAL {{ ?item wdt:P30 ?continent. }}
-        OPTIONAL {{ ?item wdt:P18 ?image. }}
+        OPTIONAL {{ ?item wdt:P18 ?img. }}
         
-        SERVICE wikibase:label {{ bd:serviceParam wikibase:language "fr,en,de,es". }}
+        SERVICE wikibase:label {{
+            bd:serviceParam wikibase:language "fr,en,de,es".
+            ?item rdfs:label ?label; schema:description ?description.
+            ?capitale rdfs:label ?capitaleNom.
+            ?continent rdfs:label ?continentNom.
+        }}
     }}
-    LIMIT {Config.COUNTRY_LIMIT}
+    GROUP BY ?item
     """
-    return run_sparql_query(query)
\ No newline at end of file
+
+
+def fetch_scientist_data(start=0, after=None):
+    """Récupère les données sur les chercheurs depuis Wikidata (à partir de la `start`-ième, après l'URI `after`)."""
+    print(f"Récupération de {Config.SCIENTIST_LIMIT} chercheurs...")
+    return _run_source_query(_scientist_query, Config.SCIENTIST_LIMIT, start, after)
+
+
+def fetch_movie_data(start=0, after=None):
+    """Récupère les données sur les films depuis Wikidata (à partir du `start`-ième, après l'URI `after`)."""
+    print(f"Récupération de {Config.MOVIE_LIMIT} films...")
+    return _run_source_query(_movie_query, Config.MOVIE_LIMIT, start, after)
+
+
+def fetch_country_data(start=0, after=None):
+    """Récupère les données sur les pays depuis Wikidata (à partir du `start`-ième, après l'URI `after`)."""
+    print(f"Récupération de {Config.COUNTRY_LIMIT} pays...")
+    return _run_source_query(_country_query, Config.COUNTRY_LIMIT, start, after)
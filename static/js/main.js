@@ -45,4 +45,102 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
         });
     }
-});
\ No newline at end of file
+});
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.querySelector('input[data-suggest-url]');
+    const list = document.getElementById('suggestions');
+    if (!input || !list) {
+        return;
+    }
+
+    const DEBOUNCE_MS = 120;
+    const MIN_CHARS = 2;
+    const cache = new Map();
+    let timer = null;
+    let controller = null;
+    let activeIndex = -1;
+
+    const hide = () => {
+        list.hidden = true;
+        list.innerHTML = '';
+        activeIndex = -1;
+    };
+
+    const render = (suggestions) => {
+        list.innerHTML = '';
+        activeIndex = -1;
+        suggestions.forEach(suggestion => {
+            const item = document.createElement('li');
+            item.setAttribute('role', 'option');
+            const name = document.createElement('span');
+            name.textContent = suggestion.name;
+            const type = document.createElement('span');
+            type.className = 'suggestion-type';
+            type.textContent = suggestion.type;
+            item.append(name, type);
+            item.addEventListener('mousedown', event => {
+                event.preventDefault();
+                input.value = suggestion.name;
+                hide();
+                input.form.submit();
+            });
+            list.appendChild(item);
+        });
+        list.hidden = suggestions.length === 0;
+    };
+
+    const fetchSuggestions = (prefix) => {
+        if (cache.has(prefix)) {
+            render(cache.get(prefix));
+            return;
+        }
+        if (controller) {
+            controller.abort();
+        }
+        controller = new AbortController();
+        fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(prefix), { signal: controller.signal })
+            .then(response => response.json())
+            .then(data => {
+                cache.set(prefix, data.suggestions);
+                if (input.value.trim() === prefix) {
+                    render(data.suggestions);
+                }
+            })
+            .catch(err => {
+                if (err.name !== 'AbortError') {
+                    console.error("Erreur d'autocomplétion:", err);
+                }
+            });
+    };
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const prefix = input.value.trim();
+        if (prefix.length < MIN_CHARS) {
+            hide();
+            return;
+        }
+        timer = setTimeout(() => fetchSuggestions(prefix), DEBOUNCE_MS);
+    });
+
+    input.addEventListener('keydown', function(event) {
+        const items = list.querySelectorAll('li');
+        if (list.hidden || items.length === 0) {
+            return;
+        }
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            if (activeIndex >= 0) {
+                items[activeIndex].classList.remove('active');
+            }
+            const step = event.key === 'ArrowDown' ? 1 : -1;
+            activeIndex = (activeIndex + step + items.length) % items.length;
+            items[activeIndex].classList.add('active');
+            input.value = items[activeIndex].firstChild.textContent;
+        } else if (event.key === 'Escape') {
+            hide();
+        }
+    });
+
+    input.addEventListener('blur', hide);
+});
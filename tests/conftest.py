@@ -0,0 +1,103 @@
+"""Doublures partagées par les tests : Elasticsearch et SPARQL locaux (`benchmarks/`), lancés une fois.
+
+L'environnement est fixé avant tout import de `config` ; chaque test qui indexe
+travaille sur son propre alias et ses propres bases SQLite.
+"""
+import os
+import socket
+import tempfile
+import threading
+import uuid
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix='semantic-search-tests-')
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+ES_PORT, SPARQL_PORT = _free_port(), _free_port()
+os.environ.update({
+    'ES_HOST': f"http://127.0.0.1:{ES_PORT}",
+    'ES_INDEX': 'tests',
+    'ES_HEALTH_INTERVAL': '0.2',
+    'WIKIDATA_SPARQL_ENDPOINT': f"http://127.0.0.1:{SPARQL_PORT}/sparql",
+    'SPARQL_CACHE_MODE': 'off',
+    'SPARQL_MAX_RETRIES': '0',
+    'FINGERPRINT_DB': os.path.join(WORKDIR, 'fingerprints.sqlite'),
+    'JOB_DB': os.path.join(WORKDIR, 'jobs.sqlite'),
+    'LOCAL_INDEX_DIR': os.path.join(WORKDIR, 'local'),
+    'SEARCH_CACHE_URL': '',
+    'SLOW_QUERY_MS': '0',
+})
+
+from benchmarks import fake_elasticsearch, fake_sparql  # noqa: E402
+from config import Config  # noqa: E402
+
+
+class StandIns:
+    def __init__(self):
+        fake_sparql.synthesize(os.path.join(WORKDIR, 'fixtures'), scale=0.02, seed=7)
+        self.sparql_fixtures = fake_sparql.load_fixtures(os.path.join(WORKDIR, 'fixtures'))
+        self.es_server = fake_elasticsearch.make_server(ES_PORT)
+        self.sparql_server = fake_sparql.make_server(self.sparql_fixtures, SPARQL_PORT)
+        for server in (self.es_server, self.sparql_server):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    @property
+    def engine(self):
+        return self.es_server.RequestHandlerClass.engine
+
+
+@pytest.fixture(scope='session')
+def stand_ins():
+    servers = StandIns()
+    yield servers
+    servers.es_server.shutdown()
+    servers.sparql_server.shutdown()
+
+
+@pytest.fixture
+def isolated(stand_ins, monkeypatch, tmp_path):
+    """Alias, empreintes, file des tâches et index local propres au test."""
+    monkeypatch.setattr(Config, 'ES_INDEX', f"tests-{uuid.uuid4().hex[:8]}")
+    monkeypatch.setattr(Config, 'FINGERPRINT_DB', str(tmp_path / 'fingerprints.sqlite'))
+    monkeypatch.setattr(Config, 'JOB_DB', str(tmp_path / 'jobs.sqlite'))
+    monkeypatch.setattr(Config, 'LOCAL_INDEX_DIR', str(tmp_path / 'local'))
+    from search.es_utils import invalidate_index_generation
+    invalidate_index_generation()
+    yield stand_ins
+    invalidate_index_generation()
+
+
+@pytest.fixture
+def indexed(isolated):
+    """Génération complète indexée depuis les fixtures SPARQL."""
+    from search.indexing import run_indexing_task
+    status = run_indexing_task('full')
+    assert not status['failed'], status['message']
+    return isolated
+
+
+class CountingClient:
+    """Client Elasticsearch qui consigne le nom de chaque appel."""
+    def __init__(self, es):
+        self.es, self.calls = es, []
+
+    def __getattr__(self, name):
+        self.calls.append(name)
+        return getattr(self.es, name)
+
+
+@pytest.fixture
+def counting(monkeypatch):
+    """Espionne les appels faits par le client de recherche."""
+    from search.es_state import get_cluster_state
+    cluster = get_cluster_state()
+    spy = CountingClient(cluster.search_es)
+    monkeypatch.setattr(cluster, 'search_es', spy)
+    return spy
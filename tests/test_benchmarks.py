@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import fake_sparql
+from benchmarks.bench_query_parser import load_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_bench(module, tmp_path, *args):
+    output = tmp_path / f"{module}.json"
+    subprocess.run([sys.executable, '-m', f"benchmarks.{module}", *args, '--json', str(output)],
+                   cwd=ROOT, check=True, capture_output=True, timeout=300)
+    return json.loads(output.read_text(encoding='utf-8'))
+
+
+def test_synthetic_fixtures_are_reproducible(tmp_path):
+    fake_sparql.synthesize(tmp_path / 'a', scale=0.01, seed=3)
+    fake_sparql.synthesize(tmp_path / 'b', scale=0.01, seed=3)
+    fake_sparql.synthesize(tmp_path / 'c', scale=0.01, seed=4)
+
+    first = fake_sparql.load_fixtures(tmp_path / 'a')
+    assert set(first) == set(fake_sparql.SOURCES)
+    assert fake_sparql.load_fixtures(tmp_path / 'b') == first
+    assert fake_sparql.load_fixtures(tmp_path / 'c') != first
+
+
+def test_query_corpus_is_loaded_without_blank_lines():
+    queries = load_corpus()
+    assert queries and all(query == query.strip() and query for query in queries)
+
+
+def test_query_parser_bench_reports_both_parsers(tmp_path):
+    results = run_bench('bench_query_parser', tmp_path, '--repeat', '1')
+
+    assert results['queries'] == len(load_corpus())
+    assert {'legacy_us_per_query', 'compiled_cold_us_per_query', 'compiled_memoized_us_per_query'} <= set(results)
+
+
+def test_app_bench_indexes_and_replays_against_the_stand_ins(tmp_path):
+    results = run_bench('bench_app', tmp_path, '--scale', '0.01', '--requests', '10', '--warmup', '1',
+                        '--concurrency', '2')
+
+    assert results['ingestion']['documents'] == sum(results['meta']['fixture_rows'].values())
+    assert set(results['routes']) == {'/', '/ (304)', '/check-status'}
+    assert all(route['errors'] == 0 for route in results['routes'].values())
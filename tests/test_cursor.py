@@ -0,0 +1,71 @@
+import base64
+import json
+import zlib
+
+import pytest
+
+from search.es_utils import decode_cursor, encode_cursor, invalidate_index_generation, search_with_cursor
+from search.indexing import run_indexing_task
+
+QUERY, SIZE = 'film', 5
+
+
+def uris(results):
+    return [hit['_source']['uri'] for hit in results['hits']]
+
+
+def tampered(token, **changes):
+    payload = json.loads(zlib.decompress(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))))
+    payload.update(changes)
+    for key in [key for key, value in changes.items() if value is None]:
+        del payload[key]
+    return encode_cursor(payload)
+
+
+@pytest.mark.parametrize('changes', [
+    {'p': 'x'}, {'p': True}, {'p': None}, {'a': None}, {'a': 'x'}, {'a': [1.0]}, {'a': ['x', 'y']},
+    {'h': None}, {'h': 'x'}, {'h': [[1.0]]}, {'g': 3},
+])
+def test_malformed_cursor_is_ignored(indexed, changes):
+    token = search_with_cursor(QUERY, size=SIZE)['next_cursor']
+    assert decode_cursor(token, QUERY) is not None
+
+    assert decode_cursor(tampered(token, **changes), QUERY) is None
+    assert search_with_cursor(QUERY, tampered(token, **changes), size=SIZE)['page'] == 1
+
+
+def test_reloading_pages_keeps_one_point_in_time(indexed):
+    first = search_with_cursor(QUERY, size=SIZE)
+    second = search_with_cursor(QUERY, first['next_cursor'], size=SIZE)
+    for _ in range(5):
+        assert uris(search_with_cursor(QUERY, first['next_cursor'], size=SIZE)) == uris(second)
+    search_with_cursor(QUERY, second['next_cursor'], size=SIZE)
+
+    assert len(indexed.engine.pits) == 1
+
+
+def test_reindex_between_pages_does_not_shift_results(indexed, monkeypatch):
+    first = search_with_cursor(QUERY, size=SIZE)
+    second = uris(search_with_cursor(QUERY, first['next_cursor'], size=SIZE))
+    films = [item for item in indexed.sparql_fixtures['films'] if item['item']['value'] not in second]
+    monkeypatch.setitem(indexed.sparql_fixtures, 'films', films)
+
+    assert not run_indexing_task('full')['failed']
+    invalidate_index_generation()
+
+    assert uris(search_with_cursor(QUERY, first['next_cursor'], size=SIZE)) == second
+    fresh = search_with_cursor(QUERY, size=SIZE)
+    assert not set(second) & set(uris(fresh) + uris(search_with_cursor(QUERY, fresh['next_cursor'], size=SIZE)))
+
+
+def test_walking_every_page_visits_each_match_once_in_sort_order(indexed):
+    results, seen = search_with_cursor(QUERY, size=SIZE), []
+    while True:
+        seen += [(-hit['_score'], hit['_source']['uri']) for hit in results['hits']]
+        if results['next_cursor'] is None:
+            break
+        results = search_with_cursor(QUERY, results['next_cursor'], size=SIZE)
+
+    assert len(seen) == results['total'] > SIZE
+    assert len({uri for _, uri in seen}) == len(seen)
+    assert seen == sorted(seen)
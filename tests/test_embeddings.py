@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from config import Config
+from search.embeddings import embed_texts, normalize_text
+from search.es_utils import build_hybrid_searches, hybrid_search_in_elasticsearch, reciprocal_rank_fusion
+from search.indexing import run_indexing_task
+from search.result_cache import get_result_cache
+
+
+@pytest.mark.parametrize('text, normalized', [
+    ('Émile Zola', ' emile zola '),
+    ('Лев  Толстой', ' лев толстои '),
+    ('نجيب محفوظ', ' نجيب محفوظ '),
+    ('黒澤 明', ' 黒澤 明 '),
+    ('Ōsaka 1970', ' osaka 1970 '),
+])
+def test_normalize_text_strips_only_diacritics(text, normalized):
+    assert normalize_text(text) == normalized
+
+
+def test_non_latin_names_get_distinct_vectors():
+    vectors = embed_texts(['Лев Толстой', 'Фёдор Достоевский', '黒澤明', '宮崎駿', 'نجيب محفوظ'])
+
+    assert np.all(np.linalg.norm(vectors, axis=1) > 0.99)
+    similarities = vectors @ vectors.T
+    assert np.all(similarities[~np.eye(len(vectors), dtype=bool)] < 0.5)
+    assert embed_texts(['Толстой'])[0] @ vectors[0] > embed_texts(['Толстой'])[0] @ vectors[1]
+
+
+def hits(*ids):
+    return [{'_id': doc_id, '_source': {'name': doc_id}} for doc_id in ids]
+
+
+def test_rrf_favours_documents_found_by_both_lists():
+    fused = reciprocal_rank_fusion([hits('a', 'b', 'c'), hits('c', 'd', 'b')], rank_constant=60)
+
+    assert [hit['_id'] for hit in fused] == ['c', 'b', 'a', 'd']
+    assert fused[0]['_score'] == pytest.approx(1 / 63 + 1 / 61)
+
+
+def test_rrf_breaks_score_ties_by_id():
+    fused = reciprocal_rank_fusion([hits('b', 'x'), hits('a', 'y')])
+
+    assert [hit['_id'] for hit in fused] == ['a', 'b', 'x', 'y']
+
+
+def test_hybrid_searches_share_filters_and_window(monkeypatch):
+    monkeypatch.setattr(Config, 'RRF_WINDOW', 20)
+    lexical, knn = build_hybrid_searches('film drame', 15, 10, selections={'genre': ['drame']})
+
+    assert lexical['from'] == 0 and lexical['size'] == knn['size'] == knn['knn']['k'] == 25
+    assert len(knn['knn']['query_vector']) == Config.EMBEDDING_DIMS
+    assert {'terms': {'details.genre.keyword': ['drame']}} in knn['knn']['filter']
+
+
+def test_hybrid_search_finds_documents_by_vector(isolated, monkeypatch, counting):
+    monkeypatch.setattr(Config, 'SEMANTIC_SEARCH', True)
+    assert not run_indexing_task('full')['failed']
+    get_result_cache().clear()
+    name = isolated.sparql_fixtures['chercheurs'][0]['itemLabel']['value']
+
+    results = hybrid_search_in_elasticsearch(name, size=5)
+
+    assert name in [hit['_source']['name'] for hit in results['hits']]
+    assert counting.calls == ['msearch']
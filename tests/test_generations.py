@@ -0,0 +1,54 @@
+from config import Config
+from search.es_utils import (get_alias_targets, get_es_client, get_index_generation, list_index_generations,
+                             prune_index_generations, rollback_index_generation)
+from search.indexing import run_indexing_task
+
+
+def test_second_resolution_generations_are_listed_pruned_and_rolled_back(indexed):
+    es = get_es_client()
+    current = get_alias_targets(es)[0]
+    legacy = f"{Config.ES_INDEX}-20200101120000"
+    es.indices.create(index=legacy)
+
+    assert list_index_generations(es) == [legacy, current]
+
+    rolled_back, _ = rollback_index_generation()
+    assert rolled_back == legacy
+    assert prune_index_generations(es, keep=0) == [current]
+
+    es.indices.update_aliases(actions=[{"remove": {"index": legacy, "alias": Config.ES_INDEX}}])
+    assert prune_index_generations(es, keep=0) == [legacy]
+    assert list_index_generations(es) == []
+
+
+def test_full_rebuild_swaps_the_alias_and_keeps_the_retention(isolated, monkeypatch):
+    monkeypatch.setattr(Config, 'ES_INDEX_RETENTION', 2)
+    es = get_es_client()
+    es.indices.create(index=Config.ES_INDEX)
+
+    built = []
+    for _ in range(3):
+        status = run_indexing_task('full')
+        assert not status['failed'], status['message']
+        built.append(get_alias_targets(es)[0])
+
+    assert len(set(built)) == 3
+    assert get_alias_targets(es) == [built[-1]]
+    assert list_index_generations(es) == built[1:]
+    assert get_index_generation().startswith(f"{built[-1]}:")
+
+
+def test_rollback_serves_the_previous_generation_until_none_is_left(indexed):
+    es = get_es_client()
+    first = get_alias_targets(es)[0]
+    assert not run_indexing_task('full')['failed']
+    second = get_alias_targets(es)[0]
+
+    rolled_back, _ = rollback_index_generation()
+
+    assert rolled_back == first
+    assert get_alias_targets(es) == [first]
+    assert get_index_generation().startswith(f"{first}:")
+    assert list_index_generations(es) == [first, second]
+    assert rollback_index_generation()[0] is None
+    assert get_alias_targets(es) == [first]
@@ -0,0 +1,133 @@
+import contextlib
+import gzip
+import os
+
+import pytest
+from elasticsearch import Elasticsearch
+
+import app as web
+from config import Config
+from search.es_state import get_cluster_state
+from search.es_utils import MSEARCH_FILTER_PATH, search_with_cursor
+from search.result_cache import get_result_cache
+
+
+@pytest.fixture
+def client(indexed):
+    return web.app.test_client()
+
+
+@contextlib.contextmanager
+def broken_search():
+    """Recherches en échec de transport, disjoncteur encore fermé (erreurs passagères)."""
+    dead = Elasticsearch('http://127.0.0.1:1').options(request_timeout=1, max_retries=0)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Config, 'ES_BREAKER_THRESHOLD', 100)
+        patch.setattr(get_cluster_state(), 'search_es', dead)
+        yield
+
+
+def test_result_page_costs_one_elasticsearch_request(client, counting):
+    first = client.get('/?query=film&genre=drame')
+    assert 'class="facets"' in first.get_data(as_text=True)
+    assert counting.calls == ['msearch']
+
+    cursor = search_with_cursor('film', size=10, selections={'genre': ['drame']})['next_cursor']
+    client.get(f'/?query=film&genre=drame&cursor={cursor}')
+    get_result_cache().clear()
+    del counting.calls[:]
+    second = client.get(f'/?query=film&genre=drame&cursor={cursor}')
+
+    assert 'class="facets"' in second.get_data(as_text=True)
+    assert counting.calls == ['msearch']
+
+
+def test_result_page_revalidates_without_elasticsearch(client):
+    first = client.get('/?query=film')
+    etag = first.headers.get('ETag')
+    assert first.status_code == 200 and etag and etag.startswith('W/')
+
+    with broken_search():
+        again = client.get('/?query=film', headers={'If-None-Match': etag})
+
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+
+
+def test_etag_depends_on_query_and_facets(client):
+    etags = {client.get(path).headers.get('ETag') for path in ('/?query=film', '/?query=films', '/?query=film&genre=drame')}
+    assert len(etags) == 3 and None not in etags
+
+
+@pytest.mark.parametrize('local_search', ['fallback', 'off'])
+def test_degraded_page_gets_no_etag(client, monkeypatch, local_search):
+    monkeypatch.setattr(Config, 'LOCAL_SEARCH', local_search)
+    with broken_search():
+        for _ in range(2):
+            response = client.get('/?query=chercheur')
+            assert response.status_code == 200
+            assert 'ETag' not in response.headers
+
+    fresh = client.get('/?query=chercheur', headers={'If-None-Match': 'W/"stale"'})
+    assert fresh.status_code == 200 and fresh.headers.get('ETag')
+
+
+def test_responses_are_compressed(client):
+    response = client.get('/?query=film', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] in ('gzip', 'br')
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert client.get('/?query=film').headers.get('Content-Encoding') is None
+
+
+def test_static_files_are_compressed_once_per_version(client, monkeypatch):
+    compressed = []
+    compress = web.gzip.compress
+    monkeypatch.setattr(web, 'brotli', None)
+    monkeypatch.setattr(web.gzip, 'compress', lambda data, **kwargs: compressed.append(data) or compress(data, **kwargs))
+    monkeypatch.setattr(web, '_static_compressed', {})
+    path = os.path.join(web.app.static_folder, 'css', 'style.css')
+    with open(path, 'rb') as handle:
+        original = handle.read()
+
+    bodies = []
+    for _ in range(3):
+        response = client.get('/static/css/style.css', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        bodies.append(gzip.decompress(response.data))
+        response.close()
+    assert bodies == [original] * 3
+    assert len(compressed) == 1
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    try:
+        response = client.get('/static/css/style.css', headers={'Accept-Encoding': 'gzip'})
+        assert gzip.decompress(response.data) == original
+        response.close()
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert len(compressed) == 2
+
+
+@pytest.mark.parametrize('item', [
+    {'query': 'film', 'size': True}, {'query': 'film', 'from': False}, {'query': 'film', 'size': 2.0},
+    {'query': 'film', 'from': -1}, {'query': 'film', 'size': 0},
+])
+def test_batch_rejects_non_integer_offsets(item):
+    with pytest.raises(ValueError):
+        web.parse_batch_request({'queries': [item]})
+    assert web.parse_batch_request({'queries': [{'query': 'film', 'from': 0, 'size': 1}]}) == [('film', 0, 1)]
+
+
+def test_api_search_sends_one_filtered_msearch(client, counting, monkeypatch):
+    sent = []
+    msearch = counting.es.msearch
+    monkeypatch.setattr(counting.es, 'msearch', lambda **kwargs: sent.append(kwargs) or msearch(**kwargs))
+
+    response = client.post('/api/search', json={'queries': ['film', 'pays'], 'facet_counts': True})
+
+    body = response.get_json()
+    assert response.status_code == 200 and body['status'] == 'ok'
+    assert [len(item['hits']) > 0 for item in body['responses']] == [True, True]
+    assert counting.calls == ['msearch']
+    assert sent[0]['filter_path'] == MSEARCH_FILTER_PATH
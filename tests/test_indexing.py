@@ -0,0 +1,58 @@
+import pytest
+
+from config import Config
+from search.es_utils import get_alias_targets, get_es_client, list_index_generations
+from search.fingerprints import FingerprintStore
+from search.indexing import run_indexing_task
+
+
+def count_documents(document_type):
+    body = {"size": 0, "query": {"bool": {"filter": [{"term": {"type": document_type}}]}}}
+    return get_es_client().search(index=Config.ES_INDEX, body=body)['hits']['total']['value']
+
+
+@pytest.mark.parametrize('page_size', [0, 100])
+def test_failed_source_blocks_deletions(indexed, monkeypatch, page_size):
+    monkeypatch.setattr(Config, 'SPARQL_PAGE_SIZE', page_size)
+    films = count_documents('film')
+    assert films > 0
+    monkeypatch.delitem(indexed.sparql_fixtures, 'films')
+
+    status = run_indexing_task('incremental')
+
+    assert status['failed_sources'] == ['films']
+    assert status['delta']['deleted'] == 0
+    assert count_documents('film') == films
+
+
+@pytest.mark.parametrize('page_size', [0, 100])
+def test_complete_collection_deletes_vanished_documents(indexed, monkeypatch, page_size):
+    monkeypatch.setattr(Config, 'SPARQL_PAGE_SIZE', page_size)
+    films = count_documents('film')
+    monkeypatch.setitem(indexed.sparql_fixtures, 'films', indexed.sparql_fixtures['films'][1:])
+
+    status = run_indexing_task('incremental')
+
+    assert status['failed_sources'] == []
+    assert status['delta']['deleted'] == 1
+    assert count_documents('film') == films - 1
+
+
+def test_failed_source_does_not_publish_a_full_build(indexed, monkeypatch):
+    monkeypatch.setattr(Config, 'ES_INDEX_RETENTION', 1)
+    es = get_es_client()
+    served, films = get_alias_targets(es), count_documents('film')
+    monkeypatch.delitem(indexed.sparql_fixtures, 'films')
+
+    status = run_indexing_task('full')
+
+    assert status['failed'] and status['failed_sources'] == ['films']
+    assert get_alias_targets(es) == served
+    assert list_index_generations(es) == served
+    assert count_documents('film') == films
+    store = FingerprintStore()
+    try:
+        assert store.connection.execute("SELECT COUNT(*) FROM staging").fetchone()[0] == 0
+        assert store.baseline_matches(served[0], store._meta('mapping'))
+    finally:
+        store.close()
@@ -0,0 +1,137 @@
+import time
+
+import pytest
+
+from config import Config
+from search.es_utils import get_es_client
+from search.indexing import run_indexing_task
+from search.job_runner import JobReporter, run_next_job
+from search.jobs import JobStore
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Deux exécuteurs partageant le même fichier SQLite, comme deux processus."""
+    monkeypatch.setattr(Config, 'JOB_LEASE_SECONDS', 0.3)
+    monkeypatch.setattr(Config, 'JOB_HEARTBEAT_INTERVAL', 0.05)
+    path = str(tmp_path / 'jobs.sqlite')
+    first, second = JobStore(path), JobStore(path)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def expire_lease():
+    time.sleep(Config.JOB_LEASE_SECONDS + 0.1)
+
+
+def test_only_one_claimant_holds_the_job(stores):
+    first, second = stores
+    job, created = first.enqueue('full')
+    assert created
+    assert second.enqueue('incremental') == (job, False)
+
+    assert first.claim('a')['id'] == job['id']
+    assert second.claim('b') is None
+    assert first.heartbeat(job['id'], 'a', message='en cours')
+    assert second.claim('b') is None
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_is_fenced(stores):
+    first, second = stores
+    job, _ = first.enqueue('full')
+    first.claim('a')
+    expire_lease()
+
+    reclaimed = second.claim('b')
+
+    assert (reclaimed['id'], reclaimed['owner'], reclaimed['attempts']) == (job['id'], 'b', 2)
+    assert not first.heartbeat(job['id'], 'a')
+    assert not first.finish(job['id'], 'a', 'done')
+    assert second.finish(job['id'], 'b', 'done')
+    assert first.get(job['id'])['state'] == 'done'
+
+
+def test_crashed_worker_checkpoint_is_handed_over(stores):
+    first, second = stores
+    job, _ = first.enqueue('full')
+    started = first.claim('a')['started_at']
+    checkpoint = {'mode': 'full', 'index': 'tests-20240101120000', 'sources': {'films': {'rows': 40, 'done': False}}}
+    first.heartbeat(job['id'], 'a', checkpoint=checkpoint)
+    first.close()
+    expire_lease()
+
+    reclaimed = second.claim('b')
+
+    assert reclaimed['checkpoint'] == checkpoint
+    assert reclaimed['started_at'] == started
+
+
+def test_attempts_cap_fails_the_job(stores, monkeypatch):
+    monkeypatch.setattr(Config, 'JOB_MAX_ATTEMPTS', 2)
+    first, second = stores
+    job, _ = first.enqueue('full')
+    for store, owner in ((first, 'a'), (second, 'b')):
+        assert store.claim(owner)['id'] == job['id']
+        expire_lease()
+
+    assert first.claim('a') is None
+    failed = second.get(job['id'])
+    assert failed['state'] == 'failed'
+    assert failed['attempts'] == 2
+    assert first.enqueue('full')[1]
+
+
+class WorkerCrash(BaseException):
+    """Mort de l'exécuteur : contourne les `except Exception` qui nettoient la génération."""
+
+
+def test_resumed_job_completes_the_interrupted_generation(isolated, stores, monkeypatch):
+    monkeypatch.setattr(Config, 'SPARQL_PAGE_SIZE', 20)
+    monkeypatch.setattr(Config, 'JOB_CHECKPOINT_INTERVAL', 0)
+    first, second = stores
+    job, _ = first.enqueue('full')
+    claimed = first.claim('a')
+
+    with JobReporter(first, claimed, 'a') as reporter:
+        update = reporter.update
+
+        def crash_after_first_acknowledged_rows(**fields):
+            renewed = update(**fields)
+            if any(source['rows'] for source in fields['checkpoint']['sources'].values()):
+                raise WorkerCrash()
+            return renewed
+
+        reporter.update = crash_after_first_acknowledged_rows
+        with pytest.raises(WorkerCrash):
+            run_indexing_task('full', reporter)
+    interrupted = first.get(job['id'])
+    assert interrupted['state'] == 'running'
+    expire_lease()
+
+    status = run_next_job(second, 'b')
+
+    resumed = second.get(job['id'])
+    assert not status['failed']
+    assert (resumed['state'], resumed['attempts']) == ('done', 2)
+    assert resumed['checkpoint']['index'] == interrupted['checkpoint']['index']
+    assert get_es_client().count(index=Config.ES_INDEX)['count'] == status['final_count'] > 0
+    stage_counts = {(record['stage'], record['source']): record['count'] for record in resumed['stage_seconds']}
+    assert stage_counts[('fetch', 'films')] > 1
+
+
+def test_web_metrics_aggregate_stage_durations_recorded_by_jobs(stores, monkeypatch):
+    import app as web
+
+    first, second = stores
+    for store, owner, count in ((first, 'a', 1), (second, 'b', 2)):
+        job, _ = store.enqueue('full')
+        store.claim(owner)
+        record = {'stage': 'bulk', 'source': 'runner', 'buckets': [count] + [0] * 10, 'sum': 0.05 * count, 'count': count}
+        assert store.finish(job['id'], owner, 'done', stage_seconds=[record])
+    monkeypatch.setattr(web, 'get_job_store', lambda: first)
+
+    body = web.app.test_client().get('/metrics').get_data(as_text=True)
+
+    assert 'indexing_stage_seconds_count{stage="bulk",source="runner"} 3\n' in body
+    assert 'indexing_stage_seconds_bucket{stage="bulk",source="runner",le="0.1"} 3\n' in body
@@ -0,0 +1,155 @@
+import glob
+import json
+import math
+import os
+
+import numpy as np
+import pytest
+
+from config import Config
+from search import local_engine
+from search.es_utils import get_es_client, iter_indexed_documents, refresh_local_index
+from search.indexing import run_indexing_task
+from search.analysis import analyze, light_french_stem
+from search.local_engine import BM25_B, BM25_K1, CURRENT_FILE, build_local_index, get_local_index
+
+# Vecteurs de référence du FrenchLightStemmer de Lucene (stemmer `light_french` d'Elasticsearch).
+LIGHT_FRENCH_STEMS = [
+    ('chevaux', 'cheval'), ('hiboux', 'hibou'), ('chantés', 'chant'), ('chanter', 'chant'), ('baronnes', 'baron'),
+    ('peaux', 'peau'), ('anneaux', 'aneau'), ('neveux', 'neveu'), ('affreux', 'afreu'), ('affreuse', 'afreu'),
+    ('investissement', 'investi'), ('assourdissant', 'asourdi'), ('pratiquement', 'pratiqu'),
+    ('administrativement', 'administratif'), ('justificatrice', 'justifi'), ('justificateur', 'justifi'),
+    ('educatrice', 'eduqu'), ('communicateur', 'comuniqu'), ('accompagnatrice', 'acompagn'),
+    ('administrateur', 'administr'), ('productrice', 'product'), ('acheteuse', 'achet'), ('planteur', 'plant'),
+    ('poreuse', 'poreu'), ('bijoutière', 'bijouti'), ('caissière', 'caisi'), ('abrasive', 'abrasif'),
+    ('folle', 'fou'), ('personnelle', 'person'), ('complète', 'complet'), ('aromatique', 'aromat'),
+    ('faiblesse', 'faibl'), ('patinage', 'patin'), ('sonorisation', 'sono'), ('ritualisation', 'rituel'),
+    ('nomination', 'nomin'), ('disposition', 'dispos'), ('1234555', '1234555'), ('12333345', '12333345'),
+    ('abcdeff', 'abcdef'), ('abcccddeef', 'abcdef'), ('créées', 'cre'), ('22hh00', '22h00'),
+]
+
+# Termes de `_analyze` avec l'analyseur `french_custom` du mapping
+# (standard, lowercase, asciifolding, elision, stop `_french_`, light_french).
+FRENCH_CUSTOM_TERMS = [
+    ("L'Amérique du Nord", ['ameriqu', 'nord']),
+    ('Les Misérables', ['miserabl']),
+    ('chercheurs français', ['chercheu', 'francai']),
+    ('l’histoire des sciences', ['histoir', 'scienc']),
+    ("Qu'elles", ['elle']),
+    ('Été', ['ete']),
+    ('Physique théorique', ['physiqu', 'theo']),
+    ('Réalisé par Jean-Pierre Jeunet', ['realis', 'jean', 'pier', 'jeunet']),
+]
+
+
+@pytest.mark.parametrize('word, stem', LIGHT_FRENCH_STEMS)
+def test_light_french_stem_matches_lucene(word, stem):
+    assert light_french_stem(word) == stem
+
+
+@pytest.mark.parametrize('text, terms', FRENCH_CUSTOM_TERMS)
+def test_analyze_matches_french_custom(text, terms):
+    assert analyze(text) == terms
+
+
+def bm25(tf, length, average, documents, matching):
+    idf = math.log(1 + (documents - matching + 0.5) / (matching + 0.5))
+    return idf * tf / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average))
+
+
+@pytest.fixture
+def local_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'LOCAL_SEARCH', 'fallback')
+    monkeypatch.setattr(Config, 'LOCAL_INDEX_DIR', str(tmp_path))
+    names = {'d': 'chat noir', 'c': 'chat', 'b': 'chien', 'a': 'chat chat noir', 'e': 'chat'}
+    build_local_index([{'uri': uri, 'name': names[uri], 'type': 'film'} for uri in sorted(names)], 'tests:0')
+    return get_local_index()
+
+
+def test_bm25_scores_and_tie_break(local_index):
+    hits = local_index.search({"match": {"name": "chat"}})['hits']
+
+    assert [hit['_id'] for hit in hits] == ['c', 'e', 'a', 'd']
+    average = (2 + 1 + 1 + 3 + 1) / 5
+    expected = [bm25(1, 1, average, 5, 4), bm25(1, 1, average, 5, 4), bm25(2, 3, average, 5, 4), bm25(1, 2, average, 5, 4)]
+    assert [hit['_score'] for hit in hits] == pytest.approx(expected, rel=1e-5)
+
+
+def test_rarer_term_weighs_more(local_index):
+    def score(term, uri):
+        return next(hit['_score'] for hit in local_index.search({"match": {"name": term}})['hits'] if hit['_id'] == uri)
+
+    assert score('noir', 'd') > score('chat', 'd')
+    assert [hit['_id'] for hit in local_index.search({"match": {"name": "chat noir"}})['hits']][:2] == ['d', 'a']
+
+
+def test_current_is_read_at_most_every_interval(local_index, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'LOCAL_INDEX_CHECK_INTERVAL', 3600)
+    stats = []
+    real_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        if str(path).endswith(CURRENT_FILE):
+            stats.append(path)
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(local_engine.os, 'stat', counting_stat)
+
+    for _ in range(5):
+        assert get_local_index() is local_index
+    assert stats == []
+
+    build_local_index([{'uri': 'z', 'name': 'zèbre'}], 'tests:1')
+    del stats[:]
+    for _ in range(5):
+        assert get_local_index().generation == 'tests:1'
+    assert len(stats) == 1
+
+
+def index_files(path):
+    """Contenu d'un index local : tableaux et `meta.json` (sans la date de construction)."""
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as handle:
+        meta = json.load(handle)
+    del meta['built_at']
+    arrays = {os.path.basename(name): np.load(name).tolist() for name in glob.glob(os.path.join(path, '*.npy'))}
+    return meta, arrays
+
+
+def test_chunked_build_spills_postings_and_matches_a_single_chunk(indexed, tmp_path, monkeypatch):
+    documents = list(iter_indexed_documents(get_es_client()))
+    spilled = []
+
+    def streamed():
+        for position, document in enumerate(documents):
+            if position == len(documents) - 1:
+                spilled.extend(glob.glob(os.path.join(tmp_path / 'chunked', '.build-*', 'runs', '*.jsonl')))
+            yield document
+
+    monkeypatch.setattr(Config, 'LOCAL_INDEX_CHUNK_SIZE', 7)
+    build_local_index(streamed(), 'tests:chunked', str(tmp_path / 'chunked'))
+    monkeypatch.setattr(Config, 'LOCAL_INDEX_CHUNK_SIZE', len(documents) + 1)
+    build_local_index(documents, 'tests:chunked', str(tmp_path / 'single'))
+
+    assert len(documents) > 14 and len(spilled) >= 2
+    assert index_files(tmp_path / 'chunked' / 'tests_chunked') == index_files(tmp_path / 'single' / 'tests_chunked')
+    assert not glob.glob(os.path.join(tmp_path / 'chunked', 'tests_chunked', 'runs'))
+
+
+def test_unsorted_documents_are_rejected_without_publishing(local_index):
+    with pytest.raises(ValueError):
+        build_local_index([{'uri': 'b', 'name': 'chien'}, {'uri': 'a', 'name': 'chat'}], 'tests:1')
+
+    assert get_local_index() is local_index
+    assert not glob.glob(os.path.join(Config.LOCAL_INDEX_DIR, '.build-*'))
+
+
+def test_indexing_rebuilds_the_local_index_only_when_asked(indexed, monkeypatch):
+    assert get_local_index() is None
+    assert not run_indexing_task('incremental')['failed']
+    assert get_local_index() is None
+
+    monkeypatch.setattr(Config, 'LOCAL_INDEX_AUTO_REBUILD', True)
+    assert not run_indexing_task('incremental')['failed']
+    rebuilt = get_local_index()
+    assert rebuilt.count == get_es_client().count(index=Config.ES_INDEX)['count']
+    assert refresh_local_index().startswith("Index local déjà à jour")
@@ -0,0 +1,65 @@
+import json
+
+import app as web
+from config import Config
+from search.es_utils import search_in_elasticsearch
+from search.metrics import INDEXING_STAGE_SECONDS, Histogram, log_slow_query, merge_stage_records, observe_stage, stage_records
+from search.result_cache import get_result_cache
+
+
+def test_histogram_renders_cumulative_prometheus_buckets():
+    histogram = Histogram('demo_seconds', "Démo.", ('phase',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, phase='parse')
+
+    lines = histogram.render()
+
+    assert 'demo_seconds_bucket{phase="parse",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{phase="parse",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{phase="parse",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{phase="parse"} 3' in lines
+
+
+def test_stage_records_are_deltas_that_merge_back():
+    baseline = INDEXING_STAGE_SECONDS.snapshot()
+    observe_stage('fetch', 2.0, source='tests')
+    observe_stage('fetch', 3.0, source='tests')
+
+    records = [record for record in stage_records(baseline) if record['source'] == 'tests']
+    merged = merge_stage_records(records, records)
+
+    assert [(record['count'], record['sum']) for record in records] == [(2, 5.0)]
+    assert merged[(('stage', 'fetch'), ('source', 'tests'))]['count'] == 4
+
+
+def test_search_phases_are_exported(indexed):
+    get_result_cache().clear()
+    search_in_elasticsearch('film')
+
+    body = web.app.test_client().get('/metrics').get_data(as_text=True)
+
+    assert '# TYPE search_phase_seconds histogram' in body
+    assert 'search_phase_seconds_count{phase="es_request"}' in body
+    assert 'search_phase_seconds_count{phase="es_took"}' in body
+
+
+def test_slow_queries_are_logged_above_the_threshold(monkeypatch, capsys):
+    monkeypatch.setattr(Config, 'SLOW_QUERY_MS', 100)
+    monkeypatch.setattr(Config, 'SLOW_QUERY_SAMPLE_RATE', 1.0)
+
+    log_slow_query('rapide', {'query': {}}, 0.05)
+    log_slow_query('lente', {'query': {'match_all': {}}}, 0.25, took_ms=180, size=10)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1 and lines[0].startswith('REQUÊTE LENTE ')
+    record = json.loads(lines[0].split(' ', 2)[2])
+    assert record == {'query': 'lente', 'elapsed_ms': 250.0, 'took_ms': 180, 'size': 10, 'dsl': {'query': {'match_all': {}}}}
+
+
+def test_slow_query_log_honours_the_sample_rate(monkeypatch, capsys):
+    monkeypatch.setattr(Config, 'SLOW_QUERY_MS', 1)
+    monkeypatch.setattr(Config, 'SLOW_QUERY_SAMPLE_RATE', 0.0)
+
+    log_slow_query('lente', {}, 1.0)
+
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,76 @@
+import itertools
+import json
+
+import pytest
+
+from config import Config
+from search.es_utils import generation_index_name, get_es_client, index_data_in_elasticsearch, iter_indexed_documents
+from search.pipeline import PipelineStats, build_country_document, build_movie_document, iter_documents
+from search.wikidata_client import MULTI_VALUE_SEPARATOR, _country_query, _movie_query, _scientist_query, iter_sparql_bindings
+
+
+def film(number):
+    return {'item': {'type': 'uri', 'value': f"http://www.wikidata.org/entity/Q{number}"},
+            'itemLabel': {'type': 'literal', 'value': f"Film n°{number} — été"}}
+
+
+def test_bindings_are_decoded_from_arbitrary_chunks():
+    rows = [film(number) for number in range(5)]
+    body = json.dumps({'head': {'vars': ['item']}, 'results': {'bindings': rows}}, ensure_ascii=False).encode('utf-8')
+
+    assert list(iter_sparql_bindings(body[position:position + 3] for position in range(0, len(body), 3))) == rows
+
+
+def test_documents_are_built_lazily():
+    stats = PipelineStats()
+    documents = iter_documents((film(number) for number in itertools.count()), build_movie_document, stats)
+
+    assert [document['uri'] for document in itertools.islice(documents, 3)][-1].endswith('Q2')
+    assert stats.as_dict()['fetch']['count'] == 3
+
+
+def test_bulk_consumes_documents_as_a_stream(isolated, monkeypatch):
+    monkeypatch.setattr(Config, 'BULK_CHUNK_SIZE', 10)
+    acknowledged, backlog = [], []
+
+    def documents():
+        for number in range(100):
+            backlog.append(number - len(acknowledged))
+            yield build_movie_document(film(number))
+
+    count, _ = index_data_in_elasticsearch(documents(), new_index=generation_index_name(),
+                                           on_settled=lambda op_type, uri: acknowledged.append(uri))
+
+    assert count == len(acknowledged) == 100
+    assert max(backlog) <= 2 * Config.BULK_CHUNK_SIZE
+    assert get_es_client().count(index=Config.ES_INDEX)['count'] == 100
+
+
+@pytest.mark.parametrize('build_query', [_scientist_query, _movie_query, _country_query])
+def test_queries_return_one_row_per_entity(build_query):
+    query = build_query(100, after="http://www.wikidata.org/entity/Q1")
+
+    assert 'GROUP BY ?item' in query
+    assert f'separator="{MULTI_VALUE_SEPARATOR}"' in query
+
+
+def test_aggregated_values_become_lists():
+    row = dict(film(1), genreLabel={'type': 'literal', 'value': MULTI_VALUE_SEPARATOR.join(['drame', '', 'western'])},
+               realisateurLabel={'type': 'literal', 'value': ''})
+
+    details = build_movie_document(row)['details']
+
+    assert details['genre'] == ['drame', 'western']
+    assert details['director'] is None
+    assert build_country_document(film(2))['details'] == {'capital': None, 'continent': None}
+
+
+def test_each_entity_is_indexed_once_with_its_values(indexed):
+    films = {row['item']['value']: row for row in indexed.sparql_fixtures['films']}
+    indexed_films = [document for document in iter_indexed_documents(get_es_client(), Config.ES_INDEX)
+                     if document['type'] == 'film']
+
+    assert sorted(document['uri'] for document in indexed_films) == sorted(films)
+    for document in indexed_films:
+        expected = films[document['uri']]['genreLabel']['value'].split(MULTI_VALUE_SEPARATOR)
+        assert document['details']['genre'] == expected
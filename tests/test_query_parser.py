@@ -0,0 +1,35 @@
+import pytest
+
+from benchmarks.bench_query_parser import load_corpus
+from benchmarks.legacy_query_parser import LegacyQueryParser
+from search.query_parser import QueryParser
+
+# Écarts voulus avec l'ancien analyseur : accents facultatifs, nom de réalisateur arrêté au mot-clé suivant.
+IMPROVEMENTS = {
+    'film apres 2015': ([], [{'term': {'type': 'film'}}, {'bool': {'should': [
+        {'range': {'details.release_date': {'gte': '2015-01-01'}}}], 'minimum_should_match': 1}}]),
+    'chercheur francais': ([{'match': {'details.nationality': 'France'}}], [{'term': {'type': 'chercheur'}}]),
+    'films par Martin Scorsese genre drame': (
+        [{'match_phrase': {'details.director': 'martin scorsese'}}, {'match': {'details.genre': 'drame'}}],
+        [{'term': {'type': 'film'}}]),
+}
+
+
+def parse(parser_class, query):
+    parser = parser_class(query)
+    must_clauses, filter_clauses = parser.parse()
+    return must_clauses, filter_clauses, parser.detected_type
+
+
+@pytest.mark.parametrize('query', load_corpus())
+def test_parity_with_legacy_parser(query):
+    must_clauses, filter_clauses, detected_type = parse(LegacyQueryParser, query)
+    if query in IMPROVEMENTS:
+        must_clauses, filter_clauses = IMPROVEMENTS[query]
+
+    assert parse(QueryParser, query) == (must_clauses, filter_clauses, detected_type)
+
+
+@pytest.mark.parametrize('query', ['film de guerre', 'film de Noël', 'Le film de ma vie', 'films de science-fiction'])
+def test_film_de_is_not_a_director(query):
+    assert parse(QueryParser, query) == ([], [{'term': {'type': 'film'}}], 'film')
@@ -0,0 +1,42 @@
+from search import result_cache
+from search.es_utils import search_in_elasticsearch
+from search.indexing import run_indexing_task
+from search.result_cache import LRUCache, get_result_cache, make_cache_key
+
+
+def test_lru_evicts_the_least_recently_used_and_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+    cache = LRUCache(max_entries=2, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    now[0] += 11
+    assert cache.get('a') is None
+    assert cache.stats()['evictions'] == 1 and cache.stats()['expirations'] == 1
+
+
+def test_keys_depend_on_the_generation():
+    assert make_cache_key('search', 'i-1:3', 'film', 0, 10) != make_cache_key('search', 'i-1:4', 'film', 0, 10)
+    assert make_cache_key('search', 'i-1:3', 'film', 0, 10) == make_cache_key('search', 'i-1:3', 'film', 0, 10)
+
+
+def test_repeated_search_is_served_from_the_cache(indexed, counting):
+    get_result_cache().clear()
+    first = search_in_elasticsearch('Film  de', size=5)
+
+    assert search_in_elasticsearch('film de', size=5) == first
+    assert counting.calls.count('search') == 1
+
+
+def test_reindexing_invalidates_cached_results(indexed, counting):
+    get_result_cache().clear()
+    search_in_elasticsearch('film', size=5)
+    assert not run_indexing_task('full')['failed']
+
+    search_in_elasticsearch('film', size=5)
+
+    assert counting.calls.count('search') == 2
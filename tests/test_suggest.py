@@ -0,0 +1,39 @@
+import app as web
+from config import Config
+from search.es_utils import build_suggest_field, suggest_names
+from search.result_cache import get_result_cache
+
+
+def test_suggest_field_completes_every_word_with_a_type_weight():
+    field = build_suggest_field({'name': 'Marie Salomea Skłodowska Curie Nobel', 'type': 'chercheur'})
+
+    assert field['input'] == ['Marie Salomea Skłodowska Curie Nobel', 'Salomea Skłodowska Curie Nobel',
+                              'Skłodowska Curie Nobel', 'Curie Nobel']
+    assert field['weight'] == Config.SUGGEST_TYPE_WEIGHTS['chercheur']
+
+
+def test_short_prefix_does_not_query_elasticsearch(indexed, counting):
+    assert suggest_names('a' * (Config.SUGGEST_MIN_CHARS - 1)) == []
+    assert counting.calls == []
+
+
+def test_suggestions_are_bounded_and_cached(indexed, counting):
+    get_result_cache().clear()
+    prefix = indexed.sparql_fixtures['films'][0]['itemLabel']['value'][:3]
+
+    suggestions = suggest_names(prefix, size=Config.SUGGEST_SIZE + 10)
+
+    assert 0 < len(suggestions) <= Config.SUGGEST_SIZE
+    assert all(suggestion['name'].lower().startswith(prefix.lower()) for suggestion in suggestions)
+    assert suggest_names(f" {prefix.upper()} ", size=Config.SUGGEST_SIZE) == suggestions
+    assert counting.calls == ['options']
+
+
+def test_suggest_endpoint_returns_cacheable_json(indexed):
+    prefix = indexed.sparql_fixtures['chercheurs'][0]['itemLabel']['value'][:4]
+
+    response = web.app.test_client().get(f'/suggest?q={prefix}')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == f"public, max-age={Config.SUGGEST_HTTP_MAX_AGE}"
+    assert response.get_json()['suggestions'][0]['name'].startswith(prefix)
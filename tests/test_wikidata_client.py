@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from config import Config
+from search import wikidata_client
+from search.indexing import SourceProgress
+from search.wikidata_client import (_movie_query, fetch_sources_in_parallel, fetch_sparql_page, get_sparql_session,
+                                    run_paginated_sparql_query)
+
+
+def item(row):
+    return row['item']['value']
+
+
+@pytest.fixture
+def pages(stand_ins, monkeypatch):
+    """Requêtes de page envoyées au point d'accès SPARQL."""
+    monkeypatch.setattr(Config, 'SPARQL_PAGE_SIZE', 7)
+    sent = []
+    fetch = wikidata_client.fetch_sparql_page
+    monkeypatch.setattr(wikidata_client, 'fetch_sparql_page', lambda query: sent.append(query) or fetch(query))
+    return sent
+
+
+def test_pages_are_keyed_by_the_last_uri_of_the_previous_page(stand_ins, pages):
+    films = sorted(stand_ins.sparql_fixtures['films'], key=item)
+
+    rows = list(run_paginated_sparql_query(_movie_query, 30))
+
+    assert [item(row) for row in rows] == [item(row) for row in films[:30]]
+    assert len(pages) == 5 and not any('OFFSET' in query for query in pages)
+    assert 'FILTER' not in pages[0]
+    for page, query in enumerate(pages[1:], 1):
+        assert f'FILTER(STR(?item) > "{item(films[page * 7 - 1])}")' in query
+
+
+def test_last_short_page_ends_the_source(stand_ins, pages):
+    films = sorted(stand_ins.sparql_fixtures['films'], key=item)
+
+    rows = list(run_paginated_sparql_query(_movie_query, len(films) + 100, start=7, after=item(films[6])))
+
+    assert [item(row) for row in rows] == [item(row) for row in films[7:]]
+    assert len(pages) == (len(films) - 7) // 7 + 1
+
+
+def test_resume_point_is_the_start_of_the_oldest_unsettled_page(monkeypatch):
+    monkeypatch.setattr(Config, 'SPARQL_PAGE_SIZE', 3)
+    source = SourceProgress()
+    assert source.start() == (0, None)
+    uris = ['q05', 'q01', 'q03', 'q09', 'q07', 'q08', 'q12']
+    ordinals = [source.next_row(uri) for uri in uris]
+
+    for ordinal in ordinals[:4]:
+        source.settle(ordinal)
+    assert (source.rows, source.page, source.after) == (4, 3, 'q05')
+
+    resumed = SourceProgress(rows=source.rows, done=False, page=source.page, after=source.after)
+    assert resumed.start() == (3, 'q05')
+    assert SourceProgress(rows=40, done=False).start() == (0, None)
+
+
+class RateLimited(requests.exceptions.HTTPError):
+    def __init__(self, retry_after):
+        response = requests.Response()
+        response.status_code = 429
+        response.headers['Retry-After'] = retry_after
+        super().__init__('429 Too Many Requests', response=response)
+
+
+@pytest.mark.parametrize('retry_after, sleeps', [('5', [5.0]), ('3600', [])])
+def test_retry_after_is_capped(monkeypatch, retry_after, sleeps):
+    monkeypatch.setattr(Config, 'SPARQL_MAX_RETRIES', 1)
+    monkeypatch.setattr(Config, 'SPARQL_MAX_RETRY_DELAY', 60)
+    slept = []
+    monkeypatch.setattr(wikidata_client.time, 'sleep', slept.append)
+
+    def rate_limited(query):
+        raise RateLimited(retry_after)
+
+    monkeypatch.setattr(wikidata_client, 'open_sparql_stream', rate_limited)
+
+    with pytest.raises(RateLimited):
+        fetch_sparql_page('SELECT ?item WHERE {}')
+    assert slept == sleeps
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr(Config, 'SPARQL_RETRY_BACKOFF', 2.0)
+    monkeypatch.setattr(Config, 'SPARQL_MAX_RETRY_DELAY', 60)
+    error = requests.exceptions.ConnectionError()
+
+    assert [wikidata_client._retry_delay(error, attempt) for attempt in (0, 3, 10)] == [2.0, 16.0, 60]
+
+
+def test_sources_run_concurrently_and_a_failure_is_isolated():
+    both_started = threading.Barrier(2, timeout=5)
+
+    def source(name, count):
+        both_started.wait()
+        yield from ((name, number) for number in range(count))
+
+    def broken():
+        yield 'avant'
+        raise RuntimeError('page perdue')
+
+    errors = []
+    sources = [('a', lambda: source('a', 50)), ('b', lambda: source('b', 30)), ('c', broken)]
+    rows = list(fetch_sources_in_parallel(sources, lambda name, error: errors.append((name, str(error)))))
+
+    assert sorted(row for name, row in rows if name in 'ab') == sorted([('a', n) for n in range(50)] + [('b', n) for n in range(30)])
+    assert ('c', 'avant') in rows
+    assert errors == [('c', 'page perdue')]
+
+
+def test_producers_are_bounded_by_the_queue(monkeypatch):
+    monkeypatch.setattr(Config, 'SPARQL_QUEUE_SIZE', 5)
+    produced = []
+
+    def source():
+        for number in range(1000):
+            produced.append(number)
+            yield number
+
+    rows = fetch_sources_in_parallel([('a', source)])
+    assert next(rows) == ('a', 0)
+    time.sleep(0.2)
+    assert len(produced) <= Config.SPARQL_QUEUE_SIZE + 2
+    rows.close()
+
+
+def test_one_pooled_session_is_shared():
+    session = get_sparql_session()
+
+    assert get_sparql_session() is session
+    assert session.get_adapter(Config.WIKIDATA_SPARQL_ENDPOINT)._pool_maxsize >= Config.SPARQL_WORKERS